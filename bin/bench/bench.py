@@ -0,0 +1,309 @@
+# Usage:
+#   python bench.py [--data-dir DIR] [--stations N] [--days N] [--repeats N]
+#                   [--out FILE]
+#   python bench.py --compare <old.json> <new.json> [--threshold F]
+#
+# Time the stages of a data request on a synthetic data tree (see
+# generate.py) and write the results as JSON so that runs on different
+# commits can be compared. For the first magnetometer station of each row
+# format and the first doppler station, the stages are
+#
+#   discover/cold   psws.data.files_needed() with no saved manifest
+#   discover/warm   psws.data.files_needed() with the manifest in memory
+#   decode          decode of one day file to column arrays
+#   format/<f>      HAPI csv and binary bytes for the decoded day
+#   compress/<f>/<c> the bytes of format/<f> compressed in chunks with
+#                   content coding <c>, gzip and, if zstandard is installed,
+#                   zstd, as by the server (see psws/stream.py), with the
+#                   bytes saved and CPU microseconds per row
+#   request/<w>/<f> all records of psws.data.iter_records() for windows of
+#                   PT1M, PT1H, P1D and the whole tree (ALL), in csv and
+#                   binary
+#
+# Each stage is repeated --repeats times and the minimum and median times
+# are kept. Requests use a new, empty PSWS_CACHE_DIR, one worker and no
+# in-memory day cache, so they include the decode of each file. A stage
+# that fails, e.g., for a format that can not be read, is recorded with
+# its error.
+#
+# If --data-dir is not given, a tree with --stations stations of each type
+# and --days days is generated in a temporary directory.
+#
+# --compare prints the ratio of the minimum times of the stages in both
+# files and exits with status 1 if any ratio is above --threshold.
+#
+# Examples:
+#   python bench.py --out bench-$(git rev-parse --short HEAD).json
+#   python bench.py --compare bench-1105e2b.json bench-5c728d9.json
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import datetime
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+# Make the psws package in bin/ importable
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate
+from psws import data, days, doppler, mag, manifest, output, stream
+
+WINDOWS = {'PT1M': 60, 'PT1H': 3600, 'P1D': 86400}
+
+FORMATS = ['csv', 'binary']
+
+
+def timed(run, repeats, setup=None):
+  """Return dict with min and median seconds of `repeats` calls of run().
+
+  setup() is called before each call and is not timed. The value returned by
+  the last call of run() is returned as 'value'.
+  """
+  times = []
+  for _ in range(repeats):
+    if setup is not None:
+      setup()
+    t = time.perf_counter()
+    value = run()
+    times.append(time.perf_counter() - t)
+  return {'min': min(times), 'median': statistics.median(times), 'value': value}
+
+
+def datasets(data_dir):
+  """Return list of (id, label) of the datasets to time.
+
+  label is the magnetometer row format or 'doppler'. The first station of
+  each format found in data_dir is used.
+  """
+  result = {}
+  for rel_dir, dataset_dir, data_type in data.datasets(data_dir):
+    station = rel_dir.split(os.sep)[0]
+    label = 'doppler'
+    if data_type == 'mag':
+      label = generate.mag_format(int(station[1:]))
+    result.setdefault(label, f'{station}/{data_type}')
+  return [(id, label) for label, id in result.items()]
+
+
+def decoded(data_type, file):
+  """Return (time, columns, types, decimals) for all rows of file."""
+  if data_type == 'mag':
+    block = mag.decode_file(file)
+    return block['time'], [block[c] for c in mag.COLUMNS], \
+      [mag.TYPES[c] for c in mag.COLUMNS], None
+  block, decimals = doppler.decode(file)
+  return block['time'], [block[c] for c in doppler.COLUMNS], \
+    [doppler.TYPES[c] for c in doppler.COLUMNS], [decimals[c] for c in doppler.COLUMNS]
+
+
+def compressed(body, encoding):
+  """Return (bytes, CPU seconds) of body compressed as by the server."""
+  cpu = time.process_time()
+  chunks = stream.chunks([body], stream.chunk_size())
+  n = sum(len(chunk) for chunk in stream.compress(chunks, encoding))
+  return n, time.process_time() - cpu
+
+
+def bench_dataset(id, data_dir, start, stop, repeats):
+  """Return dict of stage name to result for one dataset."""
+
+  results = {}
+  data_type = id.split('/')[-1]
+
+  def stage(name, run, setup=None, size=None):
+    try:
+      result = timed(run, repeats, setup=setup)
+    except Exception as e:
+      results[name] = {'error': f'{type(e).__name__}: {e}'}
+      return None
+    value = result.pop('value')
+    if size is not None:
+      result.update(size(value))
+    results[name] = result
+    return value
+
+  cache_dir = tempfile.mkdtemp(prefix='psws-bench-cache-')
+  try:
+    def cold():
+      shutil.rmtree(cache_dir, ignore_errors=True)
+      manifest._loaded.clear()
+
+    def discover():
+      return data.files_needed(id, start, stop, data_dir, cache_dir)
+
+    files = stage('discover/cold', discover, setup=cold, size=lambda v: {'files': len(v)})
+    stage('discover/warm', discover)
+    if not files:
+      return results
+
+    day = stage('decode', lambda: decoded(data_type, files[0]),
+                size=lambda v: {'rows': len(v[0])})
+    if day is not None:
+      time_, columns, types, decimals = day
+      bodies = {
+        'csv': stage('format/csv', lambda: output.csv(time_, columns, decimals),
+                     size=lambda v: {'bytes': len(v)}),
+        'binary': stage('format/binary', lambda: output.binary(time_, columns, types),
+                        size=lambda v: {'bytes': len(v)})
+      }
+      for format, body in bodies.items():
+        for encoding in stream.encodings() if body is not None else []:
+          def size(value, body=body, encoding=encoding):
+            n, cpu = value
+            return {'level': stream.default_level(encoding), 'bytes': len(body),
+                    'compressed_bytes': n, 'saved_bytes': len(body) - n,
+                    'cpu_us_per_row': 1e6 * cpu / max(1, len(time_))}
+          stage(f'compress/{format}/{encoding}',
+                lambda body=body, encoding=encoding: compressed(body, encoding), size=size)
+
+    t0 = datetime.datetime.fromisoformat(start[0:-1]) + datetime.timedelta(hours=12)
+    windows = [(w, t0, t0 + datetime.timedelta(seconds=s)) for w, s in WINDOWS.items()]
+    windows.append(('ALL', datetime.datetime.fromisoformat(start[0:-1]),
+                    datetime.datetime.fromisoformat(stop[0:-1])))
+    for window, wstart, wstop in windows:
+      for format in FORMATS:
+        def request():
+          records = data.iter_records(id, f'{wstart.isoformat()}Z', f'{wstop.isoformat()}Z',
+                                      data_dir=data_dir, cache_dir=cache_dir,
+                                      format=format, workers=1)
+          return sum(len(record) for record in records)
+        stage(f'request/{window}/{format}', request, setup=cold,
+              size=lambda v: {'bytes': v})
+  finally:
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+  return results
+
+
+def span(data_dir, id):
+  """Return (start, stop) of the days of data files of dataset id."""
+  data_type, rel_dir = data.dataset_dir(id, data_dir)
+  dates = manifest.build(os.path.join(data_dir, rel_dir), data_type)['dates']
+  stop = datetime.date.fromisoformat(dates[-1]) + datetime.timedelta(days=1)
+  return f'{dates[0]}T00:00:00Z', f'{stop.isoformat()}T00:00:00Z'
+
+
+def environment(args):
+  """Return dict describing the code and host that the results are for."""
+  import numpy as np
+
+  commit = None
+  try:
+    commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                            cwd=Path(__file__).resolve().parent).stdout.strip() or None
+  except OSError:
+    pass
+
+  return {
+    'commit': commit,
+    'date': datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+    'python': platform.python_version(),
+    'numpy': np.__version__,
+    'platform': platform.platform(),
+    'cpus': os.cpu_count(),
+    'config': {
+      'data_dir': args.data_dir,
+      'stations': args.stations,
+      'days': args.days,
+      'seed': args.seed,
+      'repeats': args.repeats
+    }
+  }
+
+
+def run(args):
+
+  # Requests are timed without the in-memory day cache.
+  os.environ.pop('PSWS_DAY_CACHE_BYTES', None)
+  days.clear()
+
+  data_dir = args.data_dir
+  tmp_dir = None
+  if data_dir is None:
+    tmp_dir = tempfile.mkdtemp(prefix='psws-bench-data-')
+    data_dir = tmp_dir
+    print(f"Generating {args.stations} stations x {args.days} days in {data_dir}", file=sys.stderr)
+    generate.generate(data_dir, args.stations, args.days, seed=args.seed)
+
+  results = {}
+  try:
+    for id, label in datasets(data_dir):
+      start, stop = span(data_dir, id)
+      print(f"{id} ({label})", file=sys.stderr)
+      for stage, result in bench_dataset(id, data_dir, start, stop, args.repeats).items():
+        results[f'{label}/{stage}'] = {'id': id, **result}
+        print(f"  {stage:22s} {_str(result)}", file=sys.stderr)
+  finally:
+    if tmp_dir is not None:
+      shutil.rmtree(tmp_dir, ignore_errors=True)
+
+  return {**environment(args), 'results': results}
+
+
+def compare(old_file, new_file, threshold):
+  """Print ratio of new to old minimum times. Returns True if none is above threshold."""
+
+  with open(old_file) as f:
+    old = json.load(f)
+  with open(new_file) as f:
+    new = json.load(f)
+
+  print(f"old: {old.get('commit')} {old.get('date')}")
+  print(f"new: {new.get('commit')} {new.get('date')}")
+  ok = True
+  for name in sorted(set(old['results']) | set(new['results'])):
+    a = old['results'].get(name, {}).get('min')
+    b = new['results'].get(name, {}).get('min')
+    if a is None or b is None:
+      print(f"{name:36s} {_str(old['results'].get(name))} -> {_str(new['results'].get(name))}")
+      continue
+    ratio = b / a if a > 0 else float('inf')
+    flag = ''
+    if ratio > threshold:
+      flag = ' slower'
+      ok = False
+    print(f"{name:36s} {a:9.4f} s {b:9.4f} s {ratio:6.2f}{flag}")
+  return ok
+
+
+def _str(result):
+  if result is None:
+    return '-'
+  if 'error' in result:
+    return result['error']
+  text = f"{result['min']:.4f} s (median {result['median']:.4f} s)"
+  if 'saved_bytes' in result:
+    text += (f", {result['saved_bytes']} of {result['bytes']} bytes saved, "
+             f"{result['cpu_us_per_row']:.2f} us/row")
+  return text
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Benchmark PSWS data requests.")
+  parser.add_argument('--data-dir', default=None, help="existing tree; default: generate one")
+  parser.add_argument('--stations', type=int, default=3, help="stations of each type to generate")
+  parser.add_argument('--days', type=int, default=2, help="days to generate")
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--repeats', type=int, default=3)
+  parser.add_argument('--out', default=None, help="JSON file for results; default: stdout")
+  parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), default=None)
+  parser.add_argument('--threshold', type=float, default=1.2,
+                      help="ratio of times above which --compare reports a regression")
+  args = parser.parse_args()
+
+  if args.compare:
+    sys.exit(0 if compare(*args.compare, args.threshold) else 1)
+
+  results = json.dumps(run(args), indent=2)
+  if args.out is None:
+    print(results)
+  else:
+    with open(args.out, 'w') as f:
+      f.write(results + '\n')
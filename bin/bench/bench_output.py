@@ -0,0 +1,91 @@
+# Usage:
+#   python bench_output.py
+#   python bench_output.py <id> <start> <stop>
+#
+# Compare rows/s for writing the response to a full-day data request to a
+# pipe:
+#
+#   print    one print() per row, as data.py originally did
+#   records  one write per record yielded by psws.data.iter_records()
+#   chunked  psws.stream.write() with xstream.chunk_size from config.json
+#
+# The pipe is read by a thread in reads of chunk_size bytes, as the server
+# does. Times are for writing only; the records are computed before timing.
+#
+# Examples:
+#   python bench_output.py S000028/mag 2025-10-20T00:00:00Z 2025-10-21T00:00:00Z
+
+import os
+import sys
+import time
+import threading
+from pathlib import Path
+
+# Make the psws package in bin/ importable
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from psws import data, stream
+
+REQUESTS = [
+  ('S000028/mag', '2025-10-20T00:00:00Z', '2025-10-21T00:00:00Z'),
+  ('N000001/doppler', '2019-05-24T00:00:00Z', '2019-05-25T00:00:00Z'),
+]
+
+REPEATS = 5
+
+
+def write_print(records, file):
+  text = open(file.fileno(), 'w', closefd=False)
+  for record in records:
+    for line in record.decode().splitlines():
+      print(line, file=text)
+  text.flush()
+
+
+def write_records(records, file):
+  for record in records:
+    file.write(record)
+  file.flush()
+
+
+def write_chunked(records, file):
+  stream.write(records, file, stream.chunk_size())
+
+
+def timed(write, records):
+  """Return seconds to write records to a pipe drained by a reader thread."""
+
+  r, w = os.pipe()
+  chunk_size = stream.chunk_size()
+
+  def drain():
+    with open(r, 'rb', buffering=0) as f:
+      while f.read(chunk_size):
+        pass
+
+  reader = threading.Thread(target=drain)
+  reader.start()
+  with open(w, 'wb') as f:
+    t = time.perf_counter()
+    write(records, f)
+    elapsed = time.perf_counter() - t
+  reader.join()
+  return elapsed
+
+
+def bench(id, start, stop):
+  records = list(data.iter_records(id, start, stop))
+  n_rows = sum(record.count(b'\n') for record in records)
+  n_bytes = sum(len(record) for record in records)
+  print(f"{id} {start} {stop}: {n_rows} rows, {n_bytes} bytes, {len(records)} records")
+  for name, write in [('print', write_print), ('records', write_records), ('chunked', write_chunked)]:
+    elapsed = min(timed(write, records) for _ in range(REPEATS))
+    print(f"  {name:8s} {elapsed:.4f} s {n_rows/elapsed:12.0f} rows/s")
+
+
+if __name__ == '__main__':
+  requests = REQUESTS
+  if len(sys.argv) > 3:
+    requests = [tuple(sys.argv[1:4])]
+  for request in requests:
+    bench(*request)
@@ -0,0 +1,191 @@
+# Usage:
+#   python generate.py <out_dir> [--stations N] [--days N] [--start YYYY-MM-DD]
+#                      [--seed N] [--cadence S] [--gaps F]
+#
+# Generate a synthetic PSWS data tree in <out_dir> with the layout of
+# PSWS_DATA_DIR and files in each format that data.py and check_files.py
+# read:
+#
+#   S<n>/magData/OBS<date>T00_00.zip     one runmag.log file per day with
+#                                        JSON rows, 10-column quoted rows, or
+#                                        9-column quoted rows, in turn
+#   N<n>/csvData/<date>T000000Z_...csv   Grape doppler CSV with header
+#
+# --stations is the number of stations of each type. Files are the same for
+# the same arguments and numpy version, including the zip file timestamps, so
+# trees generated on different hosts can be compared. A fraction --gaps of
+# rows is omitted at random.
+#
+# Examples:
+#   python generate.py /tmp/psws-bench --stations 3 --days 2
+#   PSWS_DATA_DIR=/tmp/psws-bench python ../data.py S000001/mag 2025-01-01T00:00:00Z 2025-01-02T00:00:00Z
+
+import os
+import sys
+import zipfile
+import argparse
+import datetime
+
+MAG_FORMATS = ['json', 'quoted10', 'quoted9']
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+          'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def mag_format(station):
+  """Return row format used for magnetometer station number `station`."""
+  return MAG_FORMATS[station % len(MAG_FORMATS)]
+
+
+def mag_id(station):
+  return f'S{station:06d}'
+
+
+def doppler_id(station):
+  return f'N{station:06d}'
+
+
+def rng_for(seed, station, date, kind):
+  """Return random number generator for one file."""
+  import numpy as np
+  return np.random.default_rng([seed, station, date.toordinal(), kind])
+
+
+def seconds(cadence, gaps, rng):
+  """Return seconds since midnight of rows in a day."""
+  import numpy as np
+  s = np.arange(0, 86400, cadence)
+  return s[rng.random(len(s)) >= gaps]
+
+
+def mag_ts(date, s):
+  """Return list of time stamps for seconds since midnight s on date."""
+  day = f'{date.day:02d} {MONTHS[date.month - 1]} {date.year}'
+  return [f'{day} {t // 3600:02d}:{t // 60 % 60:02d}:{t % 60:02d}' for t in s.tolist()]
+
+
+# Row formats, with values in the order of MAG_ORDER.
+MAG_ROW = {
+  'json': '{ "ts":"%s", "rt":%.2f, "lt":%.2f, "x":%.2f, "y":%.2f, "z":%.2f, '
+          '"rx":%d, "ry":%d, "rz":%d, "Tm": %.5f }',
+  'quoted10': '"%s", %.2f, %.2f, %.2f, %.2f, %.2f, %d, %d, %d, %.5f',
+  # As written by stations such as S000082
+  'quoted9': '"%s", %.2f, %.4f, %.4f, %.4f, %d, %d, %d, %.4f',
+}
+
+MAG_ORDER = {
+  'json': ['rt', 'lt', 'x', 'y', 'z', 'rx', 'ry', 'rz', 'Tm'],
+  'quoted9': ['rt', 'x', 'y', 'z', 'rx', 'ry', 'rz', 'Tm'],
+}
+# The values of JSON rows, in the same order, without the keys.
+MAG_ORDER['quoted10'] = MAG_ORDER['json']
+
+
+def mag_values(s, rng):
+  """Return dict of magnetometer value arrays at seconds since midnight s."""
+  import numpy as np
+  phase = 2 * np.pi * s / 86400
+  n = len(s)
+  x = -46000 + 200 * np.sin(phase) + rng.normal(0, 30, n)
+  y = -13400 + 100 * np.cos(phase) + rng.normal(0, 30, n)
+  z = 16300 + 50 * np.sin(2 * phase) + rng.normal(0, 30, n)
+  return {
+    'x': x, 'y': y, 'z': z,
+    'rx': (x * 1.5).astype(int), 'ry': (y * 1.5).astype(int), 'rz': (z * 1.5).astype(int),
+    'rt': 30 + 3 * np.sin(phase) + rng.random(n),
+    'lt': 40 + 5 * np.sin(phase) + rng.random(n),
+    'Tm': np.sqrt(x * x + y * y + z * z)
+  }
+
+
+def mag_lines(format, date, s, values):
+  """Return rows in `format` for seconds since midnight s on date."""
+  columns = [values[name].tolist() for name in MAG_ORDER[format]]
+  return list(map(MAG_ROW[format].__mod__, zip(mag_ts(date, s), *columns)))
+
+
+def write_mag_day(out_dir, station, date, cadence, gaps, seed):
+  rng = rng_for(seed, station, date, 0)
+  s = seconds(cadence, gaps, rng)
+  lines = mag_lines(mag_format(station), date, s, mag_values(s, rng))
+
+  dir = os.path.join(out_dir, mag_id(station), 'magData')
+  os.makedirs(dir, exist_ok=True)
+  file = os.path.join(dir, f'OBS{date.isoformat()}T00_00.zip')
+  info = zipfile.ZipInfo(f'{mag_id(station)}-{date:%Y%m%d}-runmag.log',
+                         date_time=(date.year, date.month, date.day, 23, 59, 59))
+  info.compress_type = zipfile.ZIP_DEFLATED
+  with zipfile.ZipFile(file, 'w') as z:
+    z.writestr(info, '\n'.join(lines) + '\n')
+  return file
+
+
+def doppler_header(station, date):
+  node = f'N{station:07d}'
+  return '\n'.join([
+    f'#,{date.isoformat()}T00:00:00Z,{node},EN91fh,41.3219273, -81.5047731, 285,Macedonia Ohio,G1,WWV5',
+    '#######################################',
+    '# MetaData for Grape Gen 1 Station',
+    '#',
+    f'# Station Node Number      {node}',
+    '# Callsign                 N0CALL',
+    '# Grid Square              EN91fh',
+    '# Lat, Long, Elv           41.3219273, -81.5047731, 285',
+    '# City State               Macedonia Ohio',
+    '# Radio1                   Grape Gen 1 Rcvr 1',
+    '# Radio1ID                 G1',
+    '# Antenna                  80M OCF Dipole',
+    '# Frequency Standard       LB GPSDO',
+    '#',
+    '# Beacon Now Decoded       WWV5',
+    '#',
+    '#######################################',
+    'UTC,Freq,Vpk'
+  ])
+
+
+def write_doppler_day(out_dir, station, date, cadence, gaps, seed):
+  rng = rng_for(seed, station, date, 1)
+  s = seconds(cadence, gaps, rng)
+  freq = 5000000 + rng.normal(0, 0.05, len(s))
+  vpk = abs(rng.normal(0.3, 0.1, len(s)))
+  day = date.isoformat()
+  ts = [f'{day}T{t // 3600:02d}:{t // 60 % 60:02d}:{t % 60:02d}Z' for t in s.tolist()]
+  lines = [doppler_header(station, date)]
+  lines += map('%s,  %.3f, %.6f'.__mod__, zip(ts, freq.tolist(), vpk.tolist()))
+
+  dir = os.path.join(out_dir, doppler_id(station), 'csvData')
+  os.makedirs(dir, exist_ok=True)
+  file = os.path.join(dir, f'{date.isoformat()}T000000Z_N{station:07d}_G1_EN91fh_FRQ_WWV5.csv')
+  with open(file, 'w') as f:
+    f.write('\n'.join(lines) + '\n')
+  return file
+
+
+def generate(out_dir, stations=3, days=2, start='2025-01-01', seed=0, cadence=1, gaps=0.0):
+  """Write synthetic tree to out_dir. Returns list of files written."""
+
+  start = datetime.date.fromisoformat(start)
+  files = []
+  for k in range(days):
+    date = start + datetime.timedelta(days=k)
+    for station in range(1, stations + 1):
+      files.append(write_mag_day(out_dir, station, date, cadence, gaps, seed))
+      files.append(write_doppler_day(out_dir, station, date, cadence, gaps, seed))
+  return files
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Generate a synthetic PSWS data tree.")
+  parser.add_argument('out_dir')
+  parser.add_argument('--stations', type=int, default=3, help="stations of each type")
+  parser.add_argument('--days', type=int, default=2)
+  parser.add_argument('--start', default='2025-01-01', help="first day, YYYY-MM-DD")
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--cadence', type=int, default=1, help="seconds between rows")
+  parser.add_argument('--gaps', type=float, default=0.0, help="fraction of rows omitted")
+  args = parser.parse_args()
+
+  files = generate(args.out_dir, args.stations, args.days, args.start,
+                   args.seed, args.cadence, args.gaps)
+  print(f"Wrote {len(files)} files to {args.out_dir}", file=sys.stderr)
@@ -0,0 +1,55 @@
+# Usage:
+#   python build_catalog.py [<data_dir>] [<catalog_file>]
+#
+# Update the start and stop dates in catalog.csv, which is used by
+# catalog.py and info.py, from the first and last files of each dataset in
+# <data_dir>, and add datasets found in <data_dir> that are not in it. The
+# location of doppler datasets is taken from the file headers. See
+# psws/stations.py.
+#
+# Results for each dataset are kept in <cache_dir>/catalog.json, and only
+# datasets whose directory, first file or last file changed since the last
+# run are read again, so it is cheap to run from cron.
+#
+# <data_dir> defaults to the PSWS_DATA_DIR environment variable or ../data
+# relative to this script. <catalog_file> defaults to catalog.csv in the
+# directory of this script. The cache directory is PSWS_CACHE_DIR or ../cache
+# relative to this script.
+#
+# Example:
+#   python build_catalog.py
+#   PSWS_DATA_DIR=/data/psws python build_catalog.py
+
+import os
+import sys
+import time
+
+from psws import catalog, data, stations
+
+
+if __name__ == "__main__":
+  if len(sys.argv) > 1:
+    data_dir = os.path.abspath(os.path.expanduser(sys.argv[1]))
+  else:
+    data_dir = data.default_data_dir()
+  cache_dir = data.default_cache_dir()
+  catalog_file = catalog.CATALOG_FILE
+  if len(sys.argv) > 2:
+    catalog_file = os.path.abspath(os.path.expanduser(sys.argv[2]))
+
+  if not os.path.isdir(data_dir):
+    print(f"Error: Data directory not found: {data_dir}", file=sys.stderr)
+    sys.exit(1)
+
+  t = time.time()
+  state, n_read = stations.scan(data_dir, cache_dir, stations.load_state(cache_dir))
+  stations.save_state(state, cache_dir)
+
+  for id, entry in state.items():
+    if 'error' in entry:
+      print(f"{id}: could not read: {entry['error']}", file=sys.stderr)
+
+  changed = stations.write(stations.rows(state, catalog_file), catalog_file)
+
+  print(f"{len(state)} datasets in {data_dir}, {n_read} read ({time.time() - t:.2f} s)")
+  print(f"{catalog_file} {'updated' if changed else 'unchanged'}")
@@ -0,0 +1,81 @@
+# Usage:
+#   python bulk.py <type> <region>
+#   python bulk.py <type> <region> <start> <stop>
+#   python bulk.py <type> <region> <start> <stop> <parameters>
+#
+# <type> is the part of the dataset ids after the station, e.g., mag,
+# doppler or mag/PT1M
+# <region> is a box W,S,E,N in degrees of longitude and latitude or a circle
+# LAT,LONG,KM; boxes with W > E cross the antimeridian
+# <start> and <stop> are HAPI ISO date strings, as for data.py
+# <parameters> is a comma-separated list of parameters; all if empty
+#
+# With two arguments, the datasets of <type> in <region> found in catalog.csv
+# are written to stdout as JSON (see psws/spatial.py), nearest first for a
+# circle. Otherwise, their data in [<start>, <stop>) is written as HAPI CSV
+# with the dataset id as the first column, one dataset after the other (see
+# psws.data.iter_bulk()). The files of all datasets are decoded in
+# PSWS_WORKERS processes (default: the number of CPUs).
+#
+# The output is the same as the response from:
+#   hapi/stations?type=<type>&region=<region>
+#   hapi/bulk?type=<type>&region=<region>&start=<start>&stop=<stop>&parameters=<parameters>
+#
+# Examples:
+#
+#  python bulk.py mag -100,30,-70,45
+#  python bulk.py mag 41.354,-75.625,1000
+#  python bulk.py mag -100,30,-70,45 2025-10-20T00:00:00Z 2025-10-21T00:00:00Z
+#  python bulk.py mag/PT1M 41.354,-75.625,1000 2025-10-20T00:00:00Z 2025-10-21T00:00:00Z Field_Vector_mean
+
+import sys
+import json
+
+from psws import data, spatial, stream, timing
+
+
+def error(emsg):
+  print(f"Error: {emsg}", file=sys.stderr)
+  sys.exit(1)
+
+
+def main():
+  if len(sys.argv) not in [3, 5, 6]:
+    msg = "Two or at least four command line arguments needed:\n"
+    msg += "  python bulk.py <type> <region> [<start> <stop> [<parameters>]]"
+    error(msg)
+
+  type = sys.argv[1]
+
+  try:
+    stations = spatial.query(spatial.region(sys.argv[2]), type)
+  except (OSError, ValueError) as e:
+    error(str(e))
+
+  if len(sys.argv) == 3:
+    print(json.dumps(stations, indent=2))
+    return
+
+  start, stop = sys.argv[3], sys.argv[4]
+
+  parameters = None
+  if len(sys.argv) > 5 and sys.argv[5].strip() != "":
+    parameters = [p.strip() for p in sys.argv[5].split(",")]
+
+  ids = [station['id'] for station in stations]
+
+  started = timing.clock()
+  request = {'ids': ids, 'start': start, 'stop': stop, 'parameters': parameters}
+
+  try:
+    records = data.iter_bulk(ids, start, stop, parameters)
+    n_bytes = stream.write(records, sys.stdout.buffer, stream.chunk_size())
+  except data.ERRORS as e:
+    timing.report({**request, 'error': str(e)}, started)
+    error(str(e))
+
+  timing.report({**request, 'bytes': n_bytes}, started)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,95 @@
+# Usage:
+#   python cache.py [<data_dir>] [<cache_dir>]
+#
+# Decode the data files for all stations in <data_dir> and write them to the
+# columnar cache in <cache_dir> that data.py reads from; see psws/cache.py.
+# The aggregates for the PT1M and PT1H datasets are also written; see
+# psws/tiers.py.
+# Files with an up-to-date cache entry are skipped, so this can be rerun to
+# backfill only new or modified files.
+#
+# <data_dir> defaults to the PSWS_DATA_DIR environment variable or ../data
+# relative to this script. <cache_dir> defaults to the PSWS_CACHE_DIR
+# environment variable or ../cache relative to this script.
+#
+# Examples:
+#   python cache.py
+#   PSWS_DATA_DIR=/data/psws PSWS_CACHE_DIR=/data/psws-cache python cache.py
+
+import os
+import sys
+import time
+
+from psws import cache, data, doppler, mag, manifest, tiers
+
+
+def build(filepath, entry_dir, data_type):
+  """Write cache entry for filepath. Returns False if entry was up-to-date."""
+
+  if cache.current(entry_dir, filepath) is not None:
+    return False
+
+  stat = cache.source_stat(filepath)
+  if data_type == 'mag':
+    day, decimals = mag.decode_file(filepath), None
+  else:
+    day, decimals = doppler.decode_exact(filepath)
+  cache.write(entry_dir, filepath, day, decimals=decimals, stat=stat)
+  return True
+
+
+def build_tiers(filepath, data_type, cache_dir, rel_path):
+  """Write aggregates for filepath. Returns False if they were up-to-date."""
+  for cadence in tiers.CADENCES:
+    entry_dir = tiers.entry_dir(cache_dir, cadence, rel_path)
+    if cache.current(entry_dir, filepath, tiers.VERSION) is None:
+      tiers.build(filepath, data_type, cadence, cache_dir, rel_path)
+      return True
+  return False
+
+
+def build_all(data_dir, cache_dir):
+  counts = {'written': 0, 'current': 0, 'failed': 0, 'rows': 0}
+  for rel_dir, dataset_dir, data_type in data.datasets(data_dir):
+    manifest_file = manifest.manifest_file(cache_dir, rel_dir)
+    for name in manifest.load(dataset_dir, data_type, manifest_file)['files']:
+      filepath = os.path.join(dataset_dir, name)
+      entry_dir = cache.day_dir(cache_dir, os.path.join(rel_dir, name))
+      try:
+        written = build(filepath, entry_dir, data_type)
+        if written:
+          counts['rows'] += cache.meta(entry_dir)['rows']
+        written = build_tiers(filepath, data_type, cache_dir, os.path.join(rel_dir, name)) or written
+        if written:
+          counts['written'] += 1
+          print(f"  {rel_dir}/{name}: written")
+        else:
+          counts['current'] += 1
+      except Exception as e:
+        counts['failed'] += 1
+        print(f"  {rel_dir}/{name}: failed: {e}", file=sys.stderr)
+  return counts
+
+
+if __name__ == "__main__":
+  if len(sys.argv) > 1:
+    data_dir = os.path.abspath(os.path.expanduser(sys.argv[1]))
+  else:
+    data_dir = data.default_data_dir()
+  if len(sys.argv) > 2:
+    cache_dir = os.path.abspath(os.path.expanduser(sys.argv[2]))
+  else:
+    cache_dir = data.default_cache_dir()
+
+  if not os.path.isdir(data_dir):
+    print(f"Error: Data directory not found: {data_dir}", file=sys.stderr)
+    sys.exit(1)
+
+  t_start = time.time()
+  counts = build_all(data_dir, cache_dir)
+  dt = time.time() - t_start
+  print(f"Cache entries in {cache_dir}: {counts['written']} written "
+        f"({counts['rows']} rows), {counts['current']} up-to-date, "
+        f"{counts['failed']} failed ({dt:.2f} s)")
+  if counts['failed'] > 0:
+    sys.exit(1)
@@ -5,21 +5,11 @@
 #
 # Equivalent API response to:
 #   hapi/catalog
+#
+# The response is computed by psws.catalog.document(); see psws/catalog.py.
 
+import sys
 
-import csv
-import json
-
-from pathlib import Path
-
-SCRIPT_DIR = Path(__file__).resolve().parent
-
-catalog = []
-with open(SCRIPT_DIR / 'catalog.csv', 'r') as csvfile:
-  reader = csv.reader(csvfile)
-  for row in reader:
-    if row[0].startswith('#'):
-      continue
-    catalog.append({"id": row[0].strip()})
+from psws import catalog
 
-print(json.dumps(catalog, indent=2))
\ No newline at end of file
+sys.stdout.buffer.write(catalog.document().body)
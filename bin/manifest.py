@@ -0,0 +1,52 @@
+# Usage:
+#   python manifest.py [<data_dir>] [<cache_dir>]
+#
+# Build or update the file manifests used by data.py for all dataset
+# directories in <data_dir>, e.g., <data_dir>/S000028/magData. Only manifests
+# of directories modified since their manifest was built are rebuilt.
+#
+# <data_dir> defaults to the PSWS_DATA_DIR environment variable or ../data
+# relative to this script. <cache_dir> defaults to the PSWS_CACHE_DIR
+# environment variable or ../cache relative to this script.
+#
+# Example:
+#   python manifest.py
+#   PSWS_DATA_DIR=/data/psws python manifest.py
+
+import os
+import sys
+import time
+
+from psws import data, manifest
+
+
+def build_all(data_dir, cache_dir):
+  n_dirs = 0
+  n_files = 0
+  for rel_dir, dataset_dir, data_type in data.datasets(data_dir):
+    manifest_file = manifest.manifest_file(cache_dir, rel_dir)
+    files = manifest.load(dataset_dir, data_type, manifest_file)['files']
+    print(f"{rel_dir}: {len(files)} files")
+    n_dirs += 1
+    n_files += len(files)
+  return n_dirs, n_files
+
+
+if __name__ == "__main__":
+  if len(sys.argv) > 1:
+    data_dir = os.path.abspath(os.path.expanduser(sys.argv[1]))
+  else:
+    data_dir = data.default_data_dir()
+  if len(sys.argv) > 2:
+    cache_dir = os.path.abspath(os.path.expanduser(sys.argv[2]))
+  else:
+    cache_dir = data.default_cache_dir()
+
+  if not os.path.isdir(data_dir):
+    print(f"Error: Data directory not found: {data_dir}", file=sys.stderr)
+    sys.exit(1)
+
+  t_start = time.time()
+  n_dirs, n_files = build_all(data_dir, cache_dir)
+  dt = time.time() - t_start
+  print(f"Manifests for {n_dirs} directories with {n_files} files in {cache_dir} ({dt:.2f} s)")
@@ -0,0 +1,33 @@
+# Usage:
+#   python metrics.py [<metrics_file>]
+#
+# Returns, in JSON format to stdout, the number of data requests, errors,
+# a histogram of request times and the time, bytes and rows of each stage,
+# for each dataset type, e.g., mag, doppler and mag/PT1M. See psws/metrics.py.
+#
+# The requests are those whose summaries data.py appended to <metrics_file>,
+# which defaults to the PSWS_METRICS_FILE environment variable. The in-process
+# server returns the same for the requests it answered at /hapi/metrics.
+#
+# Example:
+#   PSWS_METRICS_FILE=/tmp/psws-metrics.jsonl python data.py S000028/mag 2025-10-20T00:00:00Z 2025-10-21T00:00:00Z > /dev/null
+#   python metrics.py /tmp/psws-metrics.jsonl
+
+import sys
+import json
+
+from psws import metrics
+
+file = sys.argv[1] if len(sys.argv) > 1 else metrics.metrics_file()
+if file is None:
+  print("No metrics file given and PSWS_METRICS_FILE not set.", file=sys.stderr)
+  exit(1)
+
+try:
+  aggregate = metrics.read(file)
+except OSError as e:
+  print(f"Could not read {file}: {e}", file=sys.stderr)
+  exit(1)
+
+result = {'buckets': metrics.BUCKETS, 'datasets': aggregate}
+print(json.dumps(result, indent=2))
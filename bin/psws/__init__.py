@@ -0,0 +1,4 @@
+# Shared readers and writers used by the scripts in bin/.
+#
+# The scripts in bin/ are run as `python bin/<script>.py`, which puts bin/ on
+# sys.path, so this package is importable as `psws` from them.
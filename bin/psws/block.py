@@ -0,0 +1,77 @@
+# A block is a dict of equal-length numpy arrays of rows, one array per
+# column, with row times in a datetime64 'time' column.
+
+# Fill value of the parameters, as in the info templates.
+FILL = 99999.0
+
+
+def select(block, start, stop):
+  """Return (rows of block with start <= time < stop, True if a row >= stop).
+
+  start and stop are numpy datetime64 values. As for a row-by-row read of
+  time-ordered rows, rows before start are skipped and rows after the first
+  row at or after stop are not used.
+  """
+  time = block['time']
+  after_stop = time >= stop
+  stopped = bool(after_stop.any())
+  end = int(after_stop.argmax()) if stopped else len(time)
+  keep = time[0:end] >= start
+  return {name: values[0:end][keep] for name, values in block.items()}, stopped
+
+
+def rows(block):
+  """Return number of rows in block."""
+  return len(block['time'])
+
+
+def aggregate(block, seconds, fill=FILL):
+  """Return block with the mean, min and max of each column in time bins.
+
+  Bins are `seconds` long and start at multiples of `seconds` since
+  1970-01-01. The time of each row is the start of its bin, and column <name>
+  of block becomes columns <name>_mean, <name>_min and <name>_max. Bins
+  without rows are omitted. Values equal to fill and NaNs are not used, and
+  the aggregates of a bin with no other values are fill.
+  """
+
+  import numpy as np
+
+  time = block['time'].astype('datetime64[s]').astype(np.int64)
+  order = None
+  if len(time) > 1 and (time[1:] < time[:-1]).any():
+    order = np.argsort(time, kind='stable')
+    time = time[order]
+
+  bins = time // seconds
+  starts = np.flatnonzero(np.concatenate(([True], bins[1:] != bins[:-1])))[0:len(bins)]
+
+  result = {'time': (bins[starts] * seconds).astype('datetime64[s]')}
+  for name, values in block.items():
+    if name == 'time':
+      continue
+    if order is not None:
+      values = values[order]
+    if len(starts) == 0:
+      mean = np.array([], dtype=np.float64)
+      minimum = maximum = values[0:0]
+    else:
+      valid = values != fill
+      if values.dtype.kind == 'f':
+        valid &= ~np.isnan(values)
+        low, high = -np.inf, np.inf
+      else:
+        low, high = np.iinfo(values.dtype).min, np.iinfo(values.dtype).max
+      counts = np.add.reduceat(valid.astype(np.int64), starts)
+      empty = counts == 0
+      total = np.add.reduceat(np.where(valid, values, 0).astype(np.float64), starts)
+      mean = np.where(empty, fill, total / np.maximum(counts, 1))
+      minimum = np.minimum.reduceat(np.where(valid, values, high), starts)
+      maximum = np.maximum.reduceat(np.where(valid, values, low), starts)
+      minimum = np.where(empty, fill, minimum).astype(values.dtype)
+      maximum = np.where(empty, fill, maximum).astype(values.dtype)
+    result[f'{name}_mean'] = mean
+    result[f'{name}_min'] = minimum
+    result[f'{name}_max'] = maximum
+
+  return result
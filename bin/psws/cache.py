@@ -0,0 +1,150 @@
+# Columnar cache of decoded data files, one directory per station-day:
+#
+#   PSWS_CACHE_DIR/day/S000028/magData/OBS2025-10-20T00_00.zip/
+#     meta.json   source file size and mtime, column dtypes and decimals
+#     time.npy    datetime64[s]
+#     x.npy, ...  one file per column
+#
+# Columns are .npy files so that a request can memory-map only the columns
+# it needs. An entry is used only if the size and mtime of the source file
+# match those recorded in meta.json when the entry was written and it was
+# written with the current VERSION of the decoders.
+
+import os
+import json
+import threading
+
+META_FILE = 'meta.json'
+
+# Writers of an entry in this process hold the lock of the entry directory
+# in _locks, chosen by hash, so that the columns and meta.json of an entry
+# are from the same writer.
+_locks = [threading.Lock() for _ in range(64)]
+
+# Changing how data files are decoded, e.g., the dtype of a column, changes
+# this, so that entries written before are not used. Entries without a
+# version were written before versions were recorded. 2: integer columns of
+# quoted mag rows are int64. 3: quoted10 mag rows have the JSON column order.
+VERSION = 3
+
+
+def day_dir(cache_dir, rel_path):
+  """Return cache directory for data file data_dir/rel_path."""
+  return os.path.join(cache_dir, 'day', rel_path)
+
+
+def source_stat(source):
+  """Return the size and mtime of source that an entry is valid for."""
+  stat = os.stat(source)
+  return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def meta(entry_dir):
+  """Return content of meta.json for cache entry or None if not found."""
+  try:
+    with open(os.path.join(entry_dir, META_FILE), 'r') as f:
+      return json.load(f)
+  except (OSError, ValueError):
+    return None
+
+
+def current(entry_dir, source, version=VERSION):
+  """Return meta for entry if it is up-to-date with source and version, else None."""
+  entry_meta = meta(entry_dir)
+  if entry_meta is None or entry_meta.get('source') != source_stat(source) \
+      or entry_meta.get('version') != version:
+    return None
+  return entry_meta
+
+
+def read(entry_dir, source, names, version=VERSION):
+  """Return (block, decimals) for columns in names or None if out-of-date.
+
+  block has 'time' and the columns in names as read-only memory-mapped
+  arrays. decimals is a list with the decimals for each column in names.
+  """
+
+  entry_meta = current(entry_dir, source, version)
+  if entry_meta is None or not set(names) <= set(entry_meta['columns']):
+    return None
+
+  # Imported here so that checking for an entry does not require numpy.
+  import numpy as np
+
+  block = {}
+  for name in ['time', *names]:
+    file = os.path.join(entry_dir, f'{name}.npy')
+    try:
+      block[name] = np.load(file, mmap_mode='r')
+    except (OSError, ValueError):
+      return None
+  decimals = [entry_meta['decimals'].get(name) for name in names]
+
+  return block, decimals
+
+
+def write(entry_dir, source, block, decimals=None, stat=None, version=VERSION):
+  """Write cache entry with the columns in block for source.
+
+  stat is the size and mtime of source when it was read; if None, it is
+  obtained now. version is recorded for current(). Each file is written to
+  a temporary file and renamed so that readers never see partially written
+  files, and meta.json is written last. Threads writing the same entry take
+  turns.
+  """
+
+  import numpy as np
+
+  if stat is None:
+    stat = source_stat(source)
+  if decimals is None:
+    decimals = {}
+
+  entry_meta = {
+    'version': version,
+    'source': stat,
+    'rows': len(block['time']),
+    'columns': {name: str(values.dtype) for name, values in block.items() if name != 'time'},
+    'decimals': {name: decimals.get(name) for name in block if name != 'time'}
+  }
+
+  with _lock(entry_dir):
+    meta_file = _invalidate(entry_dir)
+    for name, values in block.items():
+      _replace(os.path.join(entry_dir, f'{name}.npy'),
+               lambda f: np.save(f, np.ascontiguousarray(values)))
+    _replace(meta_file, lambda f: f.write(json.dumps(entry_meta, indent=2).encode()))
+
+
+def _lock(entry_dir):
+  """Return the lock held while entry_dir is written."""
+  return _locks[hash(os.path.abspath(entry_dir)) % len(_locks)]
+
+
+def _invalidate(entry_dir):
+  """Create entry_dir and remove its meta.json, if any, while it is written.
+
+  Returns the path of meta.json.
+  """
+  os.makedirs(entry_dir, exist_ok=True)
+  meta_file = os.path.join(entry_dir, META_FILE)
+  try:
+    os.remove(meta_file)
+  except FileNotFoundError:
+    pass
+  return meta_file
+
+
+def _replace(file, write):
+  # The thread is part of the name, as threads of a server share a pid.
+  tmp_file = f'{file}.{os.getpid()}.{threading.get_ident()}.tmp'
+  try:
+    with open(tmp_file, 'wb') as f:
+      write(f)
+    os.replace(tmp_file, file)
+  except BaseException:
+    try:
+      os.remove(tmp_file)
+    except OSError:
+      pass
+    raise
@@ -0,0 +1,63 @@
+# Responses to HAPI catalog requests and the station metadata in
+# bin/catalog.csv, which has one row per dataset:
+#
+#   # id, nickname,startDateTime, stopDateTime, lat, long, elevation
+#   S000028/mag,W2NAF,2022-12-06T00:00:00Z,2025-10-21T03:01:00Z,41.354,-75.625,480.0
+#
+# The file is parsed and the response compiled once and reused until the file
+# changes; see response.py.
+
+import os
+import csv
+
+from psws import response
+
+CATALOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'catalog.csv')
+
+
+def get_catalog(file=CATALOG_FILE):
+  """Return dict with metadata for each dataset id in catalog file.
+
+  The dict is shared by all callers until the file changes and must not be
+  modified.
+  """
+  return response.cached(('get_catalog', file), [file], lambda: _read(file))
+
+
+def _read(file):
+  catalog = {}
+  with open(file, 'r') as csvfile:
+    reader = csv.reader(csvfile)
+    for row in reader:
+      if row[0].startswith('#'):
+        continue
+      catalog[row[0].strip()] = {
+        'nickname': row[1].strip(),
+        'startDateTime': row[2].strip(),
+        'stopDateTime': row[3].strip(),
+        'lat': _float(row[4]),
+        'long': _float(row[5]),
+        'elevation': _float(row[6])
+      }
+  return catalog
+
+
+def _float(value):
+  # Location is not known for some stations.
+  return float(value) if value.strip() else None
+
+
+def catalog(file=CATALOG_FILE):
+  """Return list of {"id": id} for datasets in catalog file.
+
+  Each dataset is followed by its aggregate datasets; see tiers.py.
+  """
+  from psws import tiers
+  return [{"id": i} for id in get_catalog(file) for i in [id, *tiers.ids(id)]]
+
+
+def document(file=CATALOG_FILE):
+  """Return response.Document for the catalog response."""
+  def build():
+    return response.compile_document(catalog(file), response.mtime_ns([file]))
+  return response.cached(('catalog', file), [file], build)
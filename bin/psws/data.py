@@ -0,0 +1,496 @@
+# Responses to HAPI data requests, e.g.,
+#
+#   from psws import data
+#   for chunk in data.iter_records('S000028/mag', '2025-10-20T00:00:00Z',
+#                                  '2025-10-21T00:00:00Z', ['Field_Vector']):
+#     ...
+#
+# iter_records() yields the HAPI CSV or binary response as chunks of bytes, so
+# it can be called in-process by a server. bin/data.py writes the chunks to
+# stdout. iter_bulk() yields the data of several datasets, e.g., the stations
+# found by spatial.query(), in one CSV response; see bin/bulk.py.
+#
+# Data files are found in PSWS_DATA_DIR in subdirectories of the station
+# directory, e.g., S000028/magData for dataset S000028/mag. Files derived from
+# the data, e.g., file manifests, the columnar cache and block-compressed
+# copies of the mag files (see frames.py), are kept in PSWS_CACHE_DIR.
+#
+# If timing is enabled (see timing.py), the time spent in each stage of a
+# request is recorded, including in worker processes.
+
+import os
+import sys
+import zipfile
+import threading
+
+from psws import cache, days, frames, manifest, tiers, timing
+
+debug = False # Print debug messages to stderr
+
+# Subdirectory of station directory with files for each dataset type.
+SUB_DIRS = {
+  'mag': 'magData',
+  'doppler': 'csvData',
+  'drf': '',
+}
+
+# Parameters returned if none are requested.
+PARAMETERS = {
+  'mag': ['Field_Vector', 'rxryrz', 'rt', 'lt', 'Tm'],
+  'doppler': ['Freq', 'Vpk']
+}
+
+# Values of the HAPI format request parameter that are supported.
+FORMATS = ['csv', 'binary']
+
+# Errors raised by reading the files of a request, e.g., a missing directory
+# or a truncated or corrupt zip file.
+ERRORS = (OSError, ValueError, zipfile.BadZipFile, KeyError, IndexError)
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+
+# Process pools used to decode files, keyed by number of workers. A server
+# decodes requests in several threads, which share the pools.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def log(msg):
+  if debug:
+    print(f"Debug: {msg}", file=sys.stderr)
+
+
+def default_data_dir():
+  """Return PSWS_DATA_DIR or, if not set, data/ in the repository."""
+
+  data_dir_default = os.path.join(BASE_DIR, "data")
+  log(f"data_dir_default: {data_dir_default}")
+
+  # Get data_dir from environment variable
+  data_dir = os.getenv("PSWS_DATA_DIR", None)
+  log(f"PSWS_DATA_DIR: {data_dir}")
+
+  if not data_dir and not os.path.exists(data_dir_default):
+    msg = "Environment variable PSWS_DATA_DIR not set and directory "
+    msg += f"{data_dir_default} not found."
+    raise FileNotFoundError(msg)
+
+  if not data_dir:
+    log(f"PSWS_DATA_DIR not set, using default for data_dir: {data_dir_default}")
+    data_dir = data_dir_default
+
+  # Make data_dir an absolute path
+  return os.path.abspath(os.path.expanduser(data_dir))
+
+
+def default_cache_dir():
+  """Return PSWS_CACHE_DIR or, if not set, cache/ in the repository."""
+
+  cache_dir = os.getenv("PSWS_CACHE_DIR", None)
+  if not cache_dir:
+    cache_dir = os.path.join(BASE_DIR, "cache")
+  log(f"cache_dir: {cache_dir}")
+
+  return os.path.abspath(os.path.expanduser(cache_dir))
+
+
+def default_workers():
+  """Return PSWS_WORKERS or, if not set, 1."""
+  return max(1, int(os.getenv("PSWS_WORKERS", "1")))
+
+
+def default_in_flight(workers):
+  """Return PSWS_IN_FLIGHT or, if not set, 2*workers."""
+  return max(1, int(os.getenv("PSWS_IN_FLIGHT", str(2 * workers))))
+
+
+def datasets(data_dir):
+  """Yield (rel_dir, dataset_dir, data_type) for dataset directories."""
+  with os.scandir(data_dir) as stations:
+    for station in sorted(stations, key=lambda e: e.name):
+      if not station.is_dir():
+        continue
+      for data_type in ['mag', 'doppler']:
+        rel_dir = os.path.join(station.name, SUB_DIRS[data_type])
+        dataset_dir = os.path.join(data_dir, rel_dir)
+        if os.path.isdir(dataset_dir):
+          yield rel_dir, dataset_dir, data_type
+
+
+def dataset_dir(id, data_dir):
+  """Return (data_type, rel_dir) for dataset id."""
+
+  data_type = id.split('/')[-1]
+  if data_type not in SUB_DIRS:
+    msg = f"Unknown dataset ID suffix for id '{id}'. "
+    msg += "Expected to end with '/mag', '/doppler', or '/drf'."
+    raise ValueError(msg)
+
+  # id = S000028/mag => S000028/magData
+  # id = S000028/doppler => S000028/csvData
+  # id = S000028/drf => S000028
+  dir_base = id.replace('/' + data_type, '')
+  rel_dir = os.path.join(dir_base, SUB_DIRS[data_type])
+  if not os.path.exists(os.path.join(data_dir, rel_dir)):
+    msg = f"Dataset directory does not exist: {os.path.join(data_dir, rel_dir)}"
+    raise FileNotFoundError(msg)
+
+  return data_type, rel_dir
+
+
+def files_needed(id, start, stop, data_dir, cache_dir):
+
+  data_type, rel_dir = dataset_dir(tiers.split_id(id)[0], data_dir)
+  if data_type not in PARAMETERS:
+    raise ValueError(f"Reading of dataset type '{data_type}' is not implemented.")
+
+  # Keep only day precision for file matching
+  start = start[0:10]
+  stop = stop[0:10]
+
+  log(f"Looking for file with data in range [{start}, {stop}]")
+
+  path = os.path.join(data_dir, rel_dir)
+  manifest_file = manifest.manifest_file(cache_dir, rel_dir)
+  files = manifest.load(path, data_type, manifest_file)
+  ext = manifest.FILE_TYPES[data_type][0]
+  log(f"Found {len(files['files'])} files that end with {ext} in {path}")
+
+  files = [os.path.join(path, file) for file in manifest.find(files, start, stop)]
+
+  if debug:
+    if len(files) == 0:
+      log(f"No files found with data in range [{start}, {stop}]")
+    else:
+      s = "s" if len(files) > 1 else ""
+      log(f"Found {len(files)} file{s} with data in range [{start}, {stop}]:")
+      files_join = "  \n:   ".join(files)
+      log(files_join)
+
+  return files
+
+
+def iter_records(id, start, stop, parameters=None, data_dir=None, cache_dir=None,
+                 format='csv', workers=None, in_flight=None):
+  """Yield HAPI data for dataset id in [start, stop) as chunks of bytes.
+
+  parameters is a list of parameter names; if None, all parameters are
+  returned. data_dir and cache_dir default to default_data_dir() and
+  default_cache_dir(). format is 'csv' or 'binary'. workers and in_flight
+  default to default_workers() and default_in_flight(workers).
+  """
+
+  if format not in FORMATS:
+    raise ValueError(f"Unsupported format '{format}'. Expected one of {FORMATS}.")
+
+  if data_dir is None:
+    data_dir = default_data_dir()
+  if cache_dir is None:
+    cache_dir = default_cache_dir()
+
+  log(f"dataset: {id}, start: {start}, stop: {stop}")
+
+  if workers is None:
+    workers = default_workers()
+  if in_flight is None:
+    in_flight = default_in_flight(workers)
+
+  with timing.stage('discover'):
+    files = files_needed(id, start, stop, data_dir, cache_dir)
+  args = [(id, file, start, stop, parameters, data_dir, cache_dir, format) for file in files]
+
+  if workers > 1 and len(files) > 1:
+    log(f"Decoding {len(files)} files using {workers} workers")
+    yield from records_parallel(args, workers, in_flight)
+    return
+
+  for file_args in args:
+    yield from records(*file_args)
+
+
+def iter_bulk(ids, start, stop, parameters=None, data_dir=None, cache_dir=None,
+              workers=None, in_flight=None):
+  """Yield HAPI CSV for datasets ids in [start, stop) with the dataset id first on each line.
+
+  The datasets are returned in the order of ids. Their files are decoded
+  together, in a pool of workers processes (default bulk_workers()), so that
+  datasets with one file each are also decoded in parallel. Datasets without
+  a data directory are skipped. Other arguments are as for iter_records().
+  """
+
+  if data_dir is None:
+    data_dir = default_data_dir()
+  if cache_dir is None:
+    cache_dir = default_cache_dir()
+  if workers is None:
+    workers = bulk_workers()
+  if in_flight is None:
+    in_flight = default_in_flight(workers)
+
+  args = []
+  with timing.stage('discover'):
+    for id in ids:
+      try:
+        files = files_needed(id, start, stop, data_dir, cache_dir)
+      except FileNotFoundError as e:
+        log(f"Skipping {id}: {e}")
+        continue
+      args += [(id, file, start, stop, parameters, data_dir, cache_dir, 'csv') for file in files]
+
+  if workers > 1 and len(args) > 1:
+    log(f"Decoding {len(args)} files of {len(ids)} datasets using {workers} workers")
+    results = records_parallel(args, workers, in_flight)
+  else:
+    results = (b''.join(records(*file_args)) for file_args in args)
+
+  try:
+    for file_args, result in zip(args, results):
+      if result:
+        prefix = file_args[0].encode() + b','
+        yield prefix + result[:-1].replace(b'\n', b'\n' + prefix) + result[-1:]
+  finally:
+    results.close()
+
+
+def bulk_workers():
+  """Return PSWS_WORKERS or, if not set, the number of CPUs."""
+  return max(1, int(os.getenv("PSWS_WORKERS", "0")) or os.cpu_count() or 1)
+
+
+def records_file(args):
+  """Return (bytes, stages) for one file. Called in worker processes.
+
+  bytes has all records for the file. stages is timing.snapshot() for the
+  file or None if timing is not enabled.
+  """
+  if not timing.enabled():
+    return b''.join(records(*args)), None
+  timing.reset()
+  result = b''.join(records(*args))
+  return result, timing.snapshot()
+
+
+def records_parallel(args, workers, in_flight):
+  """Yield records for each file in args, in order, using a process pool.
+
+  At most in_flight files are submitted at a time. The next file is submitted
+  when the output for the oldest is yielded. If the pool breaks, e.g., a
+  worker is killed or can not start, the pool is dropped and the files not
+  yet yielded are decoded in this process.
+  """
+
+  import collections
+  import concurrent.futures
+  import concurrent.futures.process
+
+  with _pools_lock:
+    pool = _pools.get(workers)
+    if pool is None:
+      pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+      _pools[workers] = pool
+
+  BrokenProcessPool = concurrent.futures.process.BrokenProcessPool
+  args = iter(args)
+  pending = collections.deque()  # (future, file_args) in order
+  rest = []                      # Files to decode in this process
+
+  def submit(file_args):
+    # Return False if the pool is broken.
+    try:
+      pending.append((pool.submit(records_file, file_args), file_args))
+      return True
+    except BrokenProcessPool:
+      rest.append(file_args)
+      return False
+
+  try:
+    for file_args in args:
+      if not submit(file_args) or len(pending) == in_flight:
+        break
+    while pending and not rest:
+      future, file_args = pending[0]
+      try:
+        result, stages = future.result()
+      except BrokenProcessPool:
+        break
+      pending.popleft()
+      if stages is not None:
+        timing.merge(stages)
+      file_args = next(args, None)
+      if file_args is not None:
+        submit(file_args)
+      yield result
+
+    if pending or rest:
+      log("Process pool failed; decoding remaining files in this process")
+      with _pools_lock:
+        if _pools.get(workers) is pool:
+          del _pools[workers]
+      rest = [file_args for _, file_args in pending] + rest
+      pending.clear()
+      for file_args in [*rest, *args]:
+        yield b''.join(records(*file_args))
+  finally:
+    # If the consumer stops early or a file fails, do not decode the rest.
+    for future, _ in pending:
+      future.cancel()
+
+
+def records(id, filename, start, stop, parameters, data_dir, cache_dir, format='csv'):
+
+  # Cache entry for file, which is used if it is up-to-date; see cache.py.
+  entry_dir = cache.day_dir(cache_dir, os.path.relpath(filename, data_dir))
+
+  id, cadence = tiers.split_id(id)
+  if cadence is not None:
+    yield records_tier(id, cadence, filename, start, stop, parameters,
+                       data_dir, cache_dir, format)
+    return
+
+  if id.endswith('/mag'):
+    frames_dir = frames.entry_dir(cache_dir, os.path.relpath(filename, data_dir))
+    yield from records_mag(filename, start, stop, parameters, entry_dir, format,
+                           frames_dir)
+
+  if id.endswith('/doppler'):
+    yield from records_doppler(filename, start, stop, parameters, entry_dir, format)
+
+
+def encode(time, columns, names, types, format, decimals=None):
+  """Return HAPI CSV or binary bytes for the columns with the given names."""
+
+  from psws import output
+
+  with timing.stage('format'):
+    if format == 'binary':
+      result = output.binary(time, columns, [types[name] for name in names])
+    else:
+      result = output.csv(time, columns, decimals)
+  timing.add('format', rows=len(time))
+  return result
+
+
+def records_tier(id, cadence, filepath, start, stop, parameters, data_dir, cache_dir,
+                 format='csv'):
+  """Return data from aggregate of file for dataset id at cadence."""
+
+  from psws import block, isotime
+
+  data_type = id.split('/')[-1]
+  if parameters is None:
+    parameters = tiers.parameters(data_type)
+  names = tiers.columns(data_type, parameters)
+
+  rel_path = os.path.relpath(filepath, data_dir)
+  aggregates, decimals = tiers.read(filepath, data_type, cadence, cache_dir, rel_path)
+  rows, _ = block.select(aggregates, isotime.parse(start), isotime.parse(stop))
+  columns = [rows[name] for name in names]
+  return encode(rows['time'], columns, names, tiers.types(data_type), format,
+                [decimals[name] for name in names])
+
+
+def records_cached(entry_dir, filepath, data_type, start, stop, names, types, format='csv'):
+  """Return data from decoded file or None if it is not in memory or cache.
+
+  See days.py.
+  """
+
+  day = days.get(filepath, data_type, entry_dir, columns=names)
+  if day is None:
+    return None
+
+  from psws import block, isotime
+
+  log(f"Reading {filepath} columns {names} from memory or cache {entry_dir}")
+  day, decimals = day
+  rows, _ = block.select(day, isotime.parse(start), isotime.parse(stop))
+  columns = [rows[name] for name in names]
+  return encode(rows['time'], columns, names, types, format,
+                [decimals[name] for name in names])
+
+
+def records_doppler(filepath, start, stop, parameters, entry_dir=None, format='csv'):
+
+  from psws import doppler
+
+  if parameters is None:
+    parameters = PARAMETERS['doppler']
+
+  names = [name for name in doppler.COLUMNS if name in parameters]
+  if entry_dir is not None:
+    cached = records_cached(entry_dir, filepath, 'doppler', start, stop, names,
+                            doppler.TYPES, format)
+    if cached is not None:
+      yield cached
+      return
+
+  rows = timing.iterate('read', doppler.read(filepath, start, stop), size=None)
+  if format == 'binary':
+    yield binary_doppler(rows, names)
+    return
+
+  # Rows are written as they appear in the file, so the time to format them
+  # is included in the read stage.
+  n = 0
+  for ts, freq, vpk in rows:
+    row = ts
+    if 'Freq' in parameters:
+      row += b"," + freq
+    if 'Vpk' in parameters:
+      row += b"," + vpk
+    n += 1
+    yield row + b"\n"
+  timing.add('format', rows=n)
+
+
+def binary_doppler(rows, names):
+  """Return HAPI binary bytes for (time, Freq, Vpk) bytes from doppler.read()."""
+
+  import numpy as np
+
+  from psws import doppler, isotime
+
+  rows = list(rows)
+  if not rows:
+    return b''
+  ts, freq, vpk = zip(*rows)
+  chars = np.array(ts, dtype=f'S{isotime.ISOTIME_LENGTH}')
+  time = isotime.from_chars(chars.view(np.uint8).reshape(-1, isotime.ISOTIME_LENGTH))
+  values = {'Freq': freq, 'Vpk': vpk}
+  columns = [np.array(values[name]).astype(np.float64) for name in names]
+  return encode(time, columns, names, doppler.TYPES, 'binary')
+
+
+def records_mag(filepath, start, stop, parameters, entry_dir=None, format='csv',
+                frames_dir=None):
+
+  from psws import isotime, mag
+
+  if parameters is None:
+    parameters = PARAMETERS['mag']
+
+  names = mag.columns(parameters)
+  if entry_dir is not None:
+    cached = records_cached(entry_dir, filepath, 'mag', start, stop, names,
+                            mag.TYPES, format)
+    if cached is not None:
+      yield cached
+      return
+
+  start, stop = isotime.parse(start), isotime.parse(stop)
+  blocks = None
+  if frames_dir is not None:
+    # Repacked copy of the file, if up-to-date; see frames.py.
+    entry_meta = cache.current(frames_dir, filepath)
+    if entry_meta is not None:
+      log(f"Reading {filepath} columns {names} from frames in {frames_dir}")
+      blocks = frames.read(frames_dir, entry_meta, start, stop, names)
+  if blocks is None:
+    blocks = mag.read(filepath, start, stop, names)
+  try:
+    for block in blocks:
+      log(f"Writing {len(block['time'])} rows from {filepath}")
+      columns = [block[name] for name in names]
+      yield encode(block['time'], columns, names, mag.TYPES, format)
+  except ValueError as e:
+    raise ValueError(f"Failed to read {filepath}: {e}")
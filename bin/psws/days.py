@@ -0,0 +1,125 @@
+# Decoded data files, one station-day each, kept in memory by a long-lived
+# process such as a server that calls psws.data.iter_records().
+#
+# Days are kept as the numpy column arrays of a block (see block.py) in a
+# least-recently-used cache keyed by (file, size, mtime), so an entry is not
+# used after the file changes. The total size of the arrays is kept below
+# PSWS_DAY_CACHE_BYTES bytes (default 0, which disables the cache).
+#
+# get() returns a day from memory, else from the columnar cache on disk (see
+# cache.py), else, if the memory cache is enabled, by decoding the file. A
+# repeated request for a day in memory does no decompression, parsing or
+# file reads other than an os.stat() of the data file.
+
+import os
+import threading
+import collections
+
+from psws import cache, timing
+
+# Keyed by (filepath, size, mtime_ns), values are (block, decimals, nbytes).
+_days = collections.OrderedDict()
+_lock = threading.Lock()
+_counts = {'hits': 0, 'misses': 0, 'evictions': 0, 'bytes': 0}
+
+
+def budget():
+  """Return PSWS_DAY_CACHE_BYTES or, if not set, 0."""
+  return max(0, int(os.getenv("PSWS_DAY_CACHE_BYTES", "0")))
+
+
+def get(filepath, data_type, day_dir, decode=None, columns=None):
+  """Return (block, decimals) for all rows of data file or None.
+
+  decimals is a dict with the decimals of each column. If the day is not in
+  memory or in the cache entry in day_dir, the file is decoded if `decode` is
+  True or, if it is None, if the memory cache is enabled; otherwise None is
+  returned. None is also returned if a decoded doppler file can not be
+  written exactly as it appears in the file.
+
+  columns is a list of the columns needed (default all). Days kept in memory
+  have all columns; if the memory cache is disabled, only the columns needed
+  are read from the cache.
+  """
+
+  limit = budget()
+  stat = cache.source_stat(filepath)
+  key = (filepath, stat['size'], stat['mtime_ns'])
+
+  if limit > 0:
+    with _lock:
+      entry = _days.get(key)
+      if entry is not None:
+        _days.move_to_end(key)
+        _counts['hits'] += 1
+        return entry[0], entry[1]
+      _counts['misses'] += 1
+
+  if limit > 0:
+    columns = None
+  day = _load(filepath, data_type, day_dir, limit > 0 if decode is None else decode, columns)
+  if day is not None and limit > 0:
+    _put(key, day, limit)
+  return day
+
+
+def stats():
+  """Return dict with hit, miss and eviction counts and memory use."""
+  with _lock:
+    return {**_counts, 'days': len(_days), 'budget': budget()}
+
+
+def clear():
+  """Remove all days from memory and reset counts."""
+  with _lock:
+    _days.clear()
+    for name in _counts:
+      _counts[name] = 0
+
+
+def _load(filepath, data_type, day_dir, decode, columns=None):
+
+  if data_type == 'mag':
+    from psws import mag as module
+  else:
+    from psws import doppler as module
+
+  if columns is None:
+    columns = module.COLUMNS
+
+  with timing.stage('read'):
+    cached = cache.read(day_dir, filepath, columns)
+  if cached is not None:
+    day, decimals = cached
+    timing.add('read', bytes=sum(values.nbytes for values in day.values()))
+    return day, dict(zip(columns, decimals))
+
+  if not decode:
+    return None
+
+  if data_type == 'mag':
+    return module.decode_file(filepath, columns), {name: None for name in columns}
+  try:
+    return module.decode_exact(filepath)
+  except ValueError:
+    return None
+
+
+def _put(key, day, limit):
+
+  nbytes = sum(values.nbytes for values in day[0].values())
+  if nbytes > limit:
+    return
+
+  with _lock:
+    if key in _days:
+      return
+    # Remove entries for older versions of the same file.
+    for old in [k for k in _days if k[0] == key[0]]:
+      _counts['bytes'] -= _days.pop(old)[2]
+    while _days and _counts['bytes'] + nbytes > limit:
+      _, (_, _, n) = _days.popitem(last=False)
+      _counts['bytes'] -= n
+      _counts['evictions'] += 1
+    _days[key] = (day[0], day[1], nbytes)
+    _counts['bytes'] += nbytes
@@ -0,0 +1,232 @@
+# Read rows from Grape doppler CSV files, which have the form
+#
+#   #,2019-05-24T00:00:00Z,N0000001,EN91fh,41.3219273, -81.5047731, 285,...
+#   #######################################
+#   # MetaData for Grape Gen 1 Station
+#   ...
+#   UTC,Freq,Vpk
+#   2019-05-24T00:07:46Z,  4999999.856, 0.024867
+#   2019-05-24T00:07:47Z,  4999999.827, 0.066356
+#
+# The UTC column is sorted, so the first row at or after a start time is found
+# by bisecting on byte offsets in the file instead of reading all rows before
+# it. The time to find the first row of a request is then O(log(file size)).
+#
+# decode() reads all rows of a file into numpy arrays.
+# decode_exact() also checks that rows written from the arrays are the same
+# as in the file.
+
+import os
+
+from psws import timing
+
+TS_LENGTH = 20  # e.g., 2019-05-24T00:07:46Z
+
+COLUMNS = ['Freq', 'Vpk']
+
+# Map from HAPI parameter name to columns.
+PARAMETERS = {'Freq': ['Freq'], 'Vpk': ['Vpk']}
+
+# HAPI type of each column, as in info.doppler.template.json.
+TYPES = {'Freq': 'double', 'Vpk': 'double'}
+
+
+def is_row(line):
+  """True if line is a data row, i.e., it starts with a four digit year."""
+  return line[0:4].isdigit()
+
+
+def header(line):
+  """Return dict with station metadata on first line or None if not found.
+
+  The first line has the form
+    #,2020-08-06T00:00:00Z,N0000008,EN91fl,41.493744, -81.578039, 300,Cleveland Hts Ohio,S1,WWV10
+  """
+  parts = line.split(',')
+  if len(parts) < 7:
+    return None
+  try:
+    lat = float(parts[4])
+    lon = float(parts[5])
+    elev = float(parts[6])
+  except ValueError:
+    return None
+  return {
+    'node': parts[2].strip(),
+    'grid': parts[3].strip(),
+    'lat': lat,
+    'long': lon,
+    'elevation': elev
+  }
+
+
+def time_range(filepath):
+  """Return (header line, first time, last time) for file.
+
+  Times are strings. If the file has no rows, the times are None.
+  """
+
+  with open(filepath, 'rb') as f:
+    first_line = f.readline().decode('utf-8', errors='replace').strip()
+    offset = _first_row(f)
+    if offset is None:
+      return first_line, None, None
+    f.seek(offset)
+    first = f.readline()[0:TS_LENGTH].decode()
+
+    # Read increasingly large blocks at the end of the file until a row is
+    # found.
+    size = os.fstat(f.fileno()).st_size
+    tail = 4096
+    while True:
+      pos = max(offset, size - tail)
+      f.seek(pos)
+      lines = f.read(size - pos).splitlines()
+      if pos > offset:
+        lines = lines[1:]  # May be a partial line
+      rows = [line for line in lines if is_row(line)]
+      if rows or pos == offset:
+        break
+      tail *= 4
+
+  last = rows[-1][0:TS_LENGTH].decode() if rows else first
+  return first_line, first, last
+
+
+def read(filepath, start, stop):
+  """Yield (time, Freq, Vpk) bytes for rows with start <= time < stop."""
+
+  start = start.encode()
+  stop = stop.encode()
+  with open(filepath, 'rb') as f:
+    seek(f, start)
+    for line in f:
+      if not is_row(line):
+        continue
+      cols = line.split(b',')
+      ts = cols[0].strip()
+      if ts[0:TS_LENGTH] >= stop:
+        break
+      yield ts, cols[1].strip(), cols[2].strip()
+
+
+def seek(f, start):
+  """Position binary file f at the first row with time >= bytes `start`.
+
+  If there is no such row, f is positioned at the end of the file.
+  """
+
+  first = _first_row(f)
+  if first is None:
+    return
+
+  def row_at(pos):
+    # Return (offset, time) of the first row that starts at or after pos.
+    # Reading the line that contains byte pos - 1 leaves the file at the
+    # start of the next line.
+    if pos > 0:
+      f.seek(pos - 1)
+      f.readline()
+    else:
+      f.seek(0)
+    while True:
+      offset = f.tell()
+      line = f.readline()
+      if not line:
+        return offset, None
+      if is_row(line):
+        return offset, line[0:TS_LENGTH]
+
+  # Find smallest pos in [first, size] with time of row at pos >= start.
+  lo, hi = first, os.fstat(f.fileno()).st_size
+  while lo < hi:
+    mid = (lo + hi) // 2
+    _, ts = row_at(mid)
+    if ts is None or ts >= start:
+      hi = mid
+    else:
+      lo = mid + 1
+
+  offset, _ = row_at(lo)
+  f.seek(offset)
+
+
+def _first_row(f):
+  """Return offset of first row in f or None if there are no rows."""
+  f.seek(0)
+  while True:
+    offset = f.tell()
+    line = f.readline()
+    if not line:
+      return None
+    if is_row(line):
+      return offset
+
+
+def decode(filepath, columns=None):
+  """Return (block, decimals) for all rows in file.
+
+  block is a dict with 'time' and arrays for the list of columns (default
+  COLUMNS, i.e., Freq and Vpk). decimals is a dict with the number of
+  decimals used for Freq and Vpk on the first row.
+  """
+
+  import io
+  import numpy as np
+
+  from psws import isotime
+
+  with timing.stage('read'), open(filepath, 'rb') as f:
+    offset = _first_row(f)
+    f.seek(0 if offset is None else offset)
+    data = f.read() if offset is not None else b''
+  timing.add('read', bytes=len(data))
+
+  if columns is None:
+    columns = COLUMNS
+
+  if not data:
+    block = {'time': np.array([], dtype='datetime64[s]')}
+    for name in columns:
+      block[name] = np.array([], dtype=np.float64)
+    return block, {name: None for name in COLUMNS}
+
+  first = data[0:data.find(b'\n')].split(b',')
+  decimals = {}
+  for name, value in zip(COLUMNS, first[1:]):
+    value = value.strip()
+    decimals[name] = len(value) - value.find(b'.') - 1 if b'.' in value else None
+
+  # Only the columns needed are converted.
+  found = [name for name in COLUMNS if name in columns]
+  dtype = [('time', f'S{TS_LENGTH}')] + [(name, np.float64) for name in found]
+  usecols = [0] + [COLUMNS.index(name) + 1 for name in found]
+  with timing.stage('decode'):
+    values = np.loadtxt(io.BytesIO(data), delimiter=',', comments='#',
+                        ndmin=1, dtype=dtype, usecols=usecols)
+    chars = np.ascontiguousarray(values['time']).view(np.uint8).reshape(-1, TS_LENGTH)
+    block = {'time': isotime.from_chars(chars)}
+  for name in found:
+    block[name] = values[name]
+
+  return block, decimals
+
+
+def decode_exact(filepath):
+  """Return decode(filepath) if the rows written from it match the file.
+
+  Rows read from a file are written as they appear in it. Raises ValueError
+  if writing the decoded columns does not give the same rows, e.g., because
+  the number of decimals is not the same on all rows.
+  """
+
+  from psws import output
+
+  day, decimals = decode(filepath)
+  expected = b''.join(b','.join(row) + b'\n' for row in read(filepath, '0', '9'))
+  columns = [day[name] for name in COLUMNS]
+  got = output.csv(day['time'], columns, [decimals[name] for name in COLUMNS])
+  if got != expected:
+    raise ValueError("Output from decoded columns differs from file content")
+
+  return day, decimals
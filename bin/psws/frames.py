@@ -0,0 +1,142 @@
+# Block-compressed copies of the daily magnetometer zip files, written by
+# bin/repack.py. Each zip file holds one deflate stream of the day's
+# runmag.log, so reading even one second of it decompresses the file from
+# the start. A repacked copy is kept in PSWS_CACHE_DIR/frames/, e.g.,
+#
+#   PSWS_CACHE_DIR/frames/S000028/magData/OBS2025-10-20T00_00.zip/
+#     meta.json   source file size and mtime, row layout and frame index
+#     frames.z    frames, each a zlib stream, one after the other
+#
+# A frame has up to FRAME_ROWS complete lines of one of the files in the zip
+# file, which are read in sorted order as by mag.blocks(). The index has, for
+# each frame, its offset and length in frames.z and the times of its first
+# and last rows, so read() decompresses only the frames with rows in
+# [start, stop).
+#
+# The zip files are not changed and remain the source of the data. An entry
+# is used only if the size and mtime of the zip file match those recorded in
+# meta.json and the layouts of the rows are those of the current decoders
+# (see cache.VERSION).
+
+import os
+import json
+import zlib
+import zipfile
+
+from psws import cache, timing
+
+FRAMES_FILE = 'frames.z'
+
+# Lines per frame, an hour of 1-second rows.
+FRAME_ROWS = 3600
+
+# zlib compression level of frames.
+LEVEL = 6
+
+
+def entry_dir(cache_dir, rel_path):
+  """Return directory of repacked copy of data file data_dir/rel_path."""
+  return os.path.join(cache_dir, 'frames', rel_path)
+
+
+def write(entry_dir, source):
+  """Write repacked copy of mag zip file source to entry_dir."""
+
+  from psws import mag
+
+  stat = cache.source_stat(source)
+  index = []
+  layout = None
+
+  def write_frames(f):
+    nonlocal layout
+    offset = 0
+    for data in _frames(source):
+      if layout is None:
+        layout = mag.sniff(data)
+      compressed = zlib.compress(data, LEVEL)
+      f.write(compressed)
+      index.append([offset, len(compressed), _time(_first_line(data), layout),
+                    _time(_last_line(data), layout)])
+      offset += len(compressed)
+
+  # meta.json is removed while frames.z is replaced and written last.
+  with cache._lock(entry_dir):
+    meta_file = cache._invalidate(entry_dir)
+    cache._replace(os.path.join(entry_dir, FRAMES_FILE), write_frames)
+    entry_meta = {'version': cache.VERSION, 'source': stat, 'layout': layout,
+                  'frame_rows': FRAME_ROWS, 'frames': index}
+    cache._replace(meta_file, lambda f: f.write(json.dumps(entry_meta).encode()))
+
+
+def read(entry_dir, entry_meta, start, stop, columns=None):
+  """Yield decoded blocks of rows in repacked file with start <= time < stop.
+
+  entry_meta is the value of cache.current(entry_dir, source). Rows are
+  selected as by mag.read(), which reads the zip file.
+  """
+
+  import numpy as np
+
+  from psws import block, mag
+
+  # Frames that end before start are skipped, and reading ends at a frame
+  # that starts at or after stop, without decompressing them.
+  wanted = []
+  for offset, length, first, last in entry_meta['frames']:
+    if last is not None and np.datetime64(last) < start:
+      continue
+    if first is not None and np.datetime64(first) >= stop:
+      break
+    wanted.append((offset, length))
+
+  layout = entry_meta['layout']
+  for data in timing.iterate('read', _inflate(entry_dir, wanted)):
+    with timing.stage('decode'):
+      rows, stopped = block.select(mag.decode(data, layout, columns), start, stop)
+    yield rows
+    if stopped:
+      return
+
+
+def _inflate(entry_dir, frames):
+  with open(os.path.join(entry_dir, FRAMES_FILE), 'rb') as f:
+    for offset, length in frames:
+      f.seek(offset)
+      yield zlib.decompress(f.read(length))
+
+
+def _frames(source):
+  # Frames of FRAME_ROWS lines of each file in zip file source. Frames do not
+  # span files, which may have different row layouts.
+  with zipfile.ZipFile(source, 'r') as z:
+    for filename in sorted(z.namelist()):
+      lines = z.read(filename).splitlines(keepends=True)
+      for i in range(0, len(lines), FRAME_ROWS):
+        data = b''.join(lines[i:i + FRAME_ROWS])
+        if not data.endswith(b'\n'):
+          data += b'\n'
+        yield data
+
+
+def _first_line(data):
+  data = data.lstrip()
+  return data[0:data.find(b'\n') + 1] if b'\n' in data else data
+
+
+def _last_line(data):
+  return data[data.rstrip().rfind(b'\n') + 1:]
+
+
+def _time(line, layout):
+  # ISO time of row on line or None if it can not be decoded, in which case
+  # the frame is not skipped by read().
+  from psws import mag
+  decoder = mag.DECODERS.get(layout)
+  if decoder is None:
+    return None
+  try:
+    time = decoder.rows(line, [])['time']
+  except (ValueError, IndexError, KeyError):
+    return None
+  return str(time[0]) if len(time) else None
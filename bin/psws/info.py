@@ -0,0 +1,65 @@
+# Responses to HAPI info requests. The response for a dataset is the
+# info.<type>.template.json file for its type with the dates and location of
+# the dataset in catalog.csv filled in. The info for an aggregate dataset,
+# e.g., S000028/mag/PT1M, is derived from that of its base dataset; see
+# tiers.py. The response for each dataset is compiled once and reused until
+# catalog.csv or the template changes; see response.py.
+
+import os
+import json
+
+from psws import catalog, response, tiers
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def template_file(data_type):
+  return os.path.join(TEMPLATE_DIR, f'info.{data_type}.template.json')
+
+
+def info(dataset, catalog_file=catalog.CATALOG_FILE):
+  """Return HAPI info dict for dataset. Raises ValueError if not found."""
+
+  datasets = _datasets(dataset, catalog_file)
+
+  dataset, cadence = tiers.split_id(dataset)
+  data_type = dataset.split('/')[-1]
+  with open(template_file(data_type), 'r') as f:
+    info = json.load(f)
+
+  info['startDate'] = datasets[dataset]['startDateTime']
+  info['stopDate'] = datasets[dataset]['stopDateTime']
+  info['geoLocation'] = [
+    datasets[dataset]['lat'],
+    datasets[dataset]['long'],
+    datasets[dataset]['elevation']
+  ]
+  if None in info['geoLocation']:
+    info['geoLocation'] = None
+
+  if cadence is not None:
+    info = tiers.info(info, cadence)
+
+  return info
+
+
+def document(dataset, catalog_file=catalog.CATALOG_FILE):
+  """Return response.Document for the info response for dataset.
+
+  Raises ValueError if dataset is not found.
+  """
+
+  _datasets(dataset, catalog_file)
+
+  sources = [catalog_file, template_file(tiers.split_id(dataset)[0].split('/')[-1])]
+  def build():
+    return response.compile_document(info(dataset, catalog_file), response.mtime_ns(sources))
+  return response.cached(('info', dataset, catalog_file), sources, build)
+
+
+def _datasets(dataset, catalog_file):
+  datasets = catalog.get_catalog(catalog_file)
+  base_id, cadence = tiers.split_id(dataset)
+  if base_id not in datasets or (cadence is not None and dataset not in tiers.ids(base_id)):
+    raise ValueError(f"ID {dataset} not found in catalog")
+  return datasets
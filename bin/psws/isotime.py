@@ -0,0 +1,173 @@
+# Vectorized conversions between date/time fields, numpy datetime64[s] arrays
+# and HAPI isotime strings of the form YYYY-MM-DDTHH:MM:SSZ, and
+# normalization of the start and stop times and durations of requests.
+#
+# The day <-> civil date arithmetic follows days_from_civil() and
+# civil_from_days() in http://howardhinnant.github.io/date_algorithms.html
+
+import re
+
+import numpy as np
+
+ISOTIME_LENGTH = 20
+
+# HAPI isotime with a YYYY-MM-DD or YYYY-DDD date, optionally truncated after
+# the date, hour, minute or second, and optionally without the Z.
+_ISOTIME = re.compile(r'(\d{4})-(?:(\d{2})-(\d{2})|(\d{3}))'
+                      r'(?:T(\d{2})(?::(\d{2})(?::(\d{2})(\.\d+)?)?)?)?Z?')
+
+# ISO 8601 duration, e.g., P30D or PT12H.
+_DURATION = re.compile(r'P(?:(\d+)Y)?(?:(\d+)M)?(?:(\d+)W)?(?:(\d+)D)?'
+                       r'(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+(?:\.\d+)?)S)?)?')
+
+# Seconds in each unit of a duration. Years and months are nominal.
+_DURATION_SECONDS = [365 * 86400, 30 * 86400, 7 * 86400, 86400, 3600, 60, 1]
+
+
+def from_fields(year, month, day, hour, minute, second):
+  """Return datetime64[s] array given integer arrays of date/time fields."""
+
+  y = year - (month <= 2)
+  era = y // 400
+  yoe = y - era * 400
+  doy = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+  doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+  days = era * 146097 + doe - 719468
+
+  seconds = days * 86400 + hour * 3600 + minute * 60 + second
+  return seconds.astype(np.int64).astype('datetime64[s]')
+
+
+def from_chars(chars):
+  """Return datetime64[s] array given (N, 20) HAPI isotime characters.
+
+  Raises ValueError if a row is not of the form YYYY-MM-DDTHH:MM:SSZ.
+  """
+
+  template = np.frombuffer(b'0000-00-00T00:00:00Z', dtype=np.uint8)
+  digits = template == ord('0')
+  if chars.ndim != 2 or chars.shape[1] != ISOTIME_LENGTH \
+      or not (chars[:, ~digits] == template[~digits]).all():
+    raise ValueError("Time is not of the form YYYY-MM-DDTHH:MM:SSZ")
+
+  values = chars.astype(np.int64) - ord('0')
+  if ((values[:, digits] < 0) | (values[:, digits] > 9)).any():
+    raise ValueError("Time is not of the form YYYY-MM-DDTHH:MM:SSZ")
+
+  def number(first, width):
+    return values[:, first:first + width] @ (10 ** np.arange(width - 1, -1, -1))
+
+  year, month, day = number(0, 4), number(5, 2), number(8, 2)
+  hour, minute, second = number(11, 2), number(14, 2), number(17, 2)
+  if ((month < 1) | (month > 12)).any() \
+      or ((day < 1) | (day > days_in_month(year, np.clip(month, 1, 12)))).any() \
+      or (hour > 23).any() or (minute > 59).any() or (second > 59).any():
+    raise ValueError("Invalid date or time")
+
+  return from_fields(year, month, day, hour, minute, second)
+
+
+def days_in_month(year, month):
+  """Return number of days in month for integer arrays of year and month."""
+  dim = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])[month - 1]
+  leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+  return dim + ((month == 2) & leap)
+
+
+def to_chars(time):
+  """Return (N, 20) uint8 array with the HAPI isotime characters of `time`."""
+
+  seconds = np.asarray(time).astype('datetime64[s]').astype(np.int64)
+  days, sod = np.divmod(seconds, 86400)
+
+  z = days + 719468
+  era = z // 146097
+  doe = z - era * 146097
+  yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+  doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+  mp = (5 * doy + 2) // 153
+  day = doy - (153 * mp + 2) // 5 + 1
+  month = np.where(mp < 10, mp + 3, mp - 9)
+  year = yoe + era * 400 + (month <= 2)
+
+  hour, sec = np.divmod(sod, 3600)
+  minute, sec = np.divmod(sec, 60)
+
+  chars = np.empty((seconds.size, ISOTIME_LENGTH), dtype=np.uint8)
+  chars[:] = np.frombuffer(b'0000-00-00T00:00:00Z', dtype=np.uint8)
+  for col, width, values in ((0, 4, year), (5, 2, month), (8, 2, day),
+                             (11, 2, hour), (14, 2, minute), (17, 2, sec)):
+    for k in range(width):
+      chars[:, col + width - 1 - k] += ((values // 10**k) % 10).astype(np.uint8)
+
+  return chars
+
+
+def to_bytes(time):
+  """Return `time` as a numpy array of 20-byte HAPI isotime strings."""
+  chars = to_chars(time)
+  return chars.view(f'S{ISOTIME_LENGTH}').reshape(-1)
+
+
+def parse(isotime):
+  """Return numpy datetime64 for a HAPI isotime string, e.g., a start/stop."""
+  return np.datetime64(isotime.rstrip('Z'))
+
+
+def normalize(isotime):
+  """Return HAPI isotime string as YYYY-MM-DDTHH:MM:SSZ.
+
+  All HAPI forms are accepted, e.g., 2019-05-24T00:07Z and 2019-144T00:07Z.
+  Rows have whole-second times, so fractional seconds are rounded up, which
+  selects the same rows. Raises ValueError if isotime is not a HAPI isotime.
+  """
+
+  match = _ISOTIME.fullmatch(isotime)
+  if match is None:
+    raise ValueError(f"'{isotime}' is not a HAPI isotime")
+  year, month, day, doy, hour, minute, second, fraction = match.groups()
+
+  if doy is not None:
+    if not 1 <= int(doy) <= 337 + days_in_month(int(year), 2):
+      raise ValueError(f"Invalid day of year in '{isotime}'")
+    date = np.datetime64(year, 'D') + np.timedelta64(int(doy) - 1, 'D')
+  else:
+    if not 1 <= int(month) <= 12 or not 1 <= int(day) <= days_in_month(int(year), int(month)):
+      raise ValueError(f"Invalid date in '{isotime}'")
+    date = np.datetime64(f'{year}-{month}-{day}', 'D')
+
+  hour, minute, second = int(hour or 0), int(minute or 0), int(second or 0)
+  if hour > 23 or minute > 59 or second > 59:
+    raise ValueError(f"Invalid time in '{isotime}'")
+  time = date + np.timedelta64(hour * 3600 + minute * 60 + second, 's')
+  if fraction is not None and int(fraction[1:]) > 0:
+    time += np.timedelta64(1, 's')
+  return np.datetime_as_string(time, unit='s') + 'Z'
+
+
+def duration(text):
+  """Return numpy timedelta64[s] for an ISO 8601 duration, e.g., P30D.
+
+  Years and months are taken to be 365 and 30 days. Raises ValueError if
+  text is not a duration.
+  """
+  match = _DURATION.fullmatch(text)
+  if match is None or text in ['P', 'PT'] or text.endswith('T'):
+    raise ValueError(f"'{text}' is not an ISO 8601 duration")
+  seconds = sum(float(value) * unit
+                for value, unit in zip(match.groups(), _DURATION_SECONDS) if value)
+  return np.timedelta64(int(round(seconds)), 's')
+
+
+def format_duration(seconds):
+  """Return ISO 8601 duration for a whole number of seconds, e.g., P1DT12H.
+
+  Days are the largest unit, as years and months do not have a fixed length.
+  """
+  days, rest = divmod(int(seconds), 86400)
+  hours, rest = divmod(rest, 3600)
+  minutes, rest = divmod(rest, 60)
+  time = ''.join(f'{value}{unit}' for value, unit in
+                 [(hours, 'H'), (minutes, 'M'), (rest, 'S')] if value)
+  text = 'P' + (f'{days}D' if days else '') + (f'T{time}' if time else '')
+  return text if text != 'P' else 'PT0S'
@@ -0,0 +1,500 @@
+# Decode the runmag.log files in the daily magnetometer OBS<date>T00_00.zip
+# files into numpy column arrays.
+#
+# Three row layouts are found in the files:
+#
+# json, JSON rows:
+#   { "ts":"21 Oct 2025 04:01:59", "rt":32.50, "lt":41.69,
+#     "x":-45676.67, "y":-13284.67, "z":16150.67,
+#     "rx":-68515, "ry":-19927, "rz":24226, "Tm": 50236.28450 }
+#
+# quoted10, quoted CSV rows with the values of JSON rows in the same order:
+#   "21 Oct 2025 04:01:59", 32.50, 41.69, -45676.67, -13284.67, 16150.67,
+#     -68515, -19927, 24226, 50236.28450
+#
+# quoted9, quoted CSV rows without lt, e.g., S000082:
+#   "18 Oct 2025 00:00:00", 28.75, -41.1688, 2.8020, 34.6437, -365, 24, 307, 53.8786
+#
+# The layout of a file is found once, from its first row (see sniff()), and
+# the decoder for that layout in DECODERS is used for all of its blocks.
+# Columns that a layout does not have are FILL.
+#
+# The read and decode functions take a list of the columns to return, e.g.,
+# ['x', 'y', 'z'] for Field_Vector, and only those columns are converted.
+#
+# read() streams blocks of lines from the zip file and stops decompressing
+# once a row at or after the stop time is found, so memory use is bounded by
+# the block size rather than the size of the file.
+#
+# decode() handles a whole block of rows at once. The time stamps are parsed
+# from a fixed-width character matrix and the values with numpy.loadtxt, so
+# there is no Python-level loop over rows. If a block does not have the
+# regular layout the fast path assumes, the rows are decoded one at a time.
+
+import io
+import json
+import zipfile
+import datetime
+import functools
+import collections
+
+import numpy as np
+
+from psws import block, isotime, timing
+
+# Column names in the order they are written in a HAPI response.
+COLUMNS = ['x', 'y', 'z', 'rx', 'ry', 'rz', 'rt', 'lt', 'Tm']
+
+# Map from HAPI parameter name to columns.
+PARAMETERS = {
+  'Field_Vector': ['x', 'y', 'z'],
+  'rxryrz': ['rx', 'ry', 'rz'],
+  'rtlt': ['rt', 'lt'],
+  'rt': ['rt'],
+  'lt': ['lt'],
+  'Tm': ['Tm']
+}
+
+# HAPI type of each column, as in info.mag.template.json.
+TYPES = {column: 'double' for column in COLUMNS}
+TYPES.update({'rx': 'integer', 'ry': 'integer', 'rz': 'integer'})
+
+# Columns after the time stamp in quoted CSV rows of each layout.
+QUOTED_COLUMNS = {
+  # As in JSON rows.
+  'quoted10': ['rt', 'lt', 'x', 'y', 'z', 'rx', 'ry', 'rz', 'Tm'],
+  # As quoted10 without lt. Tm is the magnitude of (x, y, z).
+  'quoted9': ['rt', 'x', 'y', 'z', 'rx', 'ry', 'rz', 'Tm'],
+}
+
+# Value of columns not found in a layout, as in info.mag.template.json.
+FILL = 99999.0
+
+TS_FORMAT = '%d %b %Y %H:%M:%S'
+TS_LENGTH = 20  # e.g., 21 Oct 2025 04:01:59
+
+MONTHS = [b'Jan', b'Feb', b'Mar', b'Apr', b'May', b'Jun',
+          b'Jul', b'Aug', b'Sep', b'Oct', b'Nov', b'Dec']
+
+# Number of decompressed bytes read at a time.
+BLOCK_SIZE = 1 << 20
+
+# Number of decompressed bytes read to find the first or last row.
+TAIL_SIZE = 1 << 16
+
+# Characters in finite numbers. Deleting other characters from a non-finite
+# value such as NaN or Infinity leaves a string that fails to parse.
+NUMBER_CHARS = set('0123456789+-.eE')
+
+
+def columns(parameters):
+  """Return the column names needed for a list of HAPI parameters."""
+  return [c for p in PARAMETERS if p in parameters for c in PARAMETERS[p]]
+
+
+def blocks(filepath, block_size=BLOCK_SIZE):
+  """Yield blocks of complete lines from the files in zip file `filepath`.
+
+  Files in the zip file are read in sorted order. Each block has about
+  block_size bytes.
+  """
+  with zipfile.ZipFile(filepath, 'r') as z:
+    for filename in sorted(z.namelist()):
+      with z.open(filename) as f:
+        rest = b''
+        while True:
+          chunk = f.read(block_size)
+          if not chunk:
+            break
+          chunk = rest + chunk
+          end = chunk.rfind(b'\n') + 1
+          rest = chunk[end:]
+          if end > 0:
+            yield chunk[0:end]
+        if rest:
+          yield rest
+
+
+def lines(filepath):
+  """Yield lines, without line endings, from the files in zip file `filepath`."""
+  for data in blocks(filepath):
+    yield from data.decode('utf-8').splitlines()
+
+
+def row_format(line):
+  """Return 'json' or 'quoted<n>' for row (bytes), or None if neither.
+
+  n is the number of comma-separated columns, including the time stamp.
+  """
+  line = line.strip()
+  if line.startswith(b'{'):
+    return 'json'
+  if line.startswith(b'"'):
+    return f"quoted{line.count(b',') + 1}"
+  return None
+
+
+def sniff(data):
+  """Return row_format() of the first non-empty line in bytes data or None."""
+  for line in data.splitlines():
+    if line.strip():
+      return row_format(line)
+  return None
+
+
+def first_row_format(filepath):
+  """Return row_format() of the first non-empty line in zip file or None."""
+  for data in blocks(filepath, TAIL_SIZE):
+    layout = sniff(data)
+    if layout is not None:
+      return layout
+  return None
+
+
+def line_time(line):
+  """Return datetime of time stamp on line (bytes). Raises ValueError if none."""
+  line = line.strip()
+  if line.startswith(b'{'):
+    try:
+      ts = json.loads(line)['ts']
+    except (KeyError, TypeError) as e:
+      raise ValueError(f"No ts in JSON row: {e}")
+  elif line.startswith(b'"'):
+    ts = line[1:line.find(b'"', 1)].decode()
+  else:
+    raise ValueError(f"Unsupported data format: {line}")
+  return datetime.datetime.strptime(ts, TS_FORMAT)
+
+
+def first_time(filepath):
+  """Return datetime of first row in zip file or None if no rows.
+
+  The zip file is decompressed only up to the first row.
+  """
+  for data in blocks(filepath, TAIL_SIZE):
+    time = _first_line_time(data.splitlines())
+    if time is not None:
+      return time
+  return None
+
+
+def last_time(filepath):
+  """Return datetime of last row in zip file or None if no rows.
+
+  Deflate streams can not be read from the end, so all of the file is
+  decompressed, but only the last TAIL_SIZE bytes of each file in it are kept.
+  """
+  last = None
+  with zipfile.ZipFile(filepath, 'r') as z:
+    for filename in sorted(z.namelist()):
+      with z.open(filename) as f:
+        tail = b''
+        size = 0
+        while True:
+          chunk = f.read(BLOCK_SIZE)
+          if not chunk:
+            break
+          size += len(chunk)
+          tail = (tail + chunk[-TAIL_SIZE:])[-TAIL_SIZE:]
+      lines = tail.splitlines()
+      if size > len(tail):
+        lines = lines[1:]  # May be a partial line
+      time = _first_line_time(reversed(lines))
+      if time is not None:
+        last = time
+  return last
+
+
+def _first_line_time(lines):
+  # Time of first line in lines with a time stamp.
+  for line in lines:
+    try:
+      return line_time(line)
+    except ValueError:
+      continue
+  return None
+
+
+def read(filepath, start, stop, columns=None):
+  """Yield decoded blocks of rows in zip file with start <= time < stop.
+
+  start and stop are numpy datetime64 values. As for a row-by-row read, rows
+  before start are skipped and reading ends at the first row at or after stop.
+  Blocks have 'time' and the columns in the list `columns` (default COLUMNS).
+  """
+  layout = None
+  for data in timing.iterate('read', blocks(filepath)):
+    if layout is None:
+      layout = sniff(data)
+
+    # Skip decoding blocks that end before start.
+    last = _last_time(data, layout)
+    if last is not None and last < start:
+      continue
+
+    with timing.stage('decode'):
+      rows, stopped = block.select(decode(data, layout, columns), start, stop)
+    yield rows
+    if stopped:
+      return
+
+
+def decode(data, layout=None, columns=None):
+  """Return dict with 'time' and column arrays for rows in bytes `data`.
+
+  `data` must contain only complete lines. layout is a key of DECODERS; if
+  None, it is found from the first line. columns is a list of the columns to
+  decode (default COLUMNS). Raises ValueError if a line can not be decoded.
+  """
+  if columns is None:
+    columns = COLUMNS
+  if layout is None:
+    layout = sniff(data)
+    if layout is None:
+      return empty(columns)
+  decoder = DECODERS.get(layout)
+  if decoder is None:
+    raise ValueError(f"Unsupported row format '{layout}'")
+  try:
+    return decoder.block(data, columns)
+  except ValueError:
+    pass
+  try:
+    return decoder.rows(data, columns)
+  except ValueError:
+    # A block in another layout than the first in the file, e.g., from
+    # another runmag.log in the zip file.
+    own = sniff(data)
+    if own == layout or own not in DECODERS:
+      raise
+    return decode(data, own, columns)
+
+
+def decode_file(filepath, columns=None):
+  """Return dict with 'time' and column arrays for all rows in zip file.
+
+  columns is a list of the columns to decode (default COLUMNS).
+  """
+  days = []
+  layout = None
+  for data in timing.iterate('read', blocks(filepath)):
+    if layout is None:
+      layout = sniff(data)
+    with timing.stage('decode'):
+      days.append(decode(data, layout, columns))
+  if not days:
+    return empty(columns)
+  return {name: np.concatenate([day[name] for day in days]) for name in days[0]}
+
+
+def empty(columns=None):
+  """Return decoded columns with no rows."""
+  day = {'time': np.array([], dtype='datetime64[s]')}
+  for column in COLUMNS if columns is None else columns:
+    day[column] = np.array([], dtype=np.float64)
+  return day
+
+
+def _line_starts(buf):
+  starts = np.flatnonzero(buf == ord('\n')) + 1
+  starts = np.concatenate(([0], starts))
+  return starts[starts < len(buf)]
+
+
+def _ts_chars(buf, starts, offset, quote):
+  """Return (N, 20) time stamp characters found at `offset` in each line."""
+  if starts[-1] + offset + TS_LENGTH >= len(buf):
+    raise ValueError("Last line too short")
+  positions = starts[:, None] + offset + np.arange(TS_LENGTH + 1)
+  chars = buf[positions]
+  if not (chars[:, -1] == quote).all():
+    raise ValueError(f"Time stamps are not {TS_LENGTH} characters long")
+  return chars[:, :-1]
+
+
+def _ts_parse(chars):
+  """Return datetime64[s] array given (N, 20) 'DD Mon YYYY HH:MM:SS' characters"""
+
+  separators = {2: ' ', 6: ' ', 11: ' ', 14: ':', 17: ':'}
+  for col, sep in separators.items():
+    if not (chars[:, col] == ord(sep)).all():
+      raise ValueError("Unexpected time stamp format")
+
+  def number(first, width):
+    digits = chars[:, first:first + width].astype(np.int64) - ord('0')
+    if ((digits < 0) | (digits > 9)).any():
+      raise ValueError("Unexpected time stamp format")
+    return digits @ (10 ** np.arange(width - 1, -1, -1))
+
+  # Look up month number using the three month characters as an integer key
+  keys = np.array([int.from_bytes(m, 'big') for m in MONTHS])
+  order = np.argsort(keys)
+  key = chars[:, 3:6].astype(np.int64) @ np.array([65536, 256, 1])
+  idx = order[np.minimum(np.searchsorted(keys[order], key), 11)]
+  if not (keys[idx] == key).all():
+    raise ValueError("Unexpected month in time stamp")
+  month = idx + 1
+
+  year, day = number(7, 4), number(0, 2)
+  hour, minute, second = number(12, 2), number(15, 2), number(18, 2)
+  if ((day < 1) | (day > isotime.days_in_month(year, month))).any() \
+      or (hour > 23).any() or (minute > 59).any() or (second > 59).any():
+    raise ValueError("Invalid date or time in time stamp")
+
+  return isotime.from_fields(year, month, day, hour, minute, second)
+
+
+def _last_time(data, layout):
+  """Return time on last line in data or None if it can not be decoded."""
+  last = data[data.rstrip().rfind(b'\n') + 1:]
+  decoder = DECODERS.get(layout)
+  if decoder is None:
+    return None
+  try:
+    time = decoder.rows(last, [])['time']
+  except (ValueError, IndexError, KeyError):
+    return None
+  return time[-1] if len(time) else None
+
+
+def _decode_json(data, columns):
+
+  buf = np.frombuffer(data, dtype=np.uint8)
+  starts = _line_starts(buf)
+  if len(starts) == 0:
+    return empty(columns)
+
+  first = data[0:data.find(b'\n')] if b'\n' in data else data
+  entry = json.loads(first)
+  keys = list(entry)
+  if keys[0] != 'ts' or sorted(keys[1:]) != sorted(COLUMNS):
+    raise ValueError("Unexpected keys in JSON row")
+  for key in keys[1:]:
+    if isinstance(entry[key], bool) or not isinstance(entry[key], (int, float)):
+      raise ValueError(f"Non-numeric value for {key} in JSON row")
+  # Rows are written by one logger, so keys are assumed to be in the same
+  # order on all rows if they are on the first and last.
+  if list(json.loads(data[starts[-1]:])) != keys:
+    raise ValueError("Keys on first and last JSON rows differ")
+
+  offset = first.index(b'"', first.index(b'"ts"') + 4) + 1
+  ts_chars = _ts_chars(buf, starts, offset, ord('"'))
+
+  # Remove the characters in key names (none of which are found in numbers)
+  # and replace : with space so that only the values remain in the columns
+  # after the time stamp column.
+  delete = set(''.join(keys)) | set('{}"')
+  if delete & NUMBER_CHARS:
+    raise ValueError("Key name has characters found in numbers")
+  text = data.translate(bytes.maketrans(b':', b' '), ''.join(delete).encode())
+
+  names = keys[1:]
+  dtypes = {k: np.int64 if isinstance(entry[k], int) else np.float64 for k in names}
+  return _loadtxt(text, starts, ts_chars, names, dtypes, columns)
+
+
+def _decode_quoted(data, columns, names):
+
+  buf = np.frombuffer(data, dtype=np.uint8)
+  starts = _line_starts(buf)
+  if len(starts) == 0:
+    return empty(columns)
+
+  first = data[0:data.find(b'\n')] if b'\n' in data else data
+  if first.count(b',') != len(names):
+    raise ValueError(f"Quoted row does not have {len(names) + 1} columns")
+
+  ts_chars = _ts_chars(buf, starts, 1, ord('"'))
+  dtypes = {k: np.int64 if TYPES[k] == 'integer' else np.float64 for k in names}
+  return _loadtxt(data, starts, ts_chars, names, dtypes, columns)
+
+
+def _loadtxt(text, starts, ts_chars, names, dtypes, columns):
+  # Decode `columns` from the values after the time stamp column of each line
+  # in text, which are in the order of `names`.
+
+  day = {'time': _ts_parse(ts_chars)}
+
+  # Only the columns needed are converted. All of the line is still split
+  # into fields, so the time saved is that of converting the others.
+  found = [name for name in names if name in columns]
+  if found:
+    dtype = [(name, dtypes[name]) for name in found]
+    values = np.loadtxt(io.BytesIO(text), delimiter=',', ndmin=1,
+                        usecols=[names.index(name) + 1 for name in found], dtype=dtype)
+    if len(values) != len(starts):
+      raise ValueError("Blank or comment lines found")
+
+  for name in columns:
+    day[name] = values[name] if name in found else np.full(len(starts), FILL)
+
+  return day
+
+
+def _rows_json(data, columns):
+  """Decode JSON rows one at a time."""
+
+  rows = {name: [] for name in ['time', *columns]}
+  for line in data.decode('utf-8').splitlines():
+    if not line.strip():
+      continue
+    entry = json.loads(line)
+    ts = entry['ts']
+    try:
+      dt = datetime.datetime.strptime(ts, TS_FORMAT)
+    except Exception as e:
+      raise ValueError(f"Failed to parse ts '{ts}': {e}")
+    rows['time'].append(dt)
+    for name in columns:
+      rows[name].append(entry[name])
+
+  return _arrays(rows)
+
+
+def _rows_quoted(data, columns, names):
+  """Decode quoted CSV rows with columns `names` after the time stamp one at a time."""
+
+  rows = {name: [] for name in ['time', *columns]}
+  found = [(name, names.index(name) + 1) for name in columns if name in names]
+  missing = [name for name in columns if name not in names]
+  for line in data.decode('utf-8').splitlines():
+    if not line.strip():
+      continue
+    values = line.split(',')
+    if len(values) != len(names) + 1:
+      raise ValueError(f"Quoted row does not have {len(names) + 1} columns: {line}")
+    rows['time'].append(datetime.datetime.strptime(values[0].strip().strip('"'), TS_FORMAT))
+    for name, index in found:
+      rows[name].append(float(values[index]))
+    for name in missing:
+      rows[name].append(FILL)
+
+  return _arrays(rows)
+
+
+def _arrays(rows):
+  columns = [name for name in rows if name != 'time']
+  if len(rows['time']) == 0:
+    return empty(columns)
+
+  day = {'time': np.array(rows['time'], dtype='datetime64[s]')}
+  for name in columns:
+    values = np.array(rows[name])
+    if TYPES[name] == 'integer' and values.dtype.kind == 'f' \
+        and np.array_equal(values, np.trunc(values)):
+      values = values.astype(np.int64)
+    day[name] = values
+
+  return day
+
+
+# Decoders for each row layout. block(data, columns) decodes all rows of a
+# block at once and raises ValueError if the block does not have the regular
+# layout it assumes, in which case rows(data, columns) decodes the rows one at
+# a time.
+Decoder = collections.namedtuple('Decoder', ['block', 'rows'])
+
+DECODERS = {'json': Decoder(_decode_json, _rows_json)}
+for _layout, _names in QUOTED_COLUMNS.items():
+  DECODERS[_layout] = Decoder(functools.partial(_decode_quoted, names=_names),
+                              functools.partial(_rows_quoted, names=_names))
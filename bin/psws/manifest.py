@@ -0,0 +1,104 @@
+# Sorted lists of the data files in a dataset directory, e.g.,
+# S000028/magData, used to find the files with data in a time range.
+#
+# A manifest is built with one os.scandir() of the directory and saved as
+# JSON in PSWS_CACHE_DIR/manifest/. It is rebuilt when the modification time
+# of the directory, which changes when a file is added, removed or renamed,
+# no longer matches the one recorded in it. Lookups bisect on the file dates.
+
+import os
+import json
+import bisect
+import threading
+
+# File extension and slice of the file name with the YYYY-MM-DD file date for
+# each dataset type.
+FILE_TYPES = {
+  'mag': ('.zip', slice(3, 13)),      # OBS2025-10-20T00_00.zip
+  'doppler': ('.csv', slice(0, 10)),  # 2019-05-24T000000Z_N0000001_..._WWV5.csv
+}
+
+# Manifests loaded by this process, keyed by dataset directory.
+_loaded = {}
+
+
+def build(dataset_dir, data_type):
+  """Return manifest for the files in dataset_dir."""
+
+  ext, date = FILE_TYPES[data_type]
+
+  # Get the modification time first so that a change during the scan causes
+  # a rebuild on the next load().
+  mtime_ns = os.stat(dataset_dir).st_mtime_ns
+  with os.scandir(dataset_dir) as entries:
+    names = [e.name for e in entries if e.name.endswith(ext)]
+
+  files = sorted((name[date], name) for name in names)
+  return {
+    'data_type': data_type,
+    'mtime_ns': mtime_ns,
+    'dates': [f[0] for f in files],
+    'files': [f[1] for f in files]
+  }
+
+
+def load(dataset_dir, data_type, manifest_file=None):
+  """Return an up-to-date manifest for dataset_dir.
+
+  If manifest_file is given, the manifest is read from it if it is up-to-date
+  and written to it otherwise.
+  """
+
+  mtime_ns = os.stat(dataset_dir).st_mtime_ns
+
+  def current(manifest):
+    return manifest is not None \
+      and manifest.get('mtime_ns') == mtime_ns \
+      and manifest.get('data_type') == data_type
+
+  manifest = _loaded.get(dataset_dir)
+  if current(manifest):
+    return manifest
+
+  manifest = None
+  if manifest_file is not None and os.path.exists(manifest_file):
+    try:
+      with open(manifest_file, 'r') as f:
+        manifest = json.load(f)
+    except (OSError, ValueError):
+      manifest = None
+
+  if not current(manifest):
+    manifest = build(dataset_dir, data_type)
+    if manifest_file is not None:
+      save(manifest, manifest_file)
+
+  _loaded[dataset_dir] = manifest
+  return manifest
+
+
+def save(manifest, manifest_file):
+  """Write manifest to file. Returns False if it could not be written."""
+  # The thread is part of the name, as threads of a server share a pid.
+  tmp_file = f'{manifest_file}.{os.getpid()}.{threading.get_ident()}.tmp'
+  try:
+    os.makedirs(os.path.dirname(manifest_file), exist_ok=True)
+    with open(tmp_file, 'w') as f:
+      json.dump(manifest, f)
+    # Atomic, so concurrent readers never see a partially written file.
+    os.replace(tmp_file, manifest_file)
+  except OSError:
+    return False
+  return True
+
+
+def find(manifest, start, stop):
+  """Return names of files with date in [start, stop] (YYYY-MM-DD strings)."""
+  lo = bisect.bisect_left(manifest['dates'], start)
+  hi = bisect.bisect_right(manifest['dates'], stop)
+  return manifest['files'][lo:hi]
+
+
+def manifest_file(cache_dir, rel_dir):
+  """Return manifest file path for dataset directory data_dir/rel_dir."""
+  return os.path.join(cache_dir, 'manifest', rel_dir + '.json')
@@ -0,0 +1,110 @@
+# Aggregate latency histograms of data requests, per dataset type, from the
+# summaries written by timing.report().
+#
+# Each data request runs in its own process when data.py is run by the
+# server, so summaries are appended as JSON lines to PSWS_METRICS_FILE (not
+# written if not set) and aggregated by bin/metrics.py. A long-lived
+# process that calls psws.data.iter_records() and timing.report(), such as
+# server.py, also keeps the aggregate of its own requests, which metrics()
+# returns and server.py returns at /hapi/metrics.
+#
+# The dataset type is the part of the dataset ID after the station, e.g.,
+# mag, doppler or mag/PT1M. For each type the aggregate has the number of
+# requests and errors, a histogram of request wall times with upper bucket
+# bounds BUCKETS, and the sums of time, bytes and rows for each stage.
+
+import os
+import json
+import bisect
+
+# Upper bounds, in seconds, of the latency histogram buckets. The last
+# bucket, '+Inf', has the requests that took longer.
+BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+# Aggregate of the summaries recorded by this process.
+_aggregate = {}
+
+
+def metrics_file():
+  """Return PSWS_METRICS_FILE or None if not set."""
+  return os.getenv("PSWS_METRICS_FILE") or None
+
+
+def dataset_type(id):
+  """Return the dataset type for dataset id, e.g., 'mag' for S000028/mag."""
+  return '/'.join(id.split('/')[1:]) or id
+
+
+def record(summary, file=None):
+  """Add summary to the aggregate of this process and append it to file.
+
+  file defaults to metrics_file(). Errors writing file are ignored so that a
+  request does not fail because of its metrics.
+  """
+  add(_aggregate, summary)
+
+  if file is None:
+    file = metrics_file()
+  if file is None:
+    return
+  try:
+    # One write of a complete line, so that lines from concurrent requests
+    # are not interleaved.
+    with open(file, 'a') as f:
+      f.write(json.dumps(summary) + '\n')
+  except OSError:
+    pass
+
+
+def add(aggregate, summary):
+  """Add request summary to aggregate dict."""
+
+  type = dataset_type(summary.get('id', ''))
+  entry = aggregate.get(type)
+  if entry is None:
+    entry = {
+      'requests': 0,
+      'errors': 0,
+      'wall': 0.0,
+      'cpu': 0.0,
+      'bytes': 0,
+      'histogram': {_label(i): 0 for i in range(len(BUCKETS) + 1)},
+      'stages': {}
+    }
+    aggregate[type] = entry
+
+  entry['requests'] += 1
+  if summary.get('error') is not None:
+    entry['errors'] += 1
+  entry['wall'] += summary['wall']
+  entry['cpu'] += summary['cpu']
+  entry['bytes'] += summary.get('bytes') or 0
+  entry['histogram'][_label(bisect.bisect_left(BUCKETS, summary['wall']))] += 1
+
+  for name, sums in summary.get('stages', {}).items():
+    stage = entry['stages'].setdefault(name, dict.fromkeys(sums, 0))
+    for key, value in sums.items():
+      stage[key] = stage.get(key, 0) + value
+
+
+def read(file):
+  """Return aggregate of the summaries in file. Lines that can not be parsed are skipped."""
+  aggregate = {}
+  with open(file, 'r') as f:
+    for line in f:
+      try:
+        summary = json.loads(line)
+      except ValueError:
+        # Partially written line.
+        continue
+      add(aggregate, summary)
+  return aggregate
+
+
+def metrics():
+  """Return aggregate of the summaries recorded by this process."""
+  return _aggregate
+
+
+def _label(i):
+  return str(BUCKETS[i]) if i < len(BUCKETS) else '+Inf'
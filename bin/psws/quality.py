@@ -0,0 +1,216 @@
+# Data-quality checks of the files in PSWS_DATA_DIR, used by
+# bin/check/check_files.py.
+#
+# Each file is decoded with the same code that data.py uses (see mag.py and
+# doppler.py), so a file that passes here can be served. For each file the
+# result has the row format, number of rows, first and last times, whether
+# the times are strictly increasing, the number of repeated and backward
+# time steps, the cadence (median time step), the number and longest of the
+# gaps (steps longer than GAP_FACTOR times the cadence) and whether the date
+# of the first row matches the file name. Files that can not be decoded have
+# an error instead.
+#
+# Results are kept for each dataset directory in
+#
+#   PSWS_CACHE_DIR/check/<station>/<subdir>.json
+#
+# keyed by file name with the size and modification time of the file. On
+# the next scan, only new or changed files are checked, by a pool of
+# processes, so a rescan after a sync reads only the files that the sync
+# changed.
+
+import os
+import json
+import concurrent.futures
+
+from psws import cache, data, manifest
+
+# Changing the checks or the decoders they use changes this, which causes all
+# files to be checked again. 2: quoted rows are decoded by their layout.
+VERSION = 2
+
+# A time step longer than GAP_FACTOR times the cadence is a gap.
+GAP_FACTOR = 1.5
+
+# Columns of a report, in order.
+FIELDS = ['file', 'id', 'format', 'size', 'rows', 'start', 'stop', 'monotonic',
+          'repeated', 'backward', 'cadence', 'gaps', 'max_gap', 'date_match',
+          'overlap', 'error']
+
+
+def state_file(cache_dir, rel_dir):
+  """Return file with the results for dataset directory data_dir/rel_dir."""
+  return os.path.join(cache_dir, 'check', rel_dir + '.json')
+
+
+def load_state(file):
+  """Return dict of file name to entry, or {} if none or from another VERSION."""
+  try:
+    with open(file, 'r') as f:
+      state = json.load(f)
+  except (OSError, ValueError):
+    return {}
+  if state.get('version') != VERSION:
+    return {}
+  return state.get('files', {})
+
+
+def save_state(files, file):
+  os.makedirs(os.path.dirname(file), exist_ok=True)
+  state = {'version': VERSION, 'files': files}
+  cache._replace(file, lambda f: f.write(json.dumps(state).encode()))
+
+
+def check_file(filepath, data_type):
+  """Return dict with the checks of one data file. Called in worker processes."""
+
+  import numpy as np
+
+  result = {'format': None, 'rows': 0}
+  try:
+    if data_type == 'mag':
+      from psws import mag
+      result['format'] = mag.first_row_format(filepath)
+      time = mag.decode_file(filepath)['time']
+    else:
+      from psws import doppler
+      result['format'] = 'grape'
+      time = doppler.decode(filepath)[0]['time']
+  except Exception as e:
+    # Any failure to decode, e.g., IndexError for an unexpected number of
+    # columns, is a result for the file rather than a failure of the scan.
+    result['error'] = f'{type(e).__name__}: {e}'
+    return result
+
+  result['rows'] = len(time)
+  if len(time) == 0:
+    return result
+
+  steps = np.diff(time).astype(np.int64)
+  forward = steps[steps > 0]
+  cadence = float(np.median(forward)) if len(forward) else None
+  gaps = forward[forward > GAP_FACTOR * cadence] if cadence else forward[0:0]
+
+  file_date = os.path.basename(filepath)[manifest.FILE_TYPES[data_type][1]]
+  result.update({
+    'start': _iso(time[0]),
+    'stop': _iso(time[-1]),
+    'monotonic': bool(np.all(steps > 0)),
+    'repeated': int(np.count_nonzero(steps == 0)),
+    'backward': int(np.count_nonzero(steps < 0)),
+    'cadence': cadence,
+    'gaps': len(gaps),
+    'max_gap': int(gaps.max()) if len(gaps) else 0,
+    'date_match': _iso(time[0])[0:10] == file_date
+  })
+  return result
+
+
+def _check(args):
+  return check_file(*args)
+
+
+def scan(data_dir, cache_dir, workers=None, log=None):
+  """Return (report, n_checked) for all data files in data_dir.
+
+  report is a list of dicts with FIELDS, one for each file, in dataset and
+  file order. n_checked is the number of files that were checked; results
+  for the others are from the saved state. log(msg) is called with progress
+  messages.
+  """
+
+  report = []
+  n_checked = 0
+  with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+    for rel_dir, dataset_dir, data_type in data.datasets(data_dir):
+      id = rel_dir.split(os.sep)[0] + '/' + data_type
+      file = state_file(cache_dir, rel_dir)
+      previous = load_state(file)
+
+      files, todo = {}, []
+      ext = manifest.FILE_TYPES[data_type][0]
+      with os.scandir(dataset_dir) as entries:
+        for entry in entries:
+          if not entry.name.endswith(ext) or not entry.is_file():
+            continue
+          stat = entry.stat()
+          key = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+          old = previous.get(entry.name)
+          if old is not None and old['stat'] == key:
+            files[entry.name] = old
+          else:
+            files[entry.name] = {'stat': key}
+            todo.append(entry.name)
+
+      if todo:
+        if log is not None:
+          log(f"{rel_dir}: checking {len(todo)} of {len(files)} files")
+        args = [(os.path.join(dataset_dir, name), data_type) for name in todo]
+        for name, result in zip(todo, pool.map(_check, args, chunksize=8)):
+          files[name]['result'] = result
+        n_checked += len(todo)
+
+      if todo or len(files) != len(previous):
+        try:
+          save_state(files, file)
+        except OSError as e:
+          if log is not None:
+            log(f"{rel_dir}: could not save results: {e}")
+
+      report.extend(_report(id, rel_dir, data_type, files))
+
+  return report, n_checked
+
+
+def _report(id, rel_dir, data_type, files):
+  # Report rows for a dataset, with overlap of each file with the previous.
+  date = manifest.FILE_TYPES[data_type][1]
+  rows = []
+  last = None
+  for name in sorted(files, key=lambda name: (name[date], name)):
+    result = files[name]['result']
+    row = dict.fromkeys(FIELDS)
+    row.update(result)
+    row['file'] = os.path.join(rel_dir, name)
+    row['id'] = id
+    row['size'] = files[name]['stat']['size']
+    if result.get('start') is not None:
+      row['overlap'] = last is not None and result['start'] <= last
+      last = result['stop']
+    rows.append(row)
+  return rows
+
+
+def write_report(report, file):
+  """Write report to file as CSV if file ends with .csv, else as JSON."""
+  if file.endswith('.csv'):
+    import csv
+    with open(file, 'w', newline='') as f:
+      writer = csv.DictWriter(f, fieldnames=FIELDS, lineterminator='\n')
+      writer.writeheader()
+      writer.writerows(report)
+    return
+  with open(file, 'w') as f:
+    # One file per line, so that the report can be compared with diff.
+    f.write('[\n' + ',\n'.join(json.dumps(row) for row in report) + '\n]\n')
+
+
+def problems(row):
+  """Return list of problems found in report row."""
+  result = []
+  if row.get('error'):
+    result.append(row['error'])
+  if row.get('rows') == 0 and not row.get('error'):
+    result.append("No rows")
+  if row.get('monotonic') is False:
+    result.append(f"Times not strictly increasing ({row['repeated']} repeated, "
+                  f"{row['backward']} backward)")
+  if row.get('date_match') is False:
+    result.append(f"Date of first row {row['start'][0:10]} does not match file name")
+  if row.get('overlap'):
+    result.append("First time is not after last time of previous file")
+  return result
+
+
+def _iso(value):
+  return str(value.astype('datetime64[s]')) + 'Z'
@@ -0,0 +1,83 @@
+# JSON responses compiled once and kept in memory with the validators used
+# for HTTP conditional requests, e.g.,
+#
+#   from psws import info, response
+#   document = info.document('S000028/mag')
+#   if response.not_modified(document, if_none_match, if_modified_since):
+#     ...  # 304 with response.headers(document)
+#   else:
+#     ...  # 200 with document.body and response.headers(document)
+#
+# A document is rebuilt only when the size or modification time of one of the
+# files it was built from, e.g., catalog.csv or an info template, changes.
+# The ETag is a hash of the body, so it is the same in every process that
+# serves the same document.
+
+import json
+import hashlib
+import collections
+import email.utils
+
+from psws import cache
+
+Document = collections.namedtuple('Document', ['body', 'etag', 'last_modified'])
+
+# Compiled values, keyed by the key passed to cached().
+_compiled = {}
+
+
+def compile_document(obj, mtime_ns):
+  """Return Document with the JSON for obj as written by the bin/ scripts."""
+  body = json.dumps(obj, indent=2).encode() + b'\n'
+  etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+  last_modified = email.utils.formatdate(mtime_ns / 1e9, usegmt=True)
+  return Document(body, etag, last_modified)
+
+
+def cached(key, sources, build):
+  """Return build() or the value it returned for key if sources are unchanged.
+
+  sources is a list of files that the value is built from. The value is
+  rebuilt if the size or modification time of any of them has changed.
+  """
+  stats = [cache.source_stat(source) for source in sources]
+  entry = _compiled.get(key)
+  if entry is not None and entry[0] == stats:
+    return entry[1]
+  value = build()
+  _compiled[key] = (stats, value)
+  return value
+
+
+def mtime_ns(sources):
+  """Return the latest modification time of the files in sources."""
+  return max(cache.source_stat(source)['mtime_ns'] for source in sources)
+
+
+def not_modified(document, if_none_match=None, if_modified_since=None):
+  """True if a request with these header values can be answered with a 304.
+
+  As in RFC 9110, If-Modified-Since is used only if If-None-Match is not given.
+  """
+  if if_none_match is not None:
+    etags = [etag.strip() for etag in if_none_match.split(',')]
+    # Weak comparison, as required for If-None-Match.
+    etags = [etag[2:] if etag.startswith('W/') else etag for etag in etags]
+    return '*' in etags or document.etag in etags
+
+  if if_modified_since is not None:
+    try:
+      since = email.utils.parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+      return False
+    modified = email.utils.parsedate_to_datetime(document.last_modified)
+    if since.tzinfo is None:
+      return False
+    return modified <= since
+
+  return False
+
+
+def headers(document):
+  """Return dict of validator headers for document."""
+  return {'ETag': document.etag, 'Last-Modified': document.last_modified}
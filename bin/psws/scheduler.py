@@ -0,0 +1,272 @@
+# Scheduling of the data requests answered by server.py, e.g.,
+#
+#   from psws import scheduler
+#   body = await scheduler.submit(key, client, produce)
+#   async for chunk in body:
+#     ...
+#
+# key identifies the response, e.g., (dataset, start, stop, parameters,
+# format), and produce() is a coroutine function that returns an async
+# iterator of the chunks of the response.
+#
+# Requests with the same key as one in flight share its response: the
+# chunks produced for the first request are kept and sent to each of the
+# others from the start. Chunks are kept until the flight has more than
+# PSWS_FLIGHT_BYTES bytes (default 64 MB); after that, chunks sent to all
+# clients are dropped, later requests start a new flight and the
+# production waits for the slowest client.
+#
+# At most PSWS_MAX_DECODES flights (default 4) are produced at a time. Others
+# wait in a queue in which clients take turns, so that a client with many
+# requests does not delay those of others. A request is rejected with Busy,
+# which server.py returns as HAPI 1500 with HTTP 503, if PSWS_MAX_QUEUE
+# requests (default 32) are waiting, if its client has PSWS_CLIENT_QUEUE
+# requests (default 4) waiting, or if it has waited PSWS_QUEUE_TIMEOUT
+# seconds (default 10).
+#
+# All functions must be called from the event loop of the server.
+
+import os
+import asyncio
+import collections
+
+# Flights in progress, keyed by request key.
+_flights = {}
+
+# Number of flights being produced.
+_active = 0
+
+# Futures of queued flights, a deque for each client, in turn order.
+_waiting = collections.OrderedDict()
+
+_counts = {'requests': 0, 'coalesced': 0, 'rejected': 0}
+
+
+class Busy(Exception):
+  """Request rejected because the server has too many requests."""
+
+
+def max_decodes():
+  return max(1, int(os.getenv("PSWS_MAX_DECODES", "4")))
+
+
+def max_queue():
+  return max(0, int(os.getenv("PSWS_MAX_QUEUE", "32")))
+
+
+def client_queue():
+  return max(0, int(os.getenv("PSWS_CLIENT_QUEUE", "4")))
+
+
+def queue_timeout():
+  return float(os.getenv("PSWS_QUEUE_TIMEOUT", "10"))
+
+
+def flight_bytes():
+  return max(0, int(os.getenv("PSWS_FLIGHT_BYTES", str(64 << 20))))
+
+
+def stats():
+  """Return dict with request counts and the number of active and queued flights."""
+  return {**_counts, 'active': _active, 'flights': len(_flights),
+          'queued': sum(len(queue) for queue in _waiting.values())}
+
+
+class Flight:
+  """Chunks of a response and the position of each client reading them."""
+
+  def __init__(self):
+    self.chunks = collections.deque()
+    self.first = 0          # Index in the response of chunks[0]
+    self.nbytes = 0         # Bytes in chunks
+    self.positions = {}     # Index of next chunk, keyed by client token
+    self.done = False
+    self.error = None
+    self.started = asyncio.get_running_loop().create_future()
+    self._event = asyncio.Event()
+
+  def end(self):
+    return self.first + len(self.chunks)
+
+  def joinable(self):
+    return self.first == 0 and not self.done
+
+  def notify(self):
+    self._event.set()
+    self._event = asyncio.Event()
+
+  async def wait(self, predicate):
+    while not predicate():
+      await self._event.wait()
+
+  def trim(self):
+    # Drop chunks read by all clients if over the byte limit.
+    if self.nbytes <= flight_bytes():
+      return
+    slowest = min(self.positions.values(), default=self.end())
+    while self.first < slowest:
+      self.nbytes -= len(self.chunks.popleft())
+      self.first += 1
+
+
+async def submit(key, client, produce):
+  """Return async iterator of the chunks of the response for key.
+
+  client identifies the client, e.g., its address, for fair queueing.
+  Exceptions raised by produce() before its first chunk, and Busy, are
+  raised here.
+  """
+
+  _counts['requests'] += 1
+  flight = _flights.get(key)
+  if flight is not None and flight.joinable():
+    _counts['coalesced'] += 1
+  else:
+    flight = Flight()
+    _flights[key] = flight
+    asyncio.ensure_future(_run(key, flight, client, produce))
+
+  token = object()
+  flight.positions[token] = 0
+  try:
+    await asyncio.shield(flight.started)
+  except BaseException:
+    _leave(flight, token)
+    raise
+  return _read(flight, token)
+
+
+async def _read(flight, token):
+  try:
+    while True:
+      await flight.wait(lambda: flight.positions[token] < flight.end() or flight.done)
+      position = flight.positions[token]
+      if position == flight.end():
+        if flight.error is not None:
+          raise flight.error
+        return
+      chunk = flight.chunks[position - flight.first]
+      flight.positions[token] = position + 1
+      flight.trim()
+      flight.notify()
+      yield chunk
+  finally:
+    _leave(flight, token)
+
+
+def _leave(flight, token):
+  flight.positions.pop(token, None)
+  flight.trim()
+  flight.notify()
+
+
+async def _run(key, flight, client, produce):
+  # Produce the chunks of flight once it is admitted.
+  try:
+    await _admit(client)
+  except Busy as e:
+    _counts['rejected'] += 1
+    _finish(key, flight, e)
+    return
+
+  iterator = None
+  try:
+    if flight.positions:
+      iterator = await produce()
+      flight.started.set_result(None)
+      async for chunk in iterator:
+        flight.chunks.append(chunk)
+        flight.nbytes += len(chunk)
+        flight.trim()
+        flight.notify()
+        if flight.first > 0 and _flights.get(key) is flight:
+          # Chunks have been dropped, so later requests can not join.
+          del _flights[key]
+        await flight.wait(lambda: not flight.positions or flight.nbytes <= flight_bytes())
+        if not flight.positions:
+          break
+    _finish(key, flight)
+  except Exception as e:
+    _finish(key, flight, e)
+  finally:
+    if iterator is not None:
+      await iterator.aclose()
+    _release()
+
+
+def _finish(key, flight, error=None):
+  if _flights.get(key) is flight:
+    del _flights[key]
+  flight.done = True
+  if not flight.started.done():
+    if error is None:
+      flight.started.set_result(None)
+    else:
+      flight.started.set_exception(error)
+      # Clients that left before the error was set do not retrieve it.
+      flight.started.exception()
+  else:
+    flight.error = error
+  flight.notify()
+
+
+async def _admit(client):
+  # Return when a flight for client can be produced. Raises Busy.
+  global _active
+  if _active < max_decodes() and not _waiting:
+    _active += 1
+    return
+
+  if sum(len(queue) for queue in _waiting.values()) >= max_queue():
+    raise Busy("too many requests queued")
+  queue = _waiting.get(client)
+  if queue is not None and len(queue) >= client_queue():
+    raise Busy("too many requests queued for client")
+
+  future = asyncio.get_running_loop().create_future()
+  _waiting.setdefault(client, collections.deque()).append(future)
+  try:
+    await asyncio.wait_for(future, queue_timeout())
+  except asyncio.TimeoutError:
+    # _release() may have passed its slot to this flight in the iteration of
+    # the loop in which the timeout fired, in which case it is admitted.
+    if not _admitted(future):
+      _dequeue(client, future)
+      raise Busy(f"request waited more than {queue_timeout()} s")
+  except BaseException:
+    if _admitted(future):
+      # Pass on the slot that _release() passed to this flight.
+      _release()
+    else:
+      _dequeue(client, future)
+    raise
+  # _release() passed its slot to this flight.
+
+
+def _admitted(future):
+  return future.done() and not future.cancelled()
+
+
+def _dequeue(client, future):
+  queue = _waiting.get(client)
+  if queue is not None and future in queue:
+    queue.remove(future)
+    if not queue:
+      del _waiting[client]
+
+
+def _release():
+  # Pass the slot of a finished flight to the next queued flight, taking
+  # clients in turn.
+  global _active
+  while _waiting:
+    client, queue = next(iter(_waiting.items()))
+    future = queue.popleft()
+    if queue:
+      _waiting.move_to_end(client)
+    else:
+      del _waiting[client]
+    if not future.done():
+      future.set_result(None)
+      return
+  _active -= 1
@@ -0,0 +1,567 @@
+# HAPI catalog, info and data endpoints as an ASGI app, e.g.,
+#
+#   from psws import server
+#   app = server.app()   # FastAPI app, routes /catalog, /info, /data, ...
+#
+# wsgi/wsgi.py mounts the app at /hapi next to the Django site, and it can
+# also be run by an ASGI server, e.g., uvicorn. Requests are answered
+# in-process, so there is no Python process started per request.
+#
+# The catalog and info responses are the compiled documents of catalog.py
+# and info.py with the HAPI header added to the catalog, and requests with a
+# matching If-None-Match or If-Modified-Since are answered with a 304; see
+# response.py.
+#
+# Data responses are streamed from an async generator. The response is
+# computed by data.iter_records() in a pool of PSWS_SERVER_THREADS threads
+# (default 4) one chunk of xstream.chunk_size bytes at a time (see
+# stream.py), so decoding does not block the event loop and a slow client
+# only delays the computation of its next chunk. Files of multi-day requests
+# are decoded in PSWS_WORKERS processes, as for bin/data.py.
+#
+# A data response has an ETag computed from the request and the size and
+# modification time of the data files it is computed from (as found by
+# data.files_needed()) and a Last-Modified time of the newest of these files,
+# so a request with a matching If-None-Match or If-Modified-Since is answered
+# with a 304 without reading the files. Responses for time ranges that end
+# before the start of the current UTC day, whose files are complete, may be
+# cached for PSWS_PAST_MAX_AGE seconds (default 7 days); others must be
+# revalidated. Responses for ranges with a day that has no file have no
+# validators and must not be reused, as the file may be synced later.
+#
+# Data responses are compressed with gzip or zstd if the client accepts it
+# (see stream.compress()). Each chunk is compressed in the thread that
+# computes it, and the ETag depends on the content coding.
+#
+# Identical data requests in flight share one response, the number of
+# responses computed at a time is limited, and requests over the limit are
+# queued or, if the server is overloaded, answered with HAPI 1500 and HTTP
+# 503; see scheduler.py.
+#
+# /stations and /bulk, which are not HAPI endpoints, answer the spatial
+# queries of bin/bulk.py: /stations?type=mag&region=W,S,E,N (or
+# region=LAT,LONG,KM) returns the datasets in the region, and /bulk with
+# start, stop and optionally parameters also returns their data as one CSV
+# response with the dataset id as the first column; see spatial.py and
+# data.iter_bulk(). Bulk responses are scheduled as data responses are but
+# have no validators, as the set of datasets depends on catalog.csv.
+#
+# If timing is enabled (see timing.py), the stages of each data and bulk
+# response are timed, a summary is written to stderr and recorded when the
+# response ends, and /metrics returns the latency histograms and stage sums
+# of the requests answered by the process; see metrics.py. Code run for a
+# request in other threads is run in a copy of its context, so that
+# concurrent requests do not add to each other's sums.
+
+import os
+import json
+import asyncio
+import hashlib
+import datetime
+import contextvars
+import email.utils
+import concurrent.futures
+
+from psws import cache, catalog, data, info, metrics, response, scheduler, spatial, stream, \
+  timing
+
+HAPI_VERSION = '3.3'
+
+# HTTP status of each HAPI error code.
+HTTP_STATUS = {
+  1400: 400, 1402: 400, 1403: 400, 1404: 400, 1406: 404, 1407: 404,
+  1408: 413, 1409: 400, 1500: 500
+}
+
+# Seconds in the Retry-After header of a response to a rejected request.
+RETRY_AFTER = 5
+
+# Message of each HAPI status code, as in the HAPI specification.
+MESSAGES = {
+  1200: 'OK',
+  1400: 'Bad request - user input error',
+  1402: 'Bad request - error in start time',
+  1403: 'Bad request - error in stop time',
+  1404: 'Bad request - start time equal to or after stop time',
+  1406: 'Bad request - unknown dataset id',
+  1407: 'Bad request - unknown dataset parameter',
+  1408: 'Bad request - too much time or data requested',
+  1409: 'Bad request - unsupported output format',
+  1500: 'Internal server error'
+}
+
+MEDIA_TYPES = {'csv': 'text/csv', 'binary': 'application/octet-stream'}
+
+# Changing the content of data responses changes this, which changes their
+# ETags.
+DATA_VERSION = 1
+
+# Thread pool used to compute data responses; see executor().
+_executor = None
+
+
+class HAPIError(Exception):
+  """Error with a HAPI status code and a detail for the status message.
+
+  http_status is the HTTP status of the response (default HTTP_STATUS[code]).
+  """
+
+  def __init__(self, code, detail=None, http_status=None):
+    super().__init__(detail or MESSAGES[code])
+    self.code = code
+    self.detail = detail
+    self.http_status = http_status or HTTP_STATUS[code]
+
+
+def threads():
+  """Return PSWS_SERVER_THREADS or, if not set, 4."""
+  return max(1, int(os.getenv("PSWS_SERVER_THREADS", "4")))
+
+
+def executor():
+  """Return the thread pool used to compute data responses."""
+  global _executor
+  if _executor is None:
+    _executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads(),
+                                                      thread_name_prefix='psws-data')
+  return _executor
+
+
+def status(code, detail=None):
+  """Return HAPI status dict for code with detail appended to the message."""
+  message = MESSAGES[code]
+  if detail:
+    message = f'{message}: {detail}'
+  return {'code': code, 'message': message}
+
+
+def error_body(error):
+  """Return JSON bytes of the HAPI error response for HAPIError error."""
+  body = {'HAPI': HAPI_VERSION, 'status': status(error.code, error.detail)}
+  return json.dumps(body, indent=2).encode() + b'\n'
+
+
+def catalog_document(file=catalog.CATALOG_FILE):
+  """Return response.Document for /hapi/catalog, the catalog with the HAPI header."""
+  def build():
+    body = {'HAPI': HAPI_VERSION, 'status': status(1200), 'catalog': catalog.catalog(file)}
+    return response.compile_document(body, response.mtime_ns([file]))
+  return response.cached(('server.catalog', file), [file], build)
+
+
+def past_max_age():
+  """Return PSWS_PAST_MAX_AGE or, if not set, 7 days in seconds."""
+  return max(0, int(os.getenv("PSWS_PAST_MAX_AGE", str(7 * 86400))))
+
+
+def capabilities():
+  return {'HAPI': HAPI_VERSION, 'status': status(1200), 'outputFormats': data.FORMATS}
+
+
+def info_document(dataset):
+  """Return response.Document for /hapi/info. Raises HAPIError if not found."""
+  if not dataset:
+    raise HAPIError(1400, 'dataset is required')
+  try:
+    return info.document(dataset)
+  except ValueError as e:
+    raise HAPIError(1406, str(e))
+
+
+def data_request(query):
+  """Return (id, start, stop, parameters, format) for data request query.
+
+  query is a mapping of the request parameters. HAPI 2 names, e.g., id and
+  time.min, are accepted. Raises HAPIError if the request is not valid.
+  """
+
+  id = query.get('dataset', query.get('id'))
+  dataset_info = json.loads(info_document(id).body)
+  start, stop = time_range(query, dataset_info)
+  parameters = parameter_list(query, dataset_info)
+
+  format = query.get('format', 'csv')
+  if format not in data.FORMATS:
+    raise HAPIError(1409, format)
+
+  return id, start, stop, parameters, format
+
+
+def time_range(query, dataset_info=None):
+  """Return (start, stop) of request query as YYYY-MM-DDTHH:MM:SSZ.
+
+  The readers compare times as strings, so other HAPI forms, e.g.,
+  2019-05-24T00:07Z or 2019-144T00:07Z, are normalized; see
+  isotime.normalize(). Raises HAPIError if the times are not valid or if the
+  range is longer than the maxRequestDuration in dataset_info.
+  """
+
+  from psws import isotime
+
+  times = []
+  for names, code in [(['start', 'time.min'], 1402), (['stop', 'time.max'], 1403)]:
+    value = next((query[name] for name in names if name in query), None)
+    try:
+      times.append(isotime.normalize(value))
+    except (TypeError, ValueError):
+      raise HAPIError(code, f"'{value}' is not a HAPI isotime")
+  start, stop = times
+  if start >= stop:
+    raise HAPIError(1404)
+
+  max_duration = (dataset_info or {}).get('maxRequestDuration')
+  if max_duration and isotime.parse(stop) - isotime.parse(start) > isotime.duration(max_duration):
+    raise HAPIError(1408, f'maxRequestDuration is {max_duration}')
+  return start, stop
+
+
+def parameter_list(query, dataset_info):
+  """Return list of parameters requested in query, without Time, or None for all."""
+  parameters = None
+  if query.get('parameters'):
+    parameters = [p.strip() for p in query['parameters'].split(',')]
+    known = [p['name'] for p in dataset_info['parameters']]
+    unknown = [p for p in parameters if p not in known]
+    if unknown:
+      raise HAPIError(1407, ', '.join(unknown))
+    # Time, the first parameter, is always returned.
+    parameters = [p for p in parameters if p != known[0]]
+  return parameters
+
+
+def stations_request(query):
+  """Return spatial.query() list for the type and region in query.
+
+  Raises HAPIError if the request is not valid.
+  """
+  for name in ['type', 'region']:
+    if not query.get(name):
+      raise HAPIError(1400, f'{name} is required')
+  try:
+    return spatial.query(spatial.region(query['region']), query['type'])
+  except ValueError as e:
+    raise HAPIError(1400, str(e))
+
+
+def bulk_request(query):
+  """Return (ids, start, stop, parameters) for bulk data request query.
+
+  ids are the datasets found by stations_request(query). Only CSV is
+  returned, as the dataset id is added to each line. Raises HAPIError if the
+  request is not valid.
+  """
+  ids = [station['id'] for station in stations_request(query)]
+  # Datasets of a type have the same parameters and maxRequestDuration.
+  dataset_info = json.loads(info_document(ids[0]).body) if ids else None
+  start, stop = time_range(query, dataset_info)
+  parameters = None
+  if ids:
+    parameters = parameter_list(query, dataset_info)
+  format = query.get('format', 'csv')
+  if format != 'csv':
+    raise HAPIError(1409, f'{format}; bulk responses are csv')
+  return ids, start, stop, parameters
+
+
+def content_coding(accept_encoding):
+  """Return the coding in stream.encodings() for an Accept-Encoding value or None.
+
+  None means that the response is not compressed. Of the codings with the
+  highest q-value, the first in stream.encodings() is used.
+  """
+  if not accept_encoding:
+    return None
+  weights = {}
+  for item in accept_encoding.split(','):
+    name, *params = [part.strip() for part in item.split(';')]
+    weight = 1.0
+    for param in params:
+      key, _, value = param.partition('=')
+      if key.strip() == 'q':
+        try:
+          weight = float(value)
+        except ValueError:
+          weight = 0.0
+    weights[name.lower()] = weight
+  best, coding = 0.0, None
+  for encoding in stream.encodings():
+    weight = weights.get(encoding, weights.get('*', 0.0))
+    if weight > best:
+      best, coding = weight, encoding
+  return coding
+
+
+def data_document(id, start, stop, parameters, format, encoding=None):
+  """Return response.Document with the validators of a data response.
+
+  The Document has no body. Returns None if the files for the request can
+  not be found, in which case the request fails when its data is read, or
+  if a day in [start, stop) has no file, e.g., one not yet synced, as the
+  response would change when the file is added.
+  """
+
+  try:
+    files = data.files_needed(id, start, stop, data.default_data_dir(),
+                              data.default_cache_dir())
+    stats = [[os.path.basename(file), cache.source_stat(file)] for file in files]
+  except data.ERRORS:
+    return None
+  if missing_days(id, files, start, stop):
+    return None
+
+  key = [DATA_VERSION, id, start, stop, parameters, format, encoding, stats]
+  etag = '"' + hashlib.sha1(json.dumps(key).encode()).hexdigest() + '"'
+  mtime_ns = max(stat['mtime_ns'] for _, stat in stats)
+  last_modified = email.utils.formatdate(mtime_ns / 1e9, usegmt=True)
+  return response.Document(None, etag, last_modified)
+
+
+def missing_days(id, files, start, stop):
+  """Return list of the days YYYY-MM-DD in [start, stop) without a file in files."""
+
+  import numpy as np
+  from psws import isotime, manifest, tiers
+
+  data_type = tiers.split_id(id)[0].split('/')[-1]
+  date = manifest.FILE_TYPES[data_type][1]
+  found = {os.path.basename(file)[date] for file in files}
+  last = isotime.parse(stop) - np.timedelta64(1, 's')
+  days = np.arange(np.datetime64(start[0:10], 'D'), last.astype('datetime64[D]') + 1)
+  return [str(day) for day in days if str(day) not in found]
+
+
+def cache_control(stop):
+  """Return Cache-Control header value for a data response ending at stop."""
+
+  from psws import isotime
+
+  today = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d')
+  if isotime.parse(stop) <= isotime.parse(today) and past_max_age() > 0:
+    return f'public, max-age={past_max_age()}'
+  return 'no-cache'
+
+
+async def chunks(records, chunk_size, encoding=None):
+  """Yield the chunks of sync iterable records, computing each in executor().
+
+  If encoding is not None, the chunks are compressed with it, also in
+  executor().
+
+  If the consumer stops early, e.g., when a client disconnects, records is
+  closed, which stops the decoding of files not yet started.
+
+  records is iterated in a copy of the current context, so that its stages
+  are timed for the request that started it.
+  """
+
+  pool = executor()
+  context = contextvars.copy_context()
+  iterator = stream.chunks(records, chunk_size)
+  if encoding is not None:
+    iterator = stream.compress(iterator, encoding)
+  future = None
+  try:
+    while True:
+      future = pool.submit(context.run, next, iterator, None)
+      chunk = await asyncio.wrap_future(future)
+      if chunk is None:
+        return
+      yield chunk
+  finally:
+    # A generator can not be closed while next() is running in a thread, so
+    # it is closed once that call returns.
+    if future is not None and not future.done():
+      future.add_done_callback(lambda _: context.run(iterator.close))
+    else:
+      context.run(iterator.close)
+
+
+async def data_chunks(id, start, stop, parameters, format, chunk_size, encoding=None):
+  """Return async iterator of the data response, or raise HAPIError.
+
+  The first chunk is computed before returning so that errors found when
+  starting the request, e.g., a missing data directory, are raised here
+  rather than after the response status has been sent.
+  """
+
+  records = data.iter_records(id, start, stop, parameters, format=format)
+  return await started(records, chunk_size, encoding)
+
+
+async def bulk_chunks(ids, start, stop, parameters, chunk_size, encoding=None):
+  """Return async iterator of the bulk data response, or raise HAPIError."""
+  records = data.iter_bulk(ids, start, stop, parameters)
+  return await started(records, chunk_size, encoding)
+
+
+async def started(records, chunk_size, encoding=None):
+  """Return async iterator of chunks(records, ...) with its first chunk computed.
+
+  Raises HAPIError if computing the first chunk fails.
+  """
+
+  iterator = chunks(records, chunk_size, encoding)
+  try:
+    first = await iterator.__anext__()
+  except StopAsyncIteration:
+    first = None
+  except data.ERRORS as e:
+    raise HAPIError(1500, str(e))
+
+  async def rest():
+    try:
+      if first is None:
+        return
+      yield first
+      async for chunk in iterator:
+        yield chunk
+    finally:
+      await iterator.aclose()
+
+  return rest()
+
+
+async def reported(body, request, started):
+  """Yield the chunks of body and timing.report() the request when it ends.
+
+  started is the timing.clock() value when the request was received.
+  """
+  n_bytes = 0
+  try:
+    async for chunk in body:
+      n_bytes += len(chunk)
+      yield chunk
+  except Exception as e:
+    timing.report({**request, 'error': str(e)}, started)
+    raise
+  timing.report({**request, 'bytes': n_bytes}, started)
+
+
+def metrics_document():
+  """Return dict for /metrics with the aggregate of the requests timed by this process."""
+  return {'enabled': timing.enabled(), 'buckets': metrics.BUCKETS,
+          'datasets': metrics.metrics()}
+
+
+def app(chunk_size=None):
+  """Return FastAPI app with the HAPI endpoints.
+
+  chunk_size is the size of the chunks of data responses (default
+  xstream.chunk_size in config.json).
+  """
+
+  import fastapi
+  from fastapi.responses import Response, StreamingResponse
+
+  if chunk_size is None:
+    chunk_size = stream.chunk_size()
+
+  hapi = fastapi.FastAPI()
+
+  def json_response(document, request):
+    headers = response.headers(document)
+    if response.not_modified(document, request.headers.get('if-none-match'),
+                             request.headers.get('if-modified-since')):
+      return Response(status_code=304, headers=headers)
+    return Response(document.body, media_type='application/json', headers=headers)
+
+  def error_response(error, headers=None):
+    return Response(error_body(error), status_code=error.http_status,
+                    media_type='application/json', headers=headers)
+
+  def failed(error, timed, started):
+    # Error response for a data or bulk request, reported if it was valid.
+    if timed is not None:
+      timing.report({**timed, 'error': str(error)}, started)
+    if isinstance(error, scheduler.Busy):
+      return error_response(HAPIError(1500, f'server busy, {error}', 503),
+                            {'Retry-After': str(RETRY_AFTER)})
+    return error_response(error)
+
+  @hapi.get('/capabilities')
+  async def get_capabilities():
+    return capabilities()
+
+  @hapi.get('/catalog')
+  async def get_catalog(request: fastapi.Request):
+    return json_response(catalog_document(), request)
+
+  @hapi.get('/info')
+  async def get_info(request: fastapi.Request):
+    query = request.query_params
+    try:
+      return json_response(info_document(query.get('dataset', query.get('id'))), request)
+    except HAPIError as e:
+      return error_response(e)
+
+  @hapi.get('/metrics')
+  async def get_metrics():
+    return metrics_document()
+
+  @hapi.get('/data')
+  async def get_data(request: fastapi.Request):
+    timing.reset()
+    started = timing.clock()
+    timed = None
+    try:
+      id, start, stop, parameters, format = data_request(request.query_params)
+      timed = {'id': id, 'start': start, 'stop': stop, 'parameters': parameters,
+               'format': format}
+      encoding = content_coding(request.headers.get('accept-encoding'))
+
+      # Files are found and stat'd in a thread, as a slow file system would
+      # block the event loop.
+      validators = await asyncio.to_thread(data_document, id, start, stop, parameters,
+                                           format, encoding)
+      headers = {'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+      if validators is not None:
+        headers.update(response.headers(validators))
+        headers['Cache-Control'] = cache_control(stop)
+        if response.not_modified(validators, request.headers.get('if-none-match'),
+                                 request.headers.get('if-modified-since')):
+          return Response(status_code=304, headers=headers)
+      if encoding is not None:
+        headers['Content-Encoding'] = encoding
+
+      key = (id, start, stop, None if parameters is None else tuple(parameters),
+             format, encoding)
+      client = request.client.host if request.client else None
+      body = await scheduler.submit(key, client, lambda: data_chunks(
+        id, start, stop, parameters, format, chunk_size, encoding))
+    except (HAPIError, scheduler.Busy) as e:
+      return failed(e, timed, started)
+    return StreamingResponse(reported(body, timed, started), media_type=MEDIA_TYPES[format],
+                             headers=headers)
+
+  @hapi.get('/stations')
+  async def get_stations(request: fastapi.Request):
+    try:
+      stations = stations_request(request.query_params)
+    except HAPIError as e:
+      return error_response(e)
+    return {'HAPI': HAPI_VERSION, 'status': status(1200), 'stations': stations}
+
+  @hapi.get('/bulk')
+  async def get_bulk(request: fastapi.Request):
+    timing.reset()
+    started = timing.clock()
+    timed = None
+    try:
+      ids, start, stop, parameters = bulk_request(request.query_params)
+      timed = {'ids': ids, 'start': start, 'stop': stop, 'parameters': parameters}
+      encoding = content_coding(request.headers.get('accept-encoding'))
+      headers = {'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+      if encoding is not None:
+        headers['Content-Encoding'] = encoding
+
+      key = ('bulk', tuple(ids), start, stop,
+             None if parameters is None else tuple(parameters), encoding)
+      client = request.client.host if request.client else None
+      body = await scheduler.submit(key, client, lambda: bulk_chunks(
+        ids, start, stop, parameters, chunk_size, encoding))
+    except (HAPIError, scheduler.Busy) as e:
+      return failed(e, timed, started)
+    return StreamingResponse(reported(body, timed, started), media_type=MEDIA_TYPES['csv'],
+                             headers=headers)
+
+  return hapi
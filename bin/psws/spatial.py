@@ -0,0 +1,181 @@
+# Spatial queries over the locations of the datasets in catalog.csv, e.g.,
+#
+#   from psws import spatial
+#   spatial.query(spatial.region('-90,30,-70,45'), 'mag')    # box W,S,E,N
+#   spatial.query(spatial.region('41.3,-75.6,500'), 'mag')   # LAT,LONG,KM
+#
+# The datasets are kept in a grid of CELL x CELL degree cells of latitude
+# and longitude, built once and rebuilt when catalog.csv changes (see
+# response.py), so a query looks only at the stations in the cells that
+# overlap the box or circle. Datasets without a location are not in the
+# grid.
+#
+# Boxes with west > east cross the antimeridian. Distances are great-circle
+# distances on a sphere of radius EARTH_RADIUS.
+
+import math
+import collections
+
+from psws import catalog, response
+
+# Size of grid cells in degrees.
+CELL = 5.0
+
+# Mean radius of the Earth in km.
+EARTH_RADIUS = 6371.0
+
+ROWS = int(math.ceil(180 / CELL))
+COLUMNS = int(math.ceil(360 / CELL))
+
+Station = collections.namedtuple('Station', ['id', 'lat', 'long', 'elevation'])
+
+Region = collections.namedtuple('Region', ['kind', 'values'])
+
+
+def index(file=catalog.CATALOG_FILE):
+  """Return dict of grid cell (row, column) to list of Stations in it."""
+  return response.cached(('spatial.index', file), [file],
+                         lambda: _build(catalog.get_catalog(file)))
+
+
+def _build(datasets):
+  grid = collections.defaultdict(list)
+  for id, entry in datasets.items():
+    if entry['lat'] is None or entry['long'] is None:
+      continue
+    station = Station(id, entry['lat'], entry['long'], entry['elevation'])
+    grid[_cell(station.lat, station.long)].append(station)
+  return dict(grid)
+
+
+def _row(lat):
+  return min(ROWS - 1, max(0, int((lat + 90) // CELL)))
+
+
+def _column(long):
+  # long = 180 is in the last column, not with long = -180 in the first.
+  return min(COLUMNS - 1, max(0, int((long + 180) // CELL)))
+
+
+def _wrap(long):
+  return (long + 180) % 360 - 180
+
+
+def _cell(lat, long):
+  return _row(lat), _column(long)
+
+
+def region(text):
+  """Return Region for 'W,S,E,N' (a box) or 'LAT,LONG,KM' (a circle).
+
+  Raises ValueError if text is neither or is out of range.
+  """
+  try:
+    values = [float(value) for value in text.split(',')]
+  except ValueError:
+    raise ValueError(f"Region '{text}' is not a list of numbers")
+  if len(values) == 4:
+    west, south, east, north = values
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+      raise ValueError(f"Box '{text}' is not W,S,E,N with -90 <= S <= N <= 90 and "
+                       "-180 <= W, E <= 180")
+    return Region('box', values)
+  if len(values) == 3:
+    lat, long, km = values
+    if not (-90 <= lat <= 90 and -180 <= long <= 180 and km >= 0):
+      raise ValueError(f"Circle '{text}' is not LAT,LONG,KM with KM >= 0")
+    return Region('radius', values)
+  raise ValueError(f"Region '{text}' must be W,S,E,N or LAT,LONG,KM")
+
+
+def in_box(west, south, east, north, file=catalog.CATALOG_FILE):
+  """Return Stations in box, sorted by id."""
+
+  if west <= east:
+    columns = range(_column(west), _column(east) + 1) if east - west < 360 else range(COLUMNS)
+  else:
+    columns = [*range(_column(west), COLUMNS), *range(0, _column(east) + 1)]
+
+  def inside(station):
+    if not south <= station.lat <= north:
+      return False
+    if west <= east:
+      return west <= station.long <= east
+    return station.long >= west or station.long <= east
+
+  grid = index(file)
+  found = [station for row in range(_row(south), _row(north) + 1)
+           for column in dict.fromkeys(columns)
+           for station in grid.get((row, column), []) if inside(station)]
+  return sorted(found)
+
+
+def in_radius(lat, long, km, file=catalog.CATALOG_FILE):
+  """Return list of (Station, km) within km of (lat, long), nearest first."""
+
+  # The circle is inside lat +/- angle and, unless it includes a pole,
+  # long +/- asin(sin(angle)/cos(lat)).
+  angle = math.degrees(km / EARTH_RADIUS)
+  south, north = lat - angle, lat + angle
+  if angle >= 90 or north >= 90 or south <= -90:
+    columns = range(COLUMNS)
+  else:
+    ratio = math.sin(math.radians(angle)) / math.cos(math.radians(lat))
+    if ratio >= 1:
+      columns = range(COLUMNS)
+    else:
+      width = math.degrees(math.asin(ratio))
+      first, last = _column(_wrap(long - width)), _column(_wrap(long + width))
+      if first <= last:
+        columns = range(first, last + 1)
+      else:
+        columns = [*range(first, COLUMNS), *range(0, last + 1)]
+
+  grid = index(file)
+  found = []
+  for row in range(_row(max(-90, south)), _row(min(90, north)) + 1):
+    for column in dict.fromkeys(columns):
+      for station in grid.get((row, column), []):
+        distance = _distance(lat, long, station.lat, station.long)
+        if distance <= km:
+          found.append((station, distance))
+  return sorted(found, key=lambda item: (item[1], item[0].id))
+
+
+def _distance(lat1, long1, lat2, long2):
+  # Haversine formula.
+  lat1, long1, lat2, long2 = map(math.radians, [lat1, long1, lat2, long2])
+  a = math.sin((lat2 - lat1) / 2) ** 2 \
+    + math.cos(lat1) * math.cos(lat2) * math.sin((long2 - long1) / 2) ** 2
+  return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def query(region, dataset_type, file=catalog.CATALOG_FILE):
+  """Return list of dicts for the datasets of dataset_type in region.
+
+  dataset_type is the part of a dataset id after the station, e.g., 'mag',
+  'doppler' or 'mag/PT1M'. Each dict has the dataset id, its location and,
+  for a circle, its distance in km from the center.
+  """
+
+  from psws import tiers
+
+  base_type, _, cadence = dataset_type.partition('/')
+  if cadence and cadence not in tiers.CADENCES:
+    raise ValueError(f"Unknown cadence '{cadence}' in dataset type '{dataset_type}'")
+
+  if region.kind == 'box':
+    found = [(station, None) for station in in_box(*region.values, file=file)]
+  else:
+    found = in_radius(*region.values, file=file)
+
+  result = []
+  for station, distance in found:
+    if station.id.split('/')[-1] != base_type:
+      continue
+    entry = {'id': station.id + (f'/{cadence}' if cadence else ''), 'lat': station.lat,
+             'long': station.long, 'elevation': station.elevation}
+    if distance is not None:
+      entry['distance'] = round(distance, 3)
+    result.append(entry)
+  return result
@@ -0,0 +1,213 @@
+# Build the rows of catalog.csv from the data tree in PSWS_DATA_DIR.
+#
+# For each dataset directory, e.g., S000028/magData, the start and stop dates
+# are the first time in the first file and the last time in the last file of
+# the dataset's manifest (see manifest.py), so only two files are read. The
+# location of a doppler dataset is read from the first line of its last file.
+# Magnetometer files have no location, so the location and nickname of a
+# dataset that is already in the catalog are kept.
+#
+# The result for each dataset is saved in PSWS_CACHE_DIR/catalog.json with the
+# size and modification time of the first and last files. On the next scan,
+# a dataset is read again only if its directory changed (which changes its
+# manifest) or its first or last file changed, e.g., because data for the
+# current day was appended to it. Dataset directories are scanned by a pool
+# of threads; most of the time is spent in os.stat(), os.scandir() and zlib,
+# which release the GIL.
+
+import io
+import os
+import csv
+import json
+import concurrent.futures
+
+from psws import cache, catalog, data, manifest
+
+STATE_FILE = 'catalog.json'
+
+CATALOG_HEADER = '# id, nickname,startDateTime, stopDateTime, lat, long, elevation'
+
+ISO_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def state_file(cache_dir):
+  """Return file with the results of the last scan."""
+  return os.path.join(cache_dir, STATE_FILE)
+
+
+def load_state(cache_dir):
+  """Return results of the last scan or {} if none."""
+  try:
+    with open(state_file(cache_dir), 'r') as f:
+      return json.load(f)
+  except (OSError, ValueError):
+    return {}
+
+
+def save_state(state, cache_dir):
+  file = state_file(cache_dir)
+  os.makedirs(cache_dir, exist_ok=True)
+  cache._replace(file, lambda f: f.write(json.dumps(state, indent=2).encode()))
+
+
+def scan(data_dir, cache_dir, state=None, workers=None):
+  """Return (state, n_read) for all datasets in data_dir.
+
+  state is a dict with an entry for each dataset ID, see dataset(). Entries in
+  the given state are reused for datasets that have not changed. n_read is
+  the number of datasets whose files were read.
+  """
+
+  if state is None:
+    state = {}
+
+  def scan_one(args):
+    rel_dir, dataset_dir, data_type = args
+    id = rel_dir.split(os.sep)[0] + '/' + data_type
+    return id, dataset(rel_dir, dataset_dir, data_type, cache_dir, state.get(id))
+
+  with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+    results = list(pool.map(scan_one, data.datasets(data_dir)))
+
+  new_state = {}
+  n_read = 0
+  for id, (entry, read) in results:
+    if entry is not None:
+      new_state[id] = entry
+    n_read += read
+
+  return new_state, n_read
+
+
+def dataset(rel_dir, dataset_dir, data_type, cache_dir, previous=None):
+  """Return (entry, read) for one dataset directory.
+
+  entry is a dict with the first and last files and their stats, the
+  start and stop times and, for doppler datasets, the header metadata. It is
+  None if the directory has no files with data. read is True if files were
+  read and False if previous was reused.
+  """
+
+  manifest_file = manifest.manifest_file(cache_dir, rel_dir)
+  files = manifest.load(dataset_dir, data_type, manifest_file)['files']
+  if not files:
+    return None, False
+
+  first_file, last_file = files[0], files[-1]
+  try:
+    first_stat = cache.source_stat(os.path.join(dataset_dir, first_file))
+    last_stat = cache.source_stat(os.path.join(dataset_dir, last_file))
+  except OSError:
+    # File removed after the manifest was loaded.
+    return previous, False
+
+  if previous is not None and 'error' not in previous \
+      and previous.get('first') == [first_file, first_stat] \
+      and previous.get('last') == [last_file, last_stat]:
+    return previous, False
+
+  entry = {
+    'first': [first_file, first_stat],
+    'last': [last_file, last_stat],
+    'startDateTime': None,
+    'stopDateTime': None,
+    'header': None
+  }
+  try:
+    if data_type == 'mag':
+      _read_mag(entry, dataset_dir, first_file, last_file)
+    else:
+      _read_doppler(entry, dataset_dir, first_file, last_file)
+  except (OSError, ValueError, EOFError) as e:
+    # Files that can not be read, e.g., a zip file being written, are read
+    # again on the next scan.
+    data.log(f"Could not read {rel_dir}: {e}")
+    entry['error'] = str(e)
+
+  return entry, True
+
+
+def _read_mag(entry, dataset_dir, first_file, last_file):
+
+  from psws import mag
+
+  first = mag.first_time(os.path.join(dataset_dir, first_file))
+  last = mag.last_time(os.path.join(dataset_dir, last_file))
+  if first is not None and last is not None:
+    entry['startDateTime'] = first.strftime(ISO_FORMAT)
+    entry['stopDateTime'] = last.strftime(ISO_FORMAT)
+
+
+def _read_doppler(entry, dataset_dir, first_file, last_file):
+
+  from psws import doppler
+
+  _, start, _ = doppler.time_range(os.path.join(dataset_dir, first_file))
+  header, _, stop = doppler.time_range(os.path.join(dataset_dir, last_file))
+  entry['startDateTime'] = start
+  entry['stopDateTime'] = stop
+  entry['header'] = doppler.header(header)
+
+
+def rows(state, catalog_file=catalog.CATALOG_FILE):
+  """Return catalog.csv rows with the start and stop dates in state.
+
+  Datasets already in catalog_file are kept in the same order, followed by
+  new datasets sorted by ID. Datasets not found in state are kept unchanged.
+  """
+
+  current = {}
+  if os.path.exists(catalog_file):
+    current = catalog.get_catalog(catalog_file)
+
+  def location(id):
+    if id not in current:
+      return ['', '', '']
+    return [_str(current[id][key]) for key in ['lat', 'long', 'elevation']]
+
+  ids = list(current) + sorted(id for id in state if id not in current)
+  result = []
+  for id in ids:
+    entry = state.get(id)
+    if entry is None or entry['startDateTime'] is None:
+      if id in current:
+        c = current[id]
+        result.append([id, c['nickname'], c['startDateTime'], c['stopDateTime'], *location(id)])
+      continue
+
+    nickname = current[id]['nickname'] if id in current else ''
+    loc = location(id)
+    header = entry.get('header')
+    if header is not None:
+      nickname = nickname or header['grid']
+      loc = [_str(header[key]) for key in ['lat', 'long', 'elevation']]
+
+    result.append([id, nickname, entry['startDateTime'], entry['stopDateTime'], *loc])
+
+  return result
+
+
+def write(rows, catalog_file=catalog.CATALOG_FILE):
+  """Write catalog.csv rows to catalog_file. Returns False if unchanged.
+
+  The file is not written if it is unchanged, so that its modification time,
+  which is the Last-Modified time of the catalog and info responses, is kept.
+  """
+  text = io.StringIO()
+  text.write(CATALOG_HEADER + '\n')
+  csv.writer(text, lineterminator='\n').writerows(rows)
+  text = text.getvalue().encode()
+
+  try:
+    with open(catalog_file, 'rb') as f:
+      if f.read() == text:
+        return False
+  except OSError:
+    pass
+
+  cache._replace(catalog_file, lambda f: f.write(text))
+  return True
+
+
+def _str(value):
+  return '' if value is None else str(value)
@@ -0,0 +1,131 @@
+# Write a response as chunks of a fixed size, e.g.,
+#
+#   from psws import data, stream
+#   stream.write(data.iter_records(...), sys.stdout.buffer, chunk_size)
+#
+# The records yielded by psws.data vary in size from one row to a day of rows.
+# Writing each one as it is yielded costs one write to the pipe to the server
+# per record. Instead, records are appended to a buffer and written in chunks
+# of chunk_size bytes, which should match xstream.chunk_size in config.json,
+# the size of the reads the server does on the pipe.
+#
+# The time spent in file.write() is the write stage of timing.py. Time spent
+# waiting for the server to read the pipe is included in it.
+#
+# compress() compresses a stream of chunks with a HTTP content coding, gzip
+# or, if the zstandard package is installed, zstd, one chunk at a time. Each
+# chunk is flushed, so a client can decompress all data sent so far.
+
+import os
+import json
+import zlib
+import importlib.util
+
+from psws import timing
+
+# Used if config.json does not have xstream.chunk_size.
+CHUNK_SIZE = 1000000
+
+# Default compression level of each content coding, which can be set with
+# PSWS_GZIP_LEVEL and PSWS_ZSTD_LEVEL. For a day of mag CSV, gzip level 1
+# gives 33% of the size for a quarter of the CPU time of level 6 (26%).
+LEVELS = {'gzip': 1, 'zstd': 1}
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "config.json")
+
+
+def chunk_size(config_file=CONFIG_FILE):
+  """Return xstream.chunk_size in config_file or CHUNK_SIZE if not found."""
+  try:
+    with open(config_file, 'r') as f:
+      size = json.load(f).get('xstream', {}).get('chunk_size', CHUNK_SIZE)
+  except (OSError, ValueError):
+    return CHUNK_SIZE
+  if not isinstance(size, int) or size < 1:
+    return CHUNK_SIZE
+  return size
+
+
+def chunks(records, chunk_size=CHUNK_SIZE):
+  """Yield the bytes in iterable `records` as chunks of chunk_size bytes.
+
+  All chunks except the last have exactly chunk_size bytes.
+  """
+
+  buf = bytearray()
+  for record in records:
+    if len(buf) + len(record) < chunk_size:
+      # Usual case for records that are one or a few rows.
+      buf += record
+      continue
+    with memoryview(record) as view:
+      # Complete a partial chunk left from previous records.
+      if buf:
+        need = chunk_size - len(buf)
+        buf += view[0:need]
+        if len(buf) < chunk_size:
+          continue
+        yield bytes(buf)
+        # The same buffer is reused for the next partial chunk.
+        buf.clear()
+        view = view[need:]
+      # Chunks that fit in record are copied from it directly.
+      while len(view) >= chunk_size:
+        yield bytes(view[0:chunk_size])
+        view = view[chunk_size:]
+      buf += view
+
+  if buf:
+    yield bytes(buf)
+
+
+def write(records, file, chunk_size=CHUNK_SIZE):
+  """Write the bytes in iterable `records` to binary file in chunks.
+
+  Returns the number of bytes written. The file is flushed at the end.
+  """
+  n = 0
+  for chunk in chunks(records, chunk_size):
+    with timing.stage('write'):
+      file.write(chunk)
+    timing.add('write', bytes=len(chunk))
+    n += len(chunk)
+  file.flush()
+  return n
+
+
+def encodings():
+  """Return the content codings supported by compress(), most preferred first."""
+  if importlib.util.find_spec('zstandard') is None:
+    return ['gzip']
+  return ['zstd', 'gzip']
+
+
+def default_level(encoding):
+  """Return compression level for encoding from PSWS_<ENCODING>_LEVEL or LEVELS."""
+  return int(os.getenv(f"PSWS_{encoding.upper()}_LEVEL", str(LEVELS[encoding])))
+
+
+def compress(chunks, encoding, level=None):
+  """Yield the bytes in iterable `chunks` compressed with content coding encoding.
+
+  encoding is one of encodings(). level defaults to default_level(encoding).
+  The output for each chunk is yielded as soon as the chunk is read, so the
+  whole response is never held in memory.
+  """
+
+  if encoding not in LEVELS:
+    raise ValueError(f"Unsupported content coding '{encoding}'")
+  if level is None:
+    level = default_level(encoding)
+  if encoding == 'gzip':
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    mode = zlib.Z_SYNC_FLUSH
+  else:
+    import zstandard
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+
+  for chunk in chunks:
+    yield compressor.compress(chunk) + compressor.flush(mode)
+  yield compressor.flush()
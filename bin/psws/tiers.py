@@ -0,0 +1,184 @@
+# Aggregate datasets at lower cadence, e.g., S000028/mag/PT1M, which has the
+# mean, minimum and maximum of each S000028/mag parameter in 1-minute bins.
+#
+# Parameter <name> of the base dataset becomes parameters <name>_mean,
+# <name>_min and <name>_max, and the time of each row is the start of its
+# bin. A month of PT1M or PT1H data has 60 or 3600 times fewer rows than a
+# month of the PT1S base data.
+#
+# Aggregates are computed for one data file at a time, from the decoded file
+# in memory or in the columnar cache (see days.py) or by decoding it, and
+# saved in the same format in PSWS_CACHE_DIR/<cadence>/, e.g.,
+#
+#   PSWS_CACHE_DIR/PT1M/S000028/magData/OBS2025-10-20T00_00.zip/
+#
+# An entry is rebuilt when the data file or VERSION changes.
+
+import os
+
+from psws import cache, days, isotime, timing
+
+# Aggregate cadences and their length in seconds.
+CADENCES = {'PT1M': 60, 'PT1H': 3600}
+
+STATS = ['mean', 'min', 'max']
+
+# Version of aggregate cache entries: that of the decoded days they are
+# computed from and that of the aggregation, which changing block.aggregate()
+# changes. 2: fill values are not used.
+VERSION = [cache.VERSION, 2]
+
+# Parameters of the base datasets, as in the info templates.
+PARAMETERS = {
+  'mag': ['Field_Vector', 'rxryrz', 'rtlt', 'Tm'],
+  'doppler': ['Freq', 'Vpk']
+}
+
+
+def split_id(id):
+  """Return (base dataset id, cadence) for id. cadence is None if not an aggregate."""
+  parts = id.split('/')
+  if len(parts) == 3 and parts[2] in CADENCES:
+    return '/'.join(parts[0:2]), parts[2]
+  return id, None
+
+
+def ids(base_id):
+  """Return the ids of the aggregate datasets for a base dataset."""
+  if base_id.split('/')[-1] not in PARAMETERS:
+    return []
+  return [f'{base_id}/{cadence}' for cadence in CADENCES]
+
+
+def base_module(data_type):
+  """Return module that reads data files of data_type."""
+  if data_type == 'mag':
+    from psws import mag
+    return mag
+  from psws import doppler
+  return doppler
+
+
+def parameters(data_type):
+  """Return all parameters of an aggregate dataset of data_type."""
+  return [f'{name}_{stat}' for name in PARAMETERS[data_type] for stat in STATS]
+
+
+def columns(data_type, parameters):
+  """Return the column names needed for a list of aggregate parameters."""
+  base = base_module(data_type).PARAMETERS
+  return [f'{column}_{stat}'
+          for name in PARAMETERS[data_type]
+          for stat in STATS if f'{name}_{stat}' in parameters
+          for column in base[name]]
+
+
+def types(data_type):
+  """Return dict with HAPI type of each aggregate column."""
+  result = {}
+  for column, type in base_module(data_type).TYPES.items():
+    result[f'{column}_mean'] = 'double'
+    result[f'{column}_min'] = type
+    result[f'{column}_max'] = type
+  return result
+
+
+def entry_dir(cache_dir, cadence, rel_path):
+  """Return cache directory for aggregate of data file data_dir/rel_path."""
+  return os.path.join(cache_dir, cadence, rel_path)
+
+
+def read(filepath, data_type, cadence, cache_dir, rel_path):
+  """Return (block, decimals) with aggregates of all columns of data file.
+
+  decimals is a dict with the decimals of each column. The aggregates are
+  read from the cache if up-to-date and otherwise computed and written to it.
+  """
+
+  names = list(types(data_type))
+  agg_dir = entry_dir(cache_dir, cadence, rel_path)
+  with timing.stage('read'):
+    cached = cache.read(agg_dir, filepath, names, VERSION)
+  if cached is not None:
+    block, decimals = cached
+    timing.add('read', bytes=sum(values.nbytes for values in block.values()))
+    return block, dict(zip(names, decimals))
+
+  return build(filepath, data_type, cadence, cache_dir, rel_path)
+
+
+def build(filepath, data_type, cadence, cache_dir, rel_path):
+  """Compute aggregates for data file, write them to cache and return them.
+
+  The aggregates for all cadences are computed and written, as most of the
+  time is spent decoding the file. Returns those for `cadence`.
+  """
+
+  from psws import block
+
+  stat = cache.source_stat(filepath)
+  day = days.get(filepath, data_type, cache.day_dir(cache_dir, rel_path), decode=True)
+  if day is None:
+    # Doppler file with rows that can not be written exactly from the decoded
+    # columns, which does not matter for aggregates.
+    day = base_module(data_type).decode(filepath)
+  day, day_decimals = day
+
+  decimals = {}
+  for column, places in day_decimals.items():
+    decimals[f'{column}_mean'] = None
+    decimals[f'{column}_min'] = places
+    decimals[f'{column}_max'] = places
+
+  result = None
+  for c, seconds in CADENCES.items():
+    aggregates = block.aggregate(day, seconds)
+    if c == cadence:
+      result = aggregates
+    try:
+      cache.write(entry_dir(cache_dir, c, rel_path), filepath, aggregates,
+                  decimals=decimals, stat=stat, version=VERSION)
+    except OSError:
+      # Cache directory not writable; aggregates are computed on each request.
+      pass
+
+  return result, decimals
+
+
+def max_rows(base_info):
+  """Return the most rows in a response for the base dataset of base_info.
+
+  This is the number of rows in its maxRequestDuration at its cadence, which
+  is also the row budget of a request for one of its aggregates.
+  """
+  duration = isotime.duration(base_info['maxRequestDuration'])
+  return int(duration // isotime.duration(base_info['cadence']))
+
+
+def info(base_info, cadence):
+  """Return HAPI info dict for aggregate given info dict for base dataset."""
+
+  seconds = CADENCES[cadence]
+  info = dict(base_info)
+  info['cadence'] = cadence
+  info['maxRequestDuration'] = isotime.format_duration(max_rows(base_info) * seconds)
+  description = f'Mean, minimum and maximum of parameters in {seconds}-second bins. '
+  info['description'] = description + (base_info.get('description') or '')
+
+  parameters = []
+  for parameter in base_info['parameters']:
+    if parameter['type'] == 'isotime':
+      parameters.append(parameter)
+      continue
+    for stat in STATS:
+      p = dict(parameter)
+      p['name'] = f"{parameter['name']}_{stat}"
+      if stat == 'mean':
+        p['type'] = 'double'
+      if 'label' in p:
+        label = p['label']
+        p['label'] = [f'{l} {stat}' for l in label] if isinstance(label, list) else f'{label} {stat}'
+      parameters.append(p)
+  info['parameters'] = parameters
+
+  return info
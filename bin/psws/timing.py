@@ -0,0 +1,168 @@
+# Opt-in timing of the stages of a data request, enabled by setting
+# PSWS_TIMING=1 or PSWS_METRICS_FILE (see metrics.py). The stages are
+#
+#   discover  finding the files for the request (data.files_needed)
+#   read      reading and inflating data files and cache entries
+#   decode    parsing rows into column arrays
+#   format    encoding HAPI CSV or binary
+#   write     writing chunks of the response to the output
+#
+# For each stage, the wall and CPU time, number of calls, bytes read (written,
+# for the write stage) and rows emitted are summed. When timing is not
+# enabled, add(), stage() and iterate() do nothing, so instrumented code runs
+# as before.
+#
+# The sums are kept in a context variable, so that the requests answered at
+# the same time by the threads and tasks of server.py each have their own.
+# reset() starts the sums of a request in the current context, and code run
+# for the request in other threads must be run in a copy of that context,
+# e.g., with contextvars.copy_context().run() or asyncio.to_thread().
+#
+# report() writes a one-line JSON summary to stderr, which the server
+# forwards when xstream.stderr is true in config.json, e.g.,
+#
+#   timing: {"id": "S000028/mag", ..., "wall": 0.41, "stages": {"read": {...}}}
+#
+# and records it in the aggregate returned by metrics.metrics(), which
+# server.py returns at /hapi/metrics.
+
+import os
+import sys
+import json
+import time
+import contextlib
+import contextvars
+
+STAGES = ['discover', 'read', 'decode', 'format', 'write']
+
+# Sums for each stage, keyed by stage name, of the request in the context.
+_stages = contextvars.ContextVar('psws_timing_stages')
+
+# None until enabled() is first called.
+_enabled = None
+
+
+def enabled():
+  """True if PSWS_TIMING or PSWS_METRICS_FILE is set or enable() was called."""
+  global _enabled
+  if _enabled is None:
+    _enabled = os.getenv("PSWS_TIMING", "0") not in ("", "0") \
+      or bool(os.getenv("PSWS_METRICS_FILE"))
+  return _enabled
+
+
+def enable(flag=True):
+  global _enabled
+  _enabled = flag
+
+
+def add(name, wall=0.0, cpu=0.0, calls=0, bytes=0, rows=0):
+  """Add to the sums for stage `name`."""
+  if not enabled():
+    return
+  stages = _sums()
+  stage = stages.get(name)
+  if stage is None:
+    stage = {'wall': 0.0, 'cpu': 0.0, 'calls': 0, 'bytes': 0, 'rows': 0}
+    stages[name] = stage
+  stage['wall'] += wall
+  stage['cpu'] += cpu
+  stage['calls'] += calls
+  stage['bytes'] += bytes
+  stage['rows'] += rows
+
+
+@contextlib.contextmanager
+def stage(name):
+  """Context manager that adds the time spent in it to stage `name`."""
+  if not enabled():
+    yield
+    return
+  wall, cpu = time.perf_counter(), time.process_time()
+  try:
+    yield
+  finally:
+    add(name, time.perf_counter() - wall, time.process_time() - cpu, calls=1)
+
+
+def iterate(name, iterable, size=len):
+  """Yield from iterable, adding the time spent getting each item to stage `name`.
+
+  size(item) is added to the bytes read by the stage. If timing is not
+  enabled, iterable is returned unchanged.
+  """
+  if not enabled():
+    return iterable
+  return _iterate(name, iterable, size)
+
+
+def _iterate(name, iterable, size):
+  iterator = iter(iterable)
+  while True:
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+      item = next(iterator)
+    except StopIteration:
+      add(name, time.perf_counter() - wall, time.process_time() - cpu)
+      return
+    add(name, time.perf_counter() - wall, time.process_time() - cpu, calls=1,
+        bytes=size(item) if size is not None else 0)
+    yield item
+
+
+def snapshot():
+  """Return a copy of the sums for all stages."""
+  return {name: dict(sums) for name, sums in _sums().items()}
+
+
+def merge(stages):
+  """Add sums returned by snapshot() in another process."""
+  for name, sums in stages.items():
+    add(name, **sums)
+
+
+def reset():
+  """Start new sums for the request in the current context."""
+  _stages.set({})
+
+
+def _sums():
+  try:
+    return _stages.get()
+  except LookupError:
+    stages = {}
+    _stages.set(stages)
+    return stages
+
+
+def clock():
+  """Return (wall, cpu) time to pass to summary()."""
+  return time.perf_counter(), time.process_time()
+
+
+def summary(request, started):
+  """Return dict with request, total time since clock() value `started` and stages."""
+  wall, cpu = started
+  stages = snapshot()
+  return {
+    **request,
+    'wall': time.perf_counter() - wall,
+    'cpu': time.process_time() - cpu,
+    'stages': {name: stages[name] for name in STAGES + sorted(stages) if name in stages}
+  }
+
+
+def report(request, started, file=sys.stderr):
+  """Write summary() to file and record it in the metrics. Returns the summary.
+
+  Does nothing and returns None if timing is not enabled.
+  """
+  if not enabled():
+    return None
+
+  from psws import metrics
+
+  result = summary(request, started)
+  print('timing: ' + json.dumps(result), file=file)
+  metrics.record(result)
+  return result
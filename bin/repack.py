@@ -0,0 +1,73 @@
+# Usage:
+#   python repack.py [<data_dir>] [<cache_dir>]
+#
+# Write a block-compressed copy of each magnetometer zip file in <data_dir>
+# to <cache_dir>/frames/, which data.py reads instead of the zip file so that
+# a request for part of a day decompresses only the frames that overlap it;
+# see psws/frames.py. The zip files are not modified.
+#
+# Files with an up-to-date copy are skipped, so this can be rerun after a
+# sync to repack only new or modified files.
+#
+# <data_dir> defaults to the PSWS_DATA_DIR environment variable or ../data
+# relative to this script. <cache_dir> defaults to the PSWS_CACHE_DIR
+# environment variable or ../cache relative to this script.
+#
+# Examples:
+#   python repack.py
+#   PSWS_DATA_DIR=/data/psws PSWS_CACHE_DIR=/data/psws-cache python repack.py
+
+import os
+import sys
+import time
+
+from psws import cache, data, frames, manifest
+
+
+def repack_all(data_dir, cache_dir):
+  counts = {'written': 0, 'current': 0, 'failed': 0, 'bytes': 0, 'frames_bytes': 0}
+  for rel_dir, dataset_dir, data_type in data.datasets(data_dir):
+    if data_type != 'mag':
+      continue
+    manifest_file = manifest.manifest_file(cache_dir, rel_dir)
+    for name in manifest.load(dataset_dir, data_type, manifest_file)['files']:
+      filepath = os.path.join(dataset_dir, name)
+      entry_dir = frames.entry_dir(cache_dir, os.path.join(rel_dir, name))
+      if cache.current(entry_dir, filepath) is not None:
+        counts['current'] += 1
+        continue
+      try:
+        frames.write(entry_dir, filepath)
+      except Exception as e:
+        counts['failed'] += 1
+        print(f"  {rel_dir}/{name}: failed: {e}", file=sys.stderr)
+        continue
+      counts['written'] += 1
+      counts['bytes'] += os.path.getsize(filepath)
+      counts['frames_bytes'] += os.path.getsize(os.path.join(entry_dir, frames.FRAMES_FILE))
+      print(f"  {rel_dir}/{name}: written")
+  return counts
+
+
+if __name__ == "__main__":
+  if len(sys.argv) > 1:
+    data_dir = os.path.abspath(os.path.expanduser(sys.argv[1]))
+  else:
+    data_dir = data.default_data_dir()
+  if len(sys.argv) > 2:
+    cache_dir = os.path.abspath(os.path.expanduser(sys.argv[2]))
+  else:
+    cache_dir = data.default_cache_dir()
+
+  if not os.path.isdir(data_dir):
+    print(f"Error: Data directory not found: {data_dir}", file=sys.stderr)
+    sys.exit(1)
+
+  t_start = time.time()
+  counts = repack_all(data_dir, cache_dir)
+  dt = time.time() - t_start
+  print(f"Frames in {cache_dir}: {counts['written']} written "
+        f"({counts['bytes']} bytes zipped, {counts['frames_bytes']} bytes repacked), "
+        f"{counts['current']} up-to-date, {counts['failed']} failed ({dt:.2f} s)")
+  if counts['failed'] > 0:
+    sys.exit(1)
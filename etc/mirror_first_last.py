@@ -12,44 +12,161 @@ Behavior:
   last file to the corresponding destination directory.
 - If there is 0 files: destination directory is created but remains empty.
 - If there is 1 file: it is copied once.
+- With --incremental, a file is not copied if the destination file has the
+  same size and modification time (to the second), so re-running after a
+  sync only copies files that changed.
+- Directories are listed and files are copied by a pool of --workers
+  threads; both are dominated by I/O, which releases the GIL.
+- With --link hardlink or reflink, destination files are hard links to or
+  copy-on-write clones of the source files where the filesystem allows it,
+  and are copied otherwise. auto tries reflink, then hardlink.
 
 Usage:
   python mirror_first_last.py /path/to/src /path/to/dst [--sort name|mtime|ctime|size] [--dry-run] [--verbose]
+  python mirror_first_last.py /path/to/src /path/to/dst --incremental [--workers N]
+                              [--link copy|hardlink|reflink|auto]
 
 """
 import argparse
+import concurrent.futures
 import os
 import shutil
 import sys
-from typing import List
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 
+# FICLONE ioctl request from linux/fs.h; fcntl.FICLONE is only in Python >= 3.12.
+FICLONE = 0x40049409
 
-def get_sorted_files(path: str, sort_key: str) -> List[str]:
-    """Return list of filenames (not full paths) in directory `path` sorted by sort_key.
+LINK_MODES = ['copy', 'hardlink', 'reflink', 'auto']
+
+# Seconds between progress lines.
+PROGRESS_INTERVAL = 5.0
+
+
+def get_sorted_files(path: str, sort_key: str) -> List[os.DirEntry]:
+    """Return list of file entries in directory `path` sorted by sort_key.
 
     sort_key: 'name'|'mtime'|'ctime'|'size'
+
+    Entries are from a single os.scandir(). Sorting by name does not stat the
+    files; for the other keys each file is stat'd once (DirEntry caches it).
     """
     try:
-        entries = [e for e in os.scandir(path) if e.is_file()]
+        with os.scandir(path) as it:
+            entries = [e for e in it if e.is_file()]
     except FileNotFoundError:
         return []
 
-    if sort_key == 'name':
-        entries.sort(key=lambda e: e.name)
-    elif sort_key == 'mtime':
-        entries.sort(key=lambda e: e.stat().st_mtime)
+    if sort_key == 'mtime':
+        entries.sort(key=lambda e: (e.stat().st_mtime_ns, e.name))
     elif sort_key == 'ctime':
-        entries.sort(key=lambda e: e.stat().st_ctime)
+        entries.sort(key=lambda e: (e.stat().st_ctime_ns, e.name))
     elif sort_key == 'size':
-        entries.sort(key=lambda e: e.stat().st_size)
+        entries.sort(key=lambda e: (e.stat().st_size, e.name))
     else:
         entries.sort(key=lambda e: e.name)
 
-    return [e.name for e in entries]
+    return entries
+
+
+def list_dirs(path: str) -> List[str]:
+    """Return sorted names of the subdirectories of `path` (not followed if symlinks)."""
+    try:
+        with os.scandir(path) as it:
+            return sorted(e.name for e in it if e.is_dir(follow_symlinks=False))
+    except (FileNotFoundError, PermissionError):
+        return []
+
+
+def is_current(src_stat: os.stat_result, dst_path: str) -> bool:
+    """True if dst_path exists with the size and mtime (to the second) of src_stat."""
+    try:
+        dst_stat = os.stat(dst_path)
+    except OSError:
+        return False
+    return dst_stat.st_size == src_stat.st_size \
+        and dst_stat.st_mtime_ns // 1_000_000_000 == src_stat.st_mtime_ns // 1_000_000_000
+
+
+def reflink(src_path: str, dst_path: str) -> None:
+    """Make dst_path a copy-on-write clone of src_path. Raises OSError if not supported."""
+    import fcntl
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), getattr(fcntl, 'FICLONE', FICLONE), src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(dst_path)
+            raise
+    shutil.copystat(src_path, dst_path)
+
+
+def transfer(src_path: str, dst_path: str, link: str) -> str:
+    """Copy, hardlink or reflink src_path to dst_path. Returns the method used."""
+    methods = {'auto': ['reflink', 'hardlink'], 'reflink': ['reflink'],
+               'hardlink': ['hardlink']}.get(link, [])
+    for method in methods:
+        try:
+            if os.path.lexists(dst_path):
+                os.remove(dst_path)
+            if method == 'hardlink':
+                os.link(src_path, dst_path)
+            else:
+                reflink(src_path, dst_path)
+            return method
+        except OSError:
+            # e.g., EXDEV for a different filesystem or EOPNOTSUPP/EINVAL for a
+            # filesystem without reflinks.
+            continue
+    shutil.copy2(src_path, dst_path)
+    return 'copy'
+
+
+class Progress:
+    """Counts of files and bytes, printed to stderr at most every PROGRESS_INTERVAL seconds."""
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.lock = threading.Lock()
+        self.enabled = enabled
+        self.start = time.monotonic()
+        self.last = self.start
+        self.counts: Dict[str, int] = {'dirs': 0, 'files': 0, 'bytes': 0, 'skipped': 0,
+                                       'skipped_bytes': 0, 'copy': 0, 'hardlink': 0,
+                                       'reflink': 0, 'transferred_bytes': 0, 'failed': 0}
 
+    def add(self, **counts: int) -> None:
+        with self.lock:
+            for name, n in counts.items():
+                self.counts[name] += n
+            now = time.monotonic()
+            if self.enabled and now - self.last >= PROGRESS_INTERVAL:
+                self.last = now
+                print(f"  progress: {self.line()}", file=sys.stderr)
 
-def mirror_first_last(src: str, dst: str, sort_key: str = 'name', dry_run: bool = False, verbose: bool = False, top_n: int = None) -> None:
-    """Mirror directory tree from src to dst copying only first and last file per directory."""
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def line(self) -> str:
+        c = self.counts
+        elapsed = self.elapsed()
+        mb = c['transferred_bytes'] / (1024 * 1024)
+        rate = mb / elapsed if elapsed > 0 else 0.0
+        return (f"{c['dirs']} dirs, {c['files']} files, {c['skipped']} up-to-date, "
+                f"{c['copy']} copied, {c['hardlink']} hardlinked, {c['reflink']} reflinked, "
+                f"{mb:.2f} MB transferred in {elapsed:.2f} s ({rate:.2f} MB/s)")
+
+
+def mirror_first_last(src: str, dst: str, sort_key: str = 'name', dry_run: bool = False,
+                      verbose: bool = False, top_n: int = None, incremental: bool = False,
+                      workers: int = 8, link: str = 'copy',
+                      progress: Optional[Progress] = None) -> Tuple[int, int]:
+    """Mirror directory tree from src to dst copying only first and last file per directory.
+
+    Returns (total_size, total_files) of the files selected for copying. Counts
+    of files skipped, copied and linked are kept in `progress`.
+    """
     src = os.path.abspath(src)
     dst = os.path.abspath(dst)
     total_size = 0
@@ -58,20 +175,33 @@ def mirror_first_last(src: str, dst: str, sort_key: str = 'name', dry_run: bool
     if not os.path.isdir(src):
         raise ValueError(f"Source '{src}' is not a directory")
 
-    for root, dirs, files in os.walk(src):
-        # If we're at the top-level of the source tree and a top-level limit
-        # was provided, restrict traversal to the first `top_n` directories.
-        # We sort `dirs` by name so the selection is deterministic.
-        if top_n is not None and os.path.abspath(root) == src:
-            dirs.sort()
-            # modify dirs in-place to limit which subdirectories os.walk will traverse
-            del dirs[top_n:]
-        # Compute corresponding destination directory
-        rel_dir = os.path.relpath(root, src)
-        if rel_dir == '.':
-            dest_dir = dst
-        else:
-            dest_dir = os.path.join(dst, rel_dir)
+    if progress is None:
+        progress = Progress(enabled=False)
+
+    def copy_one(src_path: str, dst_path: str, src_stat: os.stat_result) -> None:
+        if incremental and is_current(src_stat, dst_path):
+            if verbose:
+                print(f"  up-to-date: {dst_path}")
+            progress.add(skipped=1, skipped_bytes=src_stat.st_size)
+            return
+        size_mb = src_stat.st_size / (1024 * 1024)
+        print(f"  {'[dry-run] ' if dry_run else ''}copy: {src_path} -> {dst_path} "
+              f"({size_mb:.2f} MB)")
+        if dry_run:
+            return
+        try:
+            method = transfer(src_path, dst_path, link)
+        except Exception as e:
+            # Don't crash the whole run for one file; report and continue
+            print(f"Warning: failed to copy {src_path} -> {dst_path}: {e}", file=sys.stderr)
+            progress.add(failed=1)
+            return
+        progress.add(**{method: 1, 'transferred_bytes': src_stat.st_size})
+
+    def visit(rel_dir: str) -> Tuple[List[str], List[Tuple[str, str, os.stat_result]]]:
+        # List one directory; return its subdirectories and the files to copy.
+        root = os.path.join(src, rel_dir) if rel_dir else src
+        dest_dir = os.path.join(dst, rel_dir) if rel_dir else dst
 
         if verbose:
             print(f"Processing directory: {root} -> {dest_dir}")
@@ -83,44 +213,55 @@ def mirror_first_last(src: str, dst: str, sort_key: str = 'name', dry_run: bool
             if verbose:
                 print(f"[dry-run] mkdir -p {dest_dir}")
 
+        dirs = list_dirs(root)
+        # If we're at the top-level of the source tree and a top-level limit
+        # was provided, restrict traversal to the first `top_n` directories.
+        # Directories are sorted by name so the selection is deterministic.
+        if top_n is not None and not rel_dir:
+            del dirs[top_n:]
+
         # Gather and sort files according to sort_key
         sorted_files = get_sorted_files(root, sort_key)
+        progress.add(dirs=1)
 
         if not sorted_files:
             if verbose:
                 print(f"  no files to copy in {root}")
-            continue
+            return [os.path.join(rel_dir, d) for d in dirs], []
 
         # Determine files to copy: first and last (unique)
-        to_copy = []
         if len(sorted_files) == 1:
             to_copy = [sorted_files[0]]
         else:
             to_copy = [sorted_files[0], sorted_files[-1]]
 
-        # Copy each file
-        for fname in to_copy:
-            src_path = os.path.join(root, fname)
-            dst_path = os.path.join(dest_dir, fname)
-            
-            # Get file size
+        copies = []
+        for entry in to_copy:
             try:
-                file_size = os.path.getsize(src_path)
-                total_size += file_size
-                total_files += 1
-                size_mb = file_size / (1024 * 1024)
-                print(f"  {'[dry-run] ' if dry_run else ''}copy: {src_path} -> {dst_path} ({size_mb:.2f} MB)")
-            except Exception as e:
-                print(f"Warning: failed to get size of {src_path}: {e}", file=sys.stderr)
-                file_size = 0
-            
-            if not dry_run:
-                try:
-                    shutil.copy2(src_path, dst_path)
-                except Exception as e:
-                    # Don't crash the whole run for one file; report and continue
-                    print(f"Warning: failed to copy {src_path} -> {dst_path}: {e}", file=sys.stderr)
-    
+                stat = entry.stat()
+            except OSError as e:
+                print(f"Warning: failed to get size of {entry.path}: {e}", file=sys.stderr)
+                continue
+            copies.append((entry.path, os.path.join(dest_dir, entry.name), stat))
+        return [os.path.join(rel_dir, d) for d in dirs], copies
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = {pool.submit(visit, '')}
+        copies = []
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                subdirs, files = future.result()
+                pending.update(pool.submit(visit, d) for d in subdirs)
+                for src_path, dst_path, stat in files:
+                    total_size += stat.st_size
+                    total_files += 1
+                    progress.add(files=1, bytes=stat.st_size)
+                    copies.append(pool.submit(copy_one, src_path, dst_path, stat))
+        for future in copies:
+            future.result()
+
     return total_size, total_files
 
 
@@ -132,16 +273,30 @@ def parse_args():
     p.add_argument('--dry-run', action='store_true', help="Don't actually copy files; just show what would be done")
     p.add_argument('--verbose', '-v', action='store_true', help='Verbose output')
     p.add_argument('--top-level-limit', '-n', type=int, default=None, help='Only traverse the first N top-level subdirectories (sorted by name).')
+    p.add_argument('--incremental', '-i', action='store_true',
+                   help='Skip files whose destination has the same size and mtime')
+    p.add_argument('--workers', '-j', type=int, default=8,
+                   help='Threads used to list directories and copy files (default: 8)')
+    p.add_argument('--link', choices=LINK_MODES, default='copy',
+                   help='Hardlink or reflink files instead of copying where possible '
+                        '(default: copy)')
     return p.parse_args()
 
 
 def main():
     args = parse_args()
+    progress = Progress()
     try:
-        total_size, total_files = mirror_first_last(args.src, args.dst, sort_key=args.sort, dry_run=args.dry_run, verbose=args.verbose, top_n=args.top_level_limit)
+        total_size, total_files = mirror_first_last(
+            args.src, args.dst, sort_key=args.sort, dry_run=args.dry_run, verbose=args.verbose,
+            top_n=args.top_level_limit, incremental=args.incremental, workers=args.workers,
+            link=args.link, progress=progress)
         total_mb = total_size / (1024 * 1024)
         total_gb = total_size / (1024 * 1024 * 1024)
         print(f"\n{'[dry-run] ' if args.dry_run else ''}Total: {total_files} files, {total_mb:.2f} MB ({total_gb:.2f} GB)")
+        print(f"{'[dry-run] ' if args.dry_run else ''}{progress.line()}")
+        if progress.counts['failed']:
+            print(f"{progress.counts['failed']} files failed to copy", file=sys.stderr)
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(2)
@@ -0,0 +1,49 @@
+# Shared fixtures for the tests of the psws package in bin/psws, e.g.,
+#
+#   python -m pytest -q
+#
+# run from the repository root. The tests read the data files in data/ and
+# write caches to a temporary directory. The server tests are skipped if
+# fastapi and httpx are not installed.
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BIN_DIR = os.path.join(ROOT, 'bin')
+DATA_DIR = os.path.join(ROOT, 'data')
+
+sys.path.insert(0, BIN_DIR)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+  """Use data/ and an empty cache directory."""
+  cache_dir = str(tmp_path / 'cache')
+  monkeypatch.setenv('PSWS_DATA_DIR', DATA_DIR)
+  monkeypatch.setenv('PSWS_CACHE_DIR', cache_dir)
+  monkeypatch.delenv('PSWS_WORKERS', raising=False)
+  monkeypatch.delenv('PSWS_DAY_CACHE_BYTES', raising=False)
+  return cache_dir
+
+
+@pytest.fixture
+def client(cache_dir):
+  """Return a TestClient for server.app()."""
+  pytest.importorskip('fastapi')
+  pytest.importorskip('httpx')
+  from fastapi.testclient import TestClient
+  from psws import server
+  with TestClient(server.app()) as client:
+    yield client
+
+
+@pytest.fixture(autouse=True, scope='session')
+def shutdown_pools():
+  """Shut down the process pools of data.records_parallel() after the tests."""
+  yield
+  from psws import data
+  for pool in data._pools.values():
+    pool.shutdown(cancel_futures=True)
@@ -0,0 +1,55 @@
+# Tests of the synthetic data tree and result comparison of bin/bench/.
+
+import os
+import sys
+import json
+import filecmp
+
+from conftest import BIN_DIR
+
+sys.path.insert(0, os.path.join(BIN_DIR, 'bench'))
+
+import bench
+import generate
+
+
+def tree(out_dir, **kwargs):
+  files = generate.generate(str(out_dir), stations=2, days=2, cadence=60, gaps=0.1, **kwargs)
+  return sorted(os.path.relpath(file, out_dir) for file in files)
+
+
+def test_generate_is_deterministic(tmp_path):
+  a = tree(tmp_path / 'a', seed=3)
+  b = tree(tmp_path / 'b', seed=3)
+  assert a == b and len(a) == 8
+  _, mismatch, errors = filecmp.cmpfiles(tmp_path / 'a', tmp_path / 'b', a, shallow=False)
+  assert mismatch == [] and errors == []
+
+  c = tree(tmp_path / 'c', seed=4)
+  _, mismatch, _ = filecmp.cmpfiles(tmp_path / 'a', tmp_path / 'c', c, shallow=False)
+  assert mismatch == c
+
+
+def test_datasets(tmp_path):
+  tree(tmp_path)
+  labels = dict((label, id) for id, label in bench.datasets(str(tmp_path)))
+  assert labels['doppler'] == 'N000001/doppler'
+  assert labels[generate.mag_format(1)] == 'S000001/mag'
+  assert labels[generate.mag_format(2)] == 'S000002/mag'
+
+
+def results(tmp_path, name, **mins):
+  file = tmp_path / name
+  file.write_text(json.dumps({'commit': name, 'date': '2026-01-01',
+                              'results': {stage: {'min': t, 'median': t}
+                                          for stage, t in mins.items()}}))
+  return str(file)
+
+
+def test_compare(tmp_path, capsys):
+  old = results(tmp_path, 'old', decode=1.0, request=2.0)
+  assert bench.compare(old, results(tmp_path, 'same', decode=1.1, request=2.0, new=1.0), 1.2)
+  assert not bench.compare(old, results(tmp_path, 'slow', decode=1.5, request=2.0), 1.2)
+  lines = capsys.readouterr().out.splitlines()
+  assert any(line.startswith('new ') and '-' in line for line in lines)
+  assert [line.split()[0] for line in lines if line.endswith(' slower')] == ['decode']
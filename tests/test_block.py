@@ -0,0 +1,61 @@
+import numpy as np
+
+from psws import block
+
+FILL = block.FILL
+
+
+def times(*seconds):
+  return np.array(seconds, dtype='datetime64[s]')
+
+
+def test_aggregate_bins():
+  day = {'time': times(0, 1, 59, 60, 61, 180),
+         'x': np.array([1.0, 2.0, 6.0, 4.0, 5.0, 7.0]),
+         'rx': np.array([3, 1, 2, 9, 8, 7])}
+  result = block.aggregate(day, 60)
+  assert list(result['time']) == list(times(0, 60, 180))
+  assert list(result['x_mean']) == [3.0, 4.5, 7.0]
+  assert list(result['x_min']) == [1.0, 4.0, 7.0]
+  assert list(result['x_max']) == [6.0, 5.0, 7.0]
+  assert list(result['rx_min']) == [1, 8, 7]
+  assert list(result['rx_max']) == [3, 9, 7]
+  assert result['rx_min'].dtype == day['rx'].dtype
+
+
+def test_aggregate_unsorted():
+  day = {'time': times(61, 0, 60, 1), 'x': np.array([4.0, 1.0, 2.0, 3.0])}
+  result = block.aggregate(day, 60)
+  assert list(result['time']) == list(times(0, 60))
+  assert list(result['x_mean']) == [2.0, 3.0]
+
+
+def test_aggregate_fill():
+  # Fill and NaN values are not used; bins with only those are fill.
+  day = {'time': times(0, 1, 2, 60, 61, 120),
+         'x': np.array([1.0, FILL, 3.0, FILL, np.nan, 5.0]),
+         'rx': np.array([99999, 2, 4, 99999, 99999, -1])}
+  result = block.aggregate(day, 60)
+  assert list(result['x_mean']) == [2.0, FILL, 5.0]
+  assert list(result['x_min']) == [1.0, FILL, 5.0]
+  assert list(result['x_max']) == [3.0, FILL, 5.0]
+  assert list(result['rx_mean']) == [3.0, FILL, -1.0]
+  assert list(result['rx_min']) == [2, 99999, -1]
+  assert list(result['rx_max']) == [4, 99999, -1]
+
+
+def test_aggregate_empty():
+  day = {'time': times(), 'x': np.array([]), 'rx': np.array([], dtype=np.int64)}
+  result = block.aggregate(day, 60)
+  assert len(result['time']) == 0
+  assert len(result['x_mean']) == len(result['rx_min']) == 0
+
+
+def test_select():
+  day = {'time': times(0, 1, 2, 3, 1), 'x': np.arange(5.0)}
+  rows, stopped = block.select(day, np.datetime64(1, 's'), np.datetime64(3, 's'))
+  assert list(rows['x']) == [1.0, 2.0]
+  assert stopped
+  rows, stopped = block.select(day, np.datetime64(1, 's'), np.datetime64(9, 's'))
+  assert list(rows['x']) == [1.0, 2.0, 3.0, 4.0]
+  assert not stopped
@@ -0,0 +1,99 @@
+# Tests of psws/cache.py and of the output of data requests read from the
+# cache written by bin/cache.py.
+
+import os
+import json
+import concurrent.futures
+import importlib.util
+
+import numpy as np
+import pytest
+
+from psws import cache, data, tiers
+
+from conftest import BIN_DIR, DATA_DIR
+
+REQUESTS = [
+  ('S000028/mag', '2025-10-20T00:00:00Z', '2025-10-21T00:00:00Z'),
+  ('S000082/mag', '2025-10-18T12:00:00Z', '2025-10-18T13:00:00Z'),
+  ('N000001/doppler', '2019-05-24T00:00:00Z', '2019-05-24T06:00:00Z'),
+  ('S000028/mag/PT1M', '2025-10-20T00:00:00Z', '2025-10-21T00:00:00Z'),
+]
+
+
+def build_all(cache_dir):
+  spec = importlib.util.spec_from_file_location('build_cache', os.path.join(BIN_DIR, 'cache.py'))
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module.build_all(DATA_DIR, cache_dir)
+
+
+def response(request, format='csv'):
+  return b''.join(data.iter_records(*request, format=format))
+
+
+@pytest.mark.parametrize('format', data.FORMATS)
+def test_cached_output_matches_decoded(cache_dir, format):
+  expected = [response(request, format) for request in REQUESTS]
+  counts = build_all(cache_dir)
+  assert counts['failed'] == 0 and counts['written'] > 0
+  assert [response(request, format) for request in REQUESTS] == expected
+
+
+def test_entry_needs_current_version(tmp_path):
+  source = os.path.join(DATA_DIR, 'S000028', 'magData', 'OBS2025-10-20T00_00.zip')
+  entry_dir = str(tmp_path / 'entry')
+  block = {'time': np.array(['2025-10-20T00:00:00'], dtype='datetime64[s]'),
+           'rx': np.array([-365])}
+  cache.write(entry_dir, source, block)
+  assert cache.current(entry_dir, source) is not None
+  assert cache.read(entry_dir, source, ['rx'])[0]['rx'].dtype == np.int64
+  assert cache.current(entry_dir, source, tiers.VERSION) is None
+
+  meta_file = os.path.join(entry_dir, cache.META_FILE)
+  for version in [None, cache.VERSION - 1]:
+    entry_meta = cache.meta(entry_dir)
+    entry_meta['version'] = version
+    with open(meta_file, 'w') as f:
+      json.dump(entry_meta, f)
+    assert cache.current(entry_dir, source) is None
+    assert cache.read(entry_dir, source, ['rx']) is None
+
+
+def test_concurrent_writers(tmp_path):
+  # Threads writing the same entry, as server requests that build the same
+  # aggregates, leave the columns and meta.json of one of them.
+  source = os.path.join(DATA_DIR, 'S000028', 'magData', 'OBS2025-10-20T00_00.zip')
+  entry_dir = str(tmp_path / 'entry')
+
+  def write(k):
+    for _ in range(20):
+      time = np.arange(k + 1).astype('datetime64[s]')
+      cache.write(entry_dir, source, {'time': time, 'rx': np.full(k + 1, k)})
+
+  with concurrent.futures.ThreadPoolExecutor(8) as pool:
+    list(pool.map(write, range(8)))
+
+  block, _ = cache.read(entry_dir, source, ['rx'])
+  rows = cache.meta(entry_dir)['rows']
+  assert len(block['time']) == len(block['rx']) == rows
+  assert (block['rx'] == rows - 1).all()
+  assert not [name for name in os.listdir(entry_dir) if name.endswith('.tmp')]
+
+
+def test_entries_from_before_versions_are_not_used(cache_dir):
+  # An entry written before user-018 stored the integer columns as floats.
+  request = REQUESTS[0]
+  expected = response(request)
+  build_all(cache_dir)
+  entry_dir = cache.day_dir(cache_dir, os.path.join('S000028', 'magData',
+                                                     'OBS2025-10-20T00_00.zip'))
+  entry_meta = cache.meta(entry_dir)
+  del entry_meta['version']
+  rx = np.load(os.path.join(entry_dir, 'rx.npy')).astype(np.float64)
+  np.save(os.path.join(entry_dir, 'rx.npy'), rx)
+  entry_meta['columns']['rx'] = 'float64'
+  with open(os.path.join(entry_dir, cache.META_FILE), 'w') as f:
+    json.dump(entry_meta, f)
+
+  assert response(request) == expected
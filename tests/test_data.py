@@ -0,0 +1,83 @@
+# Tests of psws/data.py.
+
+import os
+import concurrent.futures
+
+from psws import data
+
+MAG = ('S000028/mag', '2025-10-20T00:00:00Z', '2025-10-22T00:00:00Z')
+
+
+def serial(id, start, stop, **kwargs):
+  return b''.join(data.iter_records(id, start, stop, workers=1, **kwargs))
+
+
+def test_parallel_matches_serial(cache_dir):
+  expected = serial(*MAG)
+  assert expected
+  assert b''.join(data.iter_records(*MAG, workers=2)) == expected
+
+
+def test_broken_pool_falls_back_to_serial(cache_dir, monkeypatch):
+  pool = concurrent.futures.ProcessPoolExecutor(max_workers=2)
+  try:
+    pool.submit(os._exit, 1).exception()
+  except concurrent.futures.process.BrokenProcessPool:
+    pass
+  monkeypatch.setitem(data._pools, 2, pool)
+
+  assert b''.join(data.iter_records(*MAG, workers=2)) == serial(*MAG)
+  assert data._pools.get(2) is not pool
+
+
+def test_pool_broken_while_streaming(cache_dir):
+  import signal
+
+  files = data.files_needed(MAG[0], MAG[1], MAG[2], data.default_data_dir(), cache_dir)
+  args = [(MAG[0], file, MAG[1], MAG[2], None, data.default_data_dir(), cache_dir, 'csv')
+          for file in files]
+  assert len(args) == 2
+  expected = [b''.join(data.records(*file_args)) for file_args in args]
+
+  records = data.records_parallel(args, 3, 1)
+  got = [next(records)]
+  pool = data._pools[3]
+  for process in list(pool._processes.values()):
+    os.kill(process.pid, signal.SIGKILL)
+  got += list(records)
+  assert got == expected
+  assert 3 not in data._pools
+
+
+def test_threads_share_one_pool(cache_dir, monkeypatch):
+  import time
+  import threading
+
+  created = []
+
+  class SlowPool(concurrent.futures.ProcessPoolExecutor):
+    # Widens the window in which another thread could create a pool.
+    def __init__(self, *args, **kwargs):
+      time.sleep(0.1)
+      super().__init__(*args, **kwargs)
+      created.append(self)
+
+  monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', SlowPool)
+  monkeypatch.setattr(data, '_pools', {})
+  barrier = threading.Barrier(4)
+  results = []
+
+  def request():
+    barrier.wait()
+    results.append(b''.join(data.iter_records(*MAG, workers=2)))
+
+  threads = [threading.Thread(target=request) for _ in range(4)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  for pool in created:
+    pool.shutdown()
+
+  assert len(created) == 1
+  assert results == [serial(*MAG)] * 4
@@ -0,0 +1,67 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import DATA_DIR
+from psws import cache, data, days
+
+CSV_DIR = os.path.join(DATA_DIR, 'N000001', 'csvData')
+FILES = sorted(os.listdir(CSV_DIR))
+
+
+@pytest.fixture
+def doppler_files(tmp_path):
+  """Copies of the doppler files in data/."""
+  days.clear()
+  yield [shutil.copy(os.path.join(CSV_DIR, name), tmp_path) for name in FILES]
+  days.clear()
+
+
+def get(filepath, cache_dir):
+  return days.get(filepath, 'doppler', cache.day_dir(cache_dir, os.path.basename(filepath)))
+
+
+def test_disabled_by_default(doppler_files, cache_dir):
+  assert days.budget() == 0
+  assert get(doppler_files[0], cache_dir) is None
+  assert days.stats()['days'] == 0
+
+
+def test_hits_and_evictions(doppler_files, cache_dir, monkeypatch):
+  monkeypatch.setenv('PSWS_DAY_CACHE_BYTES', str(1 << 30))
+  first, _ = get(doppler_files[0], cache_dir)
+  again, _ = get(doppler_files[0], cache_dir)
+  assert again is first
+  assert days.stats()['hits'] == 1 and days.stats()['misses'] == 1
+
+  # Room for one day only: the least recently used is evicted.
+  monkeypatch.setenv('PSWS_DAY_CACHE_BYTES', str(days.stats()['bytes'] * 3 // 2))
+  get(doppler_files[1], cache_dir)
+  assert days.stats()['days'] == 1 and days.stats()['evictions'] == 1
+  get(doppler_files[0], cache_dir)
+  assert days.stats()['misses'] == 3
+
+
+def test_changed_file_is_decoded_again(doppler_files, cache_dir, monkeypatch):
+  monkeypatch.setenv('PSWS_DAY_CACHE_BYTES', str(1 << 30))
+  first, _ = get(doppler_files[0], cache_dir)
+  with open(doppler_files[0], 'ab') as f:
+    f.write(b'2019-05-24T23:59:59Z,  4999999.000, 0.000001\n')
+  changed, _ = get(doppler_files[0], cache_dir)
+  assert len(changed['time']) >= len(first['time'])
+  assert changed is not first
+  assert days.stats()['days'] == 1
+
+
+def test_responses_are_unchanged(cache_dir, monkeypatch):
+  request = ('N000001/doppler', '2019-05-24T12:00:00Z', '2019-05-25T12:00:00Z')
+  expected = b''.join(data.iter_records(*request))
+  monkeypatch.setenv('PSWS_DAY_CACHE_BYTES', str(1 << 30))
+  days.clear()
+  try:
+    assert b''.join(data.iter_records(*request)) == expected
+    assert b''.join(data.iter_records(*request)) == expected
+    assert days.stats()['hits'] == 2
+  finally:
+    days.clear()
@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import DATA_DIR
+from psws import doppler
+
+DOPPLER_FILE = os.path.join(DATA_DIR, 'N000001', 'csvData',
+                            '2019-05-24T000000Z_N0000001_G1_EN91fh_FRQ_WWV5.csv')
+
+HEADER = '#,2019-05-24T00:00:00Z,N0000001,EN91fh,41.3219273, -81.5047731, 285,Macedonia Ohio,G1,WWV5\n' \
+         '#######################################\n' \
+         'UTC,Freq,Vpk\n'
+
+# Times of the rows of the test file, with gaps and a repeated time.
+SECONDS = [3, 4, 5, 9, 9, 10, 20, 21, 40]
+
+
+def ts(second):
+  return f'2019-05-24T00:00:{second:02d}Z'
+
+
+def linear(filepath, start, stop):
+  """Rows with start <= time < stop read from the start of the file."""
+  rows = []
+  with open(filepath, 'rb') as f:
+    for line in f:
+      if not doppler.is_row(line):
+        continue
+      cols = [col.strip() for col in line.split(b',')]
+      if cols[0] < start.encode():
+        continue
+      if cols[0] >= stop.encode():
+        break
+      rows.append(tuple(cols))
+  return rows
+
+
+@pytest.fixture
+def doppler_file(tmp_path):
+  filepath = tmp_path / 'doppler.csv'
+  rows = ''.join(f'{ts(s)},  4999999.{i:03d}, 0.{i:06d}\n' for i, s in enumerate(SECONDS))
+  filepath.write_text(HEADER + rows)
+  return str(filepath)
+
+
+def test_seek_boundaries(doppler_file):
+  # Every start and stop before, at, between and after the rows.
+  for start in range(0, 42):
+    for stop in range(start + 1, 43):
+      expected = linear(doppler_file, ts(start), ts(stop))
+      assert list(doppler.read(doppler_file, ts(start), ts(stop))) == expected, (start, stop)
+
+
+def test_seek_position(doppler_file):
+  with open(doppler_file, 'rb') as f:
+    doppler.seek(f, ts(9).encode())
+    assert f.readline().startswith(ts(9).encode() + b',  4999999.003')
+    doppler.seek(f, ts(11).encode())
+    assert f.readline().startswith(ts(20).encode())
+    doppler.seek(f, ts(0).encode())
+    assert f.readline().startswith(ts(3).encode())
+    doppler.seek(f, ts(41).encode())
+    assert f.readline() == b''
+
+
+def test_file_without_rows(tmp_path):
+  filepath = tmp_path / 'header.csv'
+  filepath.write_text(HEADER)
+  assert list(doppler.read(str(filepath), ts(0), ts(59))) == []
+  assert doppler.time_range(str(filepath))[1:] == (None, None)
+
+
+def test_time_range(doppler_file):
+  assert doppler.time_range(doppler_file)[1:] == (ts(3), ts(40))
+
+
+@pytest.mark.parametrize('start, stop', [
+  ('2019-05-24T00:00:00Z', '2019-05-24T00:07:47Z'),
+  ('2019-05-24T12:00:00Z', '2019-05-24T12:00:30Z'),
+  ('2019-05-24T12:00:00.5Z', '2019-05-24T12:00:01Z'),
+  ('2019-05-24T23:59:50Z', '2019-05-25T00:00:00Z'),
+  ('2019-05-25T00:00:00Z', '2019-05-26T00:00:00Z'),
+])
+def test_real_file(start, stop):
+  assert list(doppler.read(DOPPLER_FILE, start, stop)) == linear(DOPPLER_FILE, start, stop)
+
+
+def test_projection():
+  full, decimals = doppler.decode(DOPPLER_FILE)
+  for columns in [['Freq'], ['Vpk'], []]:
+    part, part_decimals = doppler.decode(DOPPLER_FILE, columns)
+    assert list(part) == ['time', *columns]
+    for name in part:
+      np.testing.assert_array_equal(part[name], full[name])
+    assert part_decimals == decimals
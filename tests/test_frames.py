@@ -0,0 +1,82 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from conftest import DATA_DIR
+from psws import cache, data, frames, mag
+
+SOURCES = [os.path.join('S000028', 'magData', 'OBS2025-10-20T00_00.zip'),
+           os.path.join('S000082', 'magData', 'OBS2025-10-18T00_00.zip')]
+
+WINDOWS = [
+  ('T00:00:00', 'T00:00:10'),
+  ('T00:59:58', 'T01:00:03'),
+  ('T05:30:00', 'T07:45:00'),
+  ('T23:59:00', 'T23:59:59'),
+  ('T00:00:00', 'T23:59:59'),
+]
+
+
+def concatenate(blocks, columns):
+  blocks = list(blocks) or [mag.empty(columns)]
+  return {name: np.concatenate([b[name] for b in blocks]) for name in blocks[0]}
+
+
+@pytest.mark.parametrize('rel_path', SOURCES)
+def test_frames_match_zip_file(rel_path, tmp_path):
+  source = os.path.join(DATA_DIR, rel_path)
+  entry_dir = str(tmp_path / 'frames')
+  frames.write(entry_dir, source)
+  entry_meta = cache.current(entry_dir, source)
+  assert entry_meta is not None
+  assert len(entry_meta['frames']) > 1
+
+  date = os.path.basename(source)[3:13]
+  for start, stop in WINDOWS:
+    start, stop = np.datetime64(date + start), np.datetime64(date + stop)
+    for columns in [None, ['x', 'Tm']]:
+      expected = concatenate(mag.read(source, start, stop, columns), columns)
+      result = concatenate(frames.read(entry_dir, entry_meta, start, stop, columns), columns)
+      assert result.keys() == expected.keys()
+      for name in expected:
+        np.testing.assert_array_equal(result[name], expected[name])
+
+
+def test_only_needed_frames_are_read(tmp_path, monkeypatch):
+  source = os.path.join(DATA_DIR, SOURCES[0])
+  entry_dir = str(tmp_path / 'frames')
+  frames.write(entry_dir, source)
+  entry_meta = cache.current(entry_dir, source)
+
+  read = []
+  inflate = frames._inflate
+  monkeypatch.setattr(frames, '_inflate',
+                      lambda entry_dir, wanted: read.extend(wanted) or inflate(entry_dir, wanted))
+  start, stop = np.datetime64('2025-10-20T05:30:00'), np.datetime64('2025-10-20T05:31:00')
+  list(frames.read(entry_dir, entry_meta, start, stop))
+  assert 1 <= len(read) <= 2
+
+
+def test_changed_source_is_not_used(tmp_path):
+  source = shutil.copy(os.path.join(DATA_DIR, SOURCES[0]), tmp_path)
+  entry_dir = str(tmp_path / 'frames')
+  frames.write(entry_dir, source)
+  assert cache.current(entry_dir, source) is not None
+  stat = os.stat(source)
+  os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+  assert cache.current(entry_dir, source) is None
+
+
+def test_responses_are_unchanged(cache_dir, monkeypatch):
+  request = ('S000028/mag', '2025-10-20T05:30:00Z', '2025-10-20T07:45:00Z')
+  expected = b''.join(data.iter_records(*request))
+  source = os.path.join(DATA_DIR, SOURCES[0])
+  frames.write(frames.entry_dir(cache_dir, SOURCES[0]), source)
+
+  calls = []
+  read = frames.read
+  monkeypatch.setattr(frames, 'read', lambda *args: calls.append(args) or read(*args))
+  assert b''.join(data.iter_records(*request)) == expected
+  assert len(calls) == 1
@@ -0,0 +1,16 @@
+import pytest
+
+from psws import isotime
+
+
+@pytest.mark.parametrize('seconds, text', [
+  (0, 'PT0S'),
+  (59, 'PT59S'),
+  (3600, 'PT1H'),
+  (86400, 'P1D'),
+  (90061, 'P1DT1H1M1S'),
+  (1800 * 86400, 'P1800D'),
+])
+def test_format_duration(seconds, text):
+  assert isotime.format_duration(seconds) == text
+  assert isotime.duration(text).astype(int) == seconds
@@ -0,0 +1,199 @@
+import os
+import json
+import zipfile
+import datetime
+import importlib.util
+
+import numpy as np
+import pytest
+
+from conftest import BIN_DIR, DATA_DIR
+from psws import data, mag
+
+MAG_FILE = os.path.join(DATA_DIR, 'S000028', 'magData', 'OBS2025-10-20T00_00.zip')
+
+
+def baseline_rows(filepath, start, stop, parameters):
+  """Rows of JSON mag file as written one at a time by the original data.py."""
+  with zipfile.ZipFile(filepath) as z:
+    text = ''.join(z.read(name).decode('utf-8') for name in sorted(z.namelist()))
+  rows = []
+  for line in text.splitlines():
+    entry = json.loads(line)
+    ts = datetime.datetime.strptime(entry['ts'], '%d %b %Y %H:%M:%S')
+    ts = ts.strftime('%Y-%m-%dT%H:%M:%SZ')
+    if ts < start:
+      continue
+    if ts >= stop:
+      break
+    row = ts
+    for parameter in parameters:
+      row += ''.join(f',{entry[column]}' for column in mag.PARAMETERS[parameter])
+    rows.append(row)
+  return rows
+
+
+def response_rows(id, start, stop, parameters=None):
+  return b''.join(data.iter_records(id, start, stop, parameters)).decode().splitlines()
+
+
+def test_day_matches_baseline(cache_dir):
+  start, stop = '2025-10-20T00:00:00Z', '2025-10-21T00:00:00Z'
+  expected = baseline_rows(MAG_FILE, start, stop, data.PARAMETERS['mag'])
+  assert len(expected) > 70000
+  assert response_rows('S000028/mag', start, stop) == expected
+
+
+def test_window_matches_baseline(cache_dir):
+  start, stop = '2025-10-20T12:00:00Z', '2025-10-20T12:30:00Z'
+  for parameters in [['Field_Vector'], ['rt', 'Tm'], ['rxryrz', 'lt']]:
+    expected = baseline_rows(MAG_FILE, start, stop, parameters)
+    assert response_rows('S000028/mag', start, stop, parameters) == expected
+
+
+def test_block_decoder_matches_row_decoder():
+  blocks = list(mag.blocks(MAG_FILE))
+  for chunk in blocks[0:2]:
+    fast = mag._decode_json(chunk, mag.COLUMNS)
+    slow = mag._rows_json(chunk, mag.COLUMNS)
+    assert fast.keys() == slow.keys()
+    for name in fast:
+      assert fast[name].dtype == slow[name].dtype
+      np.testing.assert_array_equal(fast[name], slow[name])
+
+
+def test_read_stops_at_stop():
+  start, stop = np.datetime64('2025-10-20T00:00:00'), np.datetime64('2025-10-20T00:00:10')
+  blocks = list(mag.read(MAG_FILE, start, stop, ['x']))
+  assert len(blocks) == 1
+  time = blocks[0]['time']
+  assert len(time) > 0 and time[0] >= start and time[-1] < stop
+
+
+def test_first_and_last_time():
+  assert mag.first_time(MAG_FILE) == datetime.datetime(2025, 10, 20, 0, 0, 0)
+  day = mag.decode_file(MAG_FILE, ['x'])
+  assert np.datetime64(mag.last_time(MAG_FILE)) == day['time'][-1]
+
+
+def load_generate():
+  spec = importlib.util.spec_from_file_location(
+    'generate', os.path.join(BIN_DIR, 'bench', 'generate.py'))
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+
+DATE = datetime.date(2025, 1, 1)
+
+
+def generated(generate, layout, seed=1):
+  # Seconds and values of a generated day of rows in layout.
+  rng = generate.rng_for(seed, generate.MAG_FORMATS.index(layout), DATE, 0)
+  s = generate.seconds(10, 0.1, rng)
+  return s, generate.mag_values(s, rng)
+
+
+def assert_decoded(day, names, s, values):
+  np.testing.assert_array_equal(day['time'], np.datetime64(DATE) + s.astype('timedelta64[s]'))
+  for name in mag.COLUMNS:
+    if name not in names:
+      assert (day[name] == mag.FILL).all()
+    elif mag.TYPES[name] == 'integer':
+      np.testing.assert_array_equal(day[name], values[name])
+    else:
+      # Values are written with at least two decimals.
+      np.testing.assert_allclose(day[name], values[name], rtol=0, atol=0.0051)
+
+
+@pytest.mark.parametrize('layout', ['json', 'quoted10', 'quoted9'])
+def test_generated_layouts(layout, tmp_path):
+  generate = load_generate()
+  station = generate.MAG_FORMATS.index(layout)
+  file = generate.write_mag_day(str(tmp_path), station, DATE, 10, 0.1, 1)
+  assert mag.first_row_format(file) == layout
+  assert_decoded(mag.decode_file(file), generate.MAG_ORDER[layout], *generated(generate, layout))
+
+
+def test_quoted10_has_json_order(tmp_path):
+  # The values of the JSON rows of a day without their keys decode to the
+  # same columns as the JSON rows.
+  with zipfile.ZipFile(MAG_FILE) as z:
+    text = z.read(sorted(z.namelist())[0]).decode('utf-8')
+  rows = []
+  for line in text.splitlines()[0:5000]:
+    entry = json.loads(line)
+    rows.append(', '.join([f'"{entry["ts"]}"', *(str(entry[name])
+                                                  for name in list(entry)[1:])]))
+  assert list(entry)[1:] == mag.QUOTED_COLUMNS['quoted10']
+  file = str(tmp_path / 'OBS2025-10-20T00_00.zip')
+  with zipfile.ZipFile(file, 'w') as z:
+    z.writestr('runmag.log', '\n'.join(rows) + '\n')
+
+  assert mag.first_row_format(file) == 'quoted10'
+  day = mag.decode_file(file)
+  expected = mag.decode_file(MAG_FILE)
+  for name in day:
+    np.testing.assert_array_equal(day[name], expected[name][0:5000])
+  # Tm is the magnitude of the field vector.
+  np.testing.assert_allclose(day['Tm'], np.sqrt(day['x']**2 + day['y']**2 + day['z']**2),
+                             rtol=1e-3)
+
+
+def test_files_with_different_layouts(tmp_path):
+  # A zip file with a runmag.log in each layout, as when a station changes
+  # its software at noon.
+  generate = load_generate()
+  layouts = ['quoted9', 'json']
+
+  def half(i):
+    s, values = generated(generate, layouts[i])
+    rows = (s < 43200) == (i == 0)
+    return s[rows], {name: v[rows] for name, v in values.items()}
+
+  file = str(tmp_path / 'OBS2025-01-01T00_00.zip')
+  with zipfile.ZipFile(file, 'w') as z:
+    for i, layout in enumerate(layouts):
+      z.writestr(f'{i}-runmag.log', '\n'.join(generate.mag_lines(layout, DATE, *half(i))) + '\n')
+
+  day = mag.decode_file(file)
+  morning = day['time'] < np.datetime64('2025-01-01T12:00:00')
+  for i, rows in enumerate([morning, ~morning]):
+    assert_decoded({name: v[rows] for name, v in day.items()}, generate.MAG_ORDER[layouts[i]],
+                   *half(i))
+
+
+@pytest.mark.parametrize('layout', ['json', 'quoted10', 'quoted9'])
+def test_projection(layout, tmp_path):
+  # Decoding some of the columns gives the same values as decoding all.
+  generate = load_generate()
+  file = generate.write_mag_day(str(tmp_path), generate.MAG_FORMATS.index(layout), DATE, 10, 0.1, 1)
+  chunk = next(mag.blocks(file))
+  full = mag.decode(chunk, layout)
+  for columns in [['x', 'y', 'z'], ['Tm', 'rx'], ['lt'], []]:
+    for decode in [mag.DECODERS[layout].block, mag.DECODERS[layout].rows]:
+      part = decode(chunk, columns)
+      assert list(part) == ['time', *columns]
+      for name in part:
+        np.testing.assert_array_equal(part[name], full[name])
+        assert part[name].dtype == full[name].dtype
+
+
+def test_read_stops_decompressing_at_stop(monkeypatch):
+  read = []
+  blocks = mag.blocks
+
+  def counted(filepath, block_size=mag.BLOCK_SIZE):
+    for chunk in blocks(filepath, 1 << 16):
+      read.append(len(chunk))
+      yield chunk
+
+  start, stop = np.datetime64('2025-10-20T01:00:00'), np.datetime64('2025-10-20T01:00:10')
+  time = mag.decode_file(MAG_FILE, [])['time']
+  expected = ((time >= start) & (time < stop)).sum()
+  monkeypatch.setattr(mag, 'blocks', counted)
+  assert sum(len(b['time']) for b in mag.read(MAG_FILE, start, stop)) == expected > 0
+  # Only the first hour or so of the day is decompressed.
+  with zipfile.ZipFile(MAG_FILE) as z:
+    size = sum(info.file_size for info in z.infolist())
+  assert sum(read) < size / 10
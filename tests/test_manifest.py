@@ -0,0 +1,72 @@
+import os
+import json
+
+import pytest
+
+from conftest import DATA_DIR
+from psws import data, manifest
+
+NAMES = ['OBS2025-10-21T00_00.zip', 'OBS2025-10-19T00_00.zip', 'OBS2025-10-20T00_00.zip',
+         'notes.txt']
+
+
+@pytest.fixture
+def dataset_dir(tmp_path):
+  dataset_dir = tmp_path / 'S000001' / 'magData'
+  dataset_dir.mkdir(parents=True)
+  for name in NAMES:
+    (dataset_dir / name).write_bytes(b'')
+  return str(dataset_dir)
+
+
+def set_mtime(path, mtime_ns):
+  os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_build_and_find(dataset_dir):
+  files = manifest.build(dataset_dir, 'mag')
+  assert files['dates'] == ['2025-10-19', '2025-10-20', '2025-10-21']
+  assert manifest.find(files, '2025-10-20', '2025-10-21') == \
+    ['OBS2025-10-20T00_00.zip', 'OBS2025-10-21T00_00.zip']
+  assert manifest.find(files, '2025-10-19', '2025-10-19') == ['OBS2025-10-19T00_00.zip']
+  assert manifest.find(files, '2025-10-22', '2025-10-30') == []
+
+
+def test_load_saves_and_rebuilds(dataset_dir, tmp_path):
+  manifest_file = str(tmp_path / 'cache' / 'manifest' / 'S000001' / 'magData.json')
+  manifest._loaded.clear()
+  files = manifest.load(dataset_dir, 'mag', manifest_file)
+  with open(manifest_file) as f:
+    assert json.load(f) == files
+
+  # A file added without a change of the directory's mtime is not seen.
+  mtime_ns = os.stat(dataset_dir).st_mtime_ns
+  with open(os.path.join(dataset_dir, 'OBS2025-10-22T00_00.zip'), 'wb'):
+    pass
+  set_mtime(dataset_dir, mtime_ns)
+  manifest._loaded.clear()
+  assert manifest.load(dataset_dir, 'mag', manifest_file)['dates'][-1] == '2025-10-21'
+
+  # It is found once the mtime changes.
+  set_mtime(dataset_dir, mtime_ns + 10**9)
+  assert manifest.load(dataset_dir, 'mag', manifest_file)['dates'][-1] == '2025-10-22'
+  with open(manifest_file) as f:
+    assert json.load(f)['dates'][-1] == '2025-10-22'
+
+
+def test_unreadable_manifest_file_is_rebuilt(dataset_dir, tmp_path):
+  manifest_file = tmp_path / 'magData.json'
+  manifest_file.write_text('{not json')
+  manifest._loaded.clear()
+  files = manifest.load(dataset_dir, 'mag', str(manifest_file))
+  assert len(files['files']) == 3
+  assert json.loads(manifest_file.read_text()) == files
+
+
+def test_files_needed(cache_dir):
+  files = data.files_needed('S000028/mag', '2025-10-20T12:00:00Z', '2025-10-20T13:00:00Z',
+                            DATA_DIR, cache_dir)
+  assert [os.path.basename(file) for file in files] == ['OBS2025-10-20T00_00.zip']
+  files = data.files_needed('N000001/doppler/PT1M', '2019-05-01T00:00:00Z',
+                            '2019-06-01T00:00:00Z', DATA_DIR, cache_dir)
+  assert [os.path.basename(file)[0:10] for file in files] == ['2019-05-24', '2019-05-25']
@@ -0,0 +1,89 @@
+# Tests of etc/mirror_first_last.py.
+
+import os
+import importlib.util
+
+import pytest
+
+from conftest import ROOT
+
+spec = importlib.util.spec_from_file_location(
+  'mirror_first_last', os.path.join(ROOT, 'etc', 'mirror_first_last.py'))
+mirror = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(mirror)
+
+
+@pytest.fixture
+def src(tmp_path):
+  src = tmp_path / 'src'
+  for rel_path in ['S000001/magData/OBS2025-01-01T00_00.zip',
+                   'S000001/magData/OBS2025-01-02T00_00.zip',
+                   'S000001/magData/OBS2025-01-03T00_00.zip',
+                   'S000002/magData/OBS2025-01-01T00_00.zip',
+                   'N000001/csvData/2019-05-24T000000Z.csv']:
+    path = src / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(rel_path)
+  (src / 'S000003' / 'magData').mkdir(parents=True)
+  return src
+
+
+def files(dst):
+  return sorted(os.path.relpath(os.path.join(root, name), dst)
+                for root, _, names in os.walk(dst) for name in names)
+
+
+def run(src, dst, **kwargs):
+  progress = mirror.Progress(enabled=False)
+  result = mirror.mirror_first_last(str(src), str(dst), progress=progress, **kwargs)
+  return result, progress.counts
+
+
+def test_first_and_last_files(src, tmp_path):
+  dst = tmp_path / 'dst'
+  (size, n), counts = run(src, dst, workers=4)
+  assert files(dst) == ['N000001/csvData/2019-05-24T000000Z.csv',
+                        'S000001/magData/OBS2025-01-01T00_00.zip',
+                        'S000001/magData/OBS2025-01-03T00_00.zip',
+                        'S000002/magData/OBS2025-01-01T00_00.zip']
+  assert (dst / 'S000003' / 'magData').is_dir()
+  assert n == 4 and counts['copy'] == 4
+  assert size == sum(os.path.getsize(dst / name) for name in files(dst))
+
+
+def test_incremental(src, tmp_path):
+  dst = tmp_path / 'dst'
+  run(src, dst, incremental=True)
+  _, counts = run(src, dst, incremental=True)
+  assert counts['skipped'] == 4 and counts['copy'] == 0
+
+  # A day appended to the last file is copied again.
+  last = src / 'S000001' / 'magData' / 'OBS2025-01-03T00_00.zip'
+  last.write_text('more data')
+  _, counts = run(src, dst, incremental=True)
+  assert counts['skipped'] == 3 and counts['copy'] == 1
+  assert (dst / 'S000001' / 'magData' / last.name).read_text() == 'more data'
+
+
+def test_hardlink(src, tmp_path):
+  dst = tmp_path / 'dst'
+  _, counts = run(src, dst, link='hardlink')
+  assert counts['hardlink'] == 4
+  name = 'S000002/magData/OBS2025-01-01T00_00.zip'
+  assert os.stat(dst / name).st_ino == os.stat(src / name).st_ino
+
+
+def test_auto_link(src, tmp_path):
+  # Reflink, hardlink or copy, whichever the filesystem supports first.
+  dst = tmp_path / 'dst'
+  _, counts = run(src, dst, link='auto')
+  assert counts['reflink'] + counts['hardlink'] + counts['copy'] == 4
+  assert len(files(dst)) == 4
+
+
+def test_dry_run_and_top_level_limit(src, tmp_path):
+  dst = tmp_path / 'dst'
+  (_, n), _ = run(src, dst, dry_run=True)
+  assert n == 4 and not dst.exists()
+  run(src, dst, top_n=1)
+  assert files(dst) == ['N000001/csvData/2019-05-24T000000Z.csv']
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from psws import data, output
+
+TIME = np.array(['2025-10-20T00:00:00', '2025-10-20T00:00:01', '1999-12-31T23:59:59'],
+                dtype='datetime64[s]')
+
+
+def rows(time, columns, decimals=None):
+  """Rows written one at a time with f-strings, as by the original data.py."""
+  lines = []
+  for i, t in enumerate(time):
+    row = f'{t}Z'
+    for values, places in zip(columns, decimals or [None] * len(columns)):
+      value = values[i].item()
+      row += f',{value:.{places}f}' if places is not None else f',{value}'
+    lines.append(row + '\n')
+  return ''.join(lines).encode()
+
+
+@pytest.mark.parametrize('values', [
+  [0.0, -0.0, 1.5],
+  [-45676.67, 13284.67, 50236.2845],
+  [1e-5, 123456789012345.6, 1e16],
+  [4999999.856, 0.024867, -1e-4],
+  [float('nan'), float('inf'), -float('inf')],
+  [99999.0, 0.1, 0.30000000000000004],
+])
+def test_csv_floats_as_repr(values):
+  columns = [np.array(values)]
+  assert output.csv(TIME, columns) == rows(TIME, columns)
+
+
+def test_csv_integers():
+  columns = [np.array([-68515, 0, 2**40]), np.array([1, -2, 3], dtype=np.int32)]
+  assert output.csv(TIME, columns) == rows(TIME, columns)
+
+
+def test_csv_decimals():
+  columns = [np.array([4999999.856, 4999999.8, 5.0]), np.array([0.024867, 0.1, 1.0])]
+  assert output.csv(TIME, columns, [3, 6]) == rows(TIME, columns, [3, 6])
+
+
+def test_csv_random_floats():
+  rng = np.random.default_rng(1)
+  columns = [rng.normal(0, 1e4, 1000), np.round(rng.normal(0, 100, 1000), 2)]
+  time = np.datetime64('2025-10-20T00:00:00') + np.arange(1000).astype('timedelta64[s]')
+  assert output.csv(time, columns) == rows(time, columns)
+
+
+def test_csv_no_rows():
+  assert output.csv(TIME[0:0], [np.array([])]) == b''
+
+
+def test_binary():
+  columns = [np.array([1.5, -2.25, np.nan]), np.array([-68515, 24226, 7]),
+             np.array([1.4, np.nan, -2.6])]
+  body = output.binary(TIME, columns, ['double', 'integer', 'integer'])
+  dtype = [('time', 'S20'), ('a', '<f8'), ('b', '<i4'), ('c', '<i4')]
+  assert len(body) == 3 * np.dtype(dtype).itemsize
+  decoded = np.frombuffer(body, dtype=dtype)
+  assert decoded['time'].tolist() == [b'2025-10-20T00:00:00Z', b'2025-10-20T00:00:01Z',
+                                      b'1999-12-31T23:59:59Z']
+  np.testing.assert_array_equal(decoded['a'], columns[0])
+  assert decoded['b'].tolist() == [-68515, 24226, 7]
+  assert decoded['c'].tolist() == [1, output.INTEGER_FILL, -3]
+
+
+@pytest.mark.parametrize('id, start, stop, dtype', [
+  ('S000028/mag', '2025-10-20T12:00:00Z', '2025-10-20T12:10:00Z',
+   [('time', 'S20')] + [(c, '<f8') for c in 'xyz'] + [(c, '<i4') for c in ['rx', 'ry', 'rz']]
+   + [(c, '<f8') for c in ['rt', 'lt', 'Tm']]),
+  ('N000001/doppler', '2019-05-24T12:00:00Z', '2019-05-24T12:10:00Z',
+   [('time', 'S20'), ('Freq', '<f8'), ('Vpk', '<f8')]),
+])
+def test_binary_response_matches_csv(cache_dir, id, start, stop, dtype):
+  csv = b''.join(data.iter_records(id, start, stop)).decode().splitlines()
+  body = b''.join(data.iter_records(id, start, stop, format='binary'))
+  decoded = np.frombuffer(body, dtype=dtype)
+  assert len(decoded) == len(csv) > 0
+  for row, line in zip(decoded[[0, -1]], [csv[0], csv[-1]]):
+    values = line.split(',')
+    assert row['time'].decode() == values[0]
+    assert [float(row[name]) for name, _ in dtype[1:]] == [float(v) for v in values[1:]]
@@ -0,0 +1,38 @@
+# Tests of psws/quality.py.
+
+import os
+import json
+
+from psws import quality
+
+from conftest import DATA_DIR
+
+
+def test_quoted9_file_is_decoded():
+  result = quality.check_file(os.path.join(DATA_DIR, 'S000082', 'magData',
+                                           'OBS2025-10-18T00_00.zip'), 'mag')
+  assert result.get('error') is None
+  assert result['format'] == 'quoted9'
+  assert result['rows'] > 86000
+
+
+def test_results_of_other_versions_are_ignored(tmp_path):
+  file = str(tmp_path / 'state.json')
+  files = {'a.zip': {'stat': {'size': 1, 'mtime_ns': 1}, 'result': {'rows': 0}}}
+  quality.save_state(files, file)
+  assert quality.load_state(file) == files
+
+  with open(file, 'w') as f:
+    json.dump({'version': quality.VERSION - 1, 'files': files}, f)
+  assert quality.load_state(file) == {}
+
+
+def test_scan_rechecks_after_version_change(tmp_path, monkeypatch):
+  cache_dir = str(tmp_path)
+  _, n_checked = quality.scan(DATA_DIR, cache_dir, workers=1)
+  assert n_checked > 0
+  _, n_checked = quality.scan(DATA_DIR, cache_dir, workers=1)
+  assert n_checked == 0
+  monkeypatch.setattr(quality, 'VERSION', quality.VERSION + 1)
+  report, n_checked = quality.scan(DATA_DIR, cache_dir, workers=1)
+  assert n_checked == len(report)
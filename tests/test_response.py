@@ -0,0 +1,78 @@
+import os
+import json
+import shutil
+
+import pytest
+
+from conftest import BIN_DIR
+from psws import catalog, info, response
+
+DOCUMENT = response.compile_document({'a': 1}, 1760918400 * 10**9)
+
+
+@pytest.fixture
+def catalog_file(tmp_path):
+  return shutil.copy(os.path.join(BIN_DIR, 'catalog.csv'), tmp_path)
+
+
+def test_compile_document():
+  assert DOCUMENT.body == b'{\n  "a": 1\n}\n'
+  assert DOCUMENT.etag.startswith('"') and DOCUMENT.etag.endswith('"')
+  assert DOCUMENT.last_modified == 'Mon, 20 Oct 2025 00:00:00 GMT'
+  assert response.compile_document({'a': 1}, 0).etag == DOCUMENT.etag
+  assert response.headers(DOCUMENT) == {'ETag': DOCUMENT.etag,
+                                        'Last-Modified': DOCUMENT.last_modified}
+
+
+@pytest.mark.parametrize('if_none_match, if_modified_since, expected', [
+  (None, None, False),
+  (DOCUMENT.etag, None, True),
+  ('W/' + DOCUMENT.etag, None, True),
+  ('"other", ' + DOCUMENT.etag, None, True),
+  ('*', None, True),
+  ('"other"', 'Mon, 20 Oct 2025 00:00:00 GMT', False),
+  (None, 'Mon, 20 Oct 2025 00:00:00 GMT', True),
+  (None, 'Tue, 21 Oct 2025 00:00:00 GMT', True),
+  (None, 'Sun, 19 Oct 2025 23:59:59 GMT', False),
+  (None, 'not a date', False),
+])
+def test_not_modified(if_none_match, if_modified_since, expected):
+  assert response.not_modified(DOCUMENT, if_none_match, if_modified_since) == expected
+
+
+def test_cached_until_source_changes(catalog_file):
+  calls = []
+
+  def build():
+    calls.append(1)
+    return len(calls)
+
+  key = ('test', catalog_file)
+  assert response.cached(key, [catalog_file], build) == 1
+  assert response.cached(key, [catalog_file], build) == 1
+  with open(catalog_file, 'a') as f:
+    f.write('\nS000999/mag,TEST,2025-01-01T00:00:00Z,2025-01-02T00:00:00Z,,,\n')
+  assert response.cached(key, [catalog_file], build) == 2
+
+
+def test_catalog_document_is_rebuilt(catalog_file):
+  document = catalog.document(catalog_file)
+  assert catalog.document(catalog_file) is document
+  ids = [entry['id'] for entry in json.loads(document.body)]
+  assert 'S000028/mag' in ids and 'S000028/mag/PT1M' in ids
+
+  with open(catalog_file, 'a') as f:
+    f.write('\nS000999/mag,TEST,2025-01-01T00:00:00Z,2025-01-02T00:00:00Z,,,\n')
+  rebuilt = catalog.document(catalog_file)
+  assert rebuilt.etag != document.etag
+  assert 'S000999/mag' in [entry['id'] for entry in json.loads(rebuilt.body)]
+
+
+def test_info_document(catalog_file):
+  document = info.document('S000028/mag', catalog_file)
+  assert json.loads(document.body) == info.info('S000028/mag', catalog_file)
+  assert info.document('S000028/mag', catalog_file) is document
+  with pytest.raises(ValueError):
+    info.document('S000999/mag', catalog_file)
+  with pytest.raises(ValueError):
+    info.document('S000028/mag/PT5M', catalog_file)
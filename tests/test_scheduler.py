@@ -0,0 +1,207 @@
+import asyncio
+
+import pytest
+
+from psws import scheduler
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+  monkeypatch.setenv('PSWS_MAX_DECODES', '1')
+  monkeypatch.setenv('PSWS_MAX_QUEUE', '2')
+  monkeypatch.setenv('PSWS_CLIENT_QUEUE', '1')
+  monkeypatch.setenv('PSWS_QUEUE_TIMEOUT', '5')
+  yield
+  assert scheduler.stats()['active'] == 0
+  assert scheduler.stats()['flights'] == scheduler.stats()['queued'] == 0
+
+
+class Producer:
+  """produce() for scheduler.submit() that yields chunks once released."""
+
+  def __init__(self, chunks=(b'a', b'b', b'c'), error=None, released=False):
+    self.chunks = chunks
+    self.error = error
+    self.calls = 0
+    self.release = asyncio.Event()
+    if released:
+      self.release.set()
+
+  async def __call__(self):
+    self.calls += 1
+    if self.error is not None:
+      raise self.error
+
+    async def iterator():
+      await self.release.wait()
+      for chunk in self.chunks:
+        yield chunk
+
+    return iterator()
+
+
+async def settle():
+  # Let submitted requests reach the queue.
+  for _ in range(10):
+    await asyncio.sleep(0)
+
+
+async def read(body):
+  return b''.join([chunk async for chunk in body])
+
+
+def test_identical_requests_share_a_flight():
+
+  async def run():
+    counts = dict(scheduler.stats())
+    producer = Producer()
+    first = await scheduler.submit('key', 'client1', producer)
+    second = await scheduler.submit('key', 'client2', producer)
+    producer.release.set()
+    results = await asyncio.gather(read(first), read(second))
+    assert results == [b'abc', b'abc']
+    assert producer.calls == 1
+    assert scheduler.stats()['coalesced'] == counts['coalesced'] + 1
+
+  asyncio.run(run())
+
+
+def test_error_before_first_chunk_is_raised():
+
+  async def run():
+    with pytest.raises(ValueError):
+      await scheduler.submit('key', 'client', Producer(error=ValueError('bad file')))
+
+  asyncio.run(run())
+
+
+def test_queue_limits():
+
+  async def run():
+    running = Producer()
+    body = await scheduler.submit('running', 'client1', running)
+
+    # The only decode slot is taken, so these wait in the queue.
+    queued = [asyncio.ensure_future(scheduler.submit(key, client, Producer(released=True)))
+              for key, client in [('queued1', 'client1'), ('queued2', 'client2')]]
+    await settle()
+    assert scheduler.stats()['queued'] == 2
+
+    with pytest.raises(scheduler.Busy, match='too many requests queued'):
+      await scheduler.submit('rejected', 'client3', Producer())
+
+    running.release.set()
+    assert await read(body) == b'abc'
+    for future in queued:
+      assert await read(await future) == b'abc'
+
+  asyncio.run(run())
+
+
+def test_client_queue_limit(monkeypatch):
+  monkeypatch.setenv('PSWS_MAX_QUEUE', '10')
+
+  async def run():
+    running = Producer()
+    body = await scheduler.submit('running', 'client1', running)
+    queued = asyncio.ensure_future(scheduler.submit('queued', 'client1', Producer(released=True)))
+    await settle()
+    with pytest.raises(scheduler.Busy, match='for client'):
+      await scheduler.submit('rejected', 'client1', Producer())
+    # Another client can still queue.
+    other = asyncio.ensure_future(scheduler.submit('other', 'client2', Producer(released=True)))
+    await settle()
+    assert scheduler.stats()['queued'] == 2
+
+    running.release.set()
+    await read(body)
+    assert await read(await queued) == b'abc'
+    assert await read(await other) == b'abc'
+
+  asyncio.run(run())
+
+
+def test_queue_timeout(monkeypatch):
+  monkeypatch.setenv('PSWS_QUEUE_TIMEOUT', '0.05')
+
+  async def run():
+    running = Producer()
+    body = await scheduler.submit('running', 'client1', running)
+    with pytest.raises(scheduler.Busy, match='waited'):
+      await scheduler.submit('late', 'client2', Producer())
+    running.release.set()
+    await read(body)
+
+  asyncio.run(run())
+
+
+def test_slot_passed_as_queue_timeout_fires(monkeypatch):
+  # The timeout fires in the iteration of the loop in which _release() passes
+  # its slot to the waiting flight, which is then admitted.
+
+  async def wait_for(future, timeout):
+    await future
+    raise asyncio.TimeoutError
+
+  monkeypatch.setattr(asyncio, 'wait_for', wait_for)
+
+  async def run():
+    await scheduler._admit('client1')
+    admit = asyncio.ensure_future(scheduler._admit('client2'))
+    await settle()
+    scheduler._release()
+    await admit
+    assert scheduler.stats()['active'] == 1
+    scheduler._release()
+
+  asyncio.run(run())
+
+
+def test_slot_passed_as_flight_is_cancelled():
+  # A flight cancelled in the iteration of the loop in which _release()
+  # passes it a slot either is admitted or passes the slot on.
+
+  async def run():
+    await scheduler._admit('client1')
+    admit = asyncio.ensure_future(scheduler._admit('client2'))
+    await settle()
+    scheduler._release()
+    admit.cancel()
+    try:
+      await admit
+    except asyncio.CancelledError:
+      return
+    scheduler._release()
+
+  asyncio.run(run())
+
+
+def test_clients_take_turns(monkeypatch):
+  monkeypatch.setenv('PSWS_CLIENT_QUEUE', '4')
+  monkeypatch.setenv('PSWS_MAX_QUEUE', '10')
+  order = []
+
+  def producer(name):
+    async def produce():
+      order.append(name)
+
+      async def iterator():
+        yield name.encode()
+
+      return iterator()
+    return produce
+
+  async def run():
+    running = Producer()
+    body = await scheduler.submit('running', 'a', running)
+    futures = []
+    for name, client in [('a1', 'a'), ('a2', 'a'), ('b1', 'b')]:
+      futures.append(asyncio.ensure_future(scheduler.submit(name, client, producer(name))))
+      await settle()
+    running.release.set()
+    await read(body)
+    for future in futures:
+      await read(await future)
+
+  asyncio.run(run())
+  assert order == ['a1', 'b1', 'a2']
@@ -0,0 +1,48 @@
+# The bin/ scripts write the same responses as the functions they wrap.
+
+import os
+import sys
+import subprocess
+
+import pytest
+
+from conftest import BIN_DIR
+from psws import catalog, data, info
+
+
+def run(script, *args, env=None):
+  return subprocess.run([sys.executable, os.path.join(BIN_DIR, script), *args], cwd=BIN_DIR,
+                        capture_output=True, env={**os.environ, **(env or {})})
+
+
+def test_catalog():
+  result = run('catalog.py')
+  assert result.returncode == 0
+  assert result.stdout == catalog.document().body
+
+
+def test_info():
+  result = run('info.py', 'S000028/mag/PT1H')
+  assert result.returncode == 0
+  assert result.stdout == info.document('S000028/mag/PT1H').body
+  assert run('info.py', 'S000999/mag').returncode == 1
+
+
+@pytest.mark.parametrize('args', [
+  ['S000028/mag', '2025-10-20T12:00:00Z', '2025-10-20T12:30:00Z'],
+  ['S000082/mag', '2025-10-18T23:00:00Z', '2025-10-19T01:00:00Z', 'Field_Vector,Tm'],
+  ['N000001/doppler', '2019-05-24T12:00:00Z', '2019-05-24T12:30:00Z', '', 'binary'],
+])
+def test_data(cache_dir, args):
+  result = run('data.py', *args)
+  assert result.returncode == 0
+  parameters = args[3].split(',') if len(args) > 3 and args[3] else None
+  format = args[4] if len(args) > 4 else 'csv'
+  expected = b''.join(data.iter_records(*args[0:3], parameters, format=format))
+  assert result.stdout == expected and len(expected) > 0
+
+
+def test_data_error(cache_dir):
+  result = run('data.py', 'S000999/mag', '2025-10-20T12:00:00Z', '2025-10-20T12:30:00Z')
+  assert result.returncode == 1
+  assert result.stdout == b''
@@ -0,0 +1,158 @@
+# Tests of the HAPI endpoints of psws/server.py.
+
+import pytest
+
+DOPPLER = 'N000001/doppler'
+
+
+def data(client, dataset, start, stop, **params):
+  return client.get('/data', params={'dataset': dataset, 'start': start, 'stop': stop,
+                                     **params}, headers={'accept-encoding': 'identity'})
+
+
+def test_truncated_times_are_normalized(client):
+  response = data(client, DOPPLER, '2019-05-24T00:07Z', '2019-05-24T00:08Z')
+  assert response.status_code == 200
+  expected = data(client, DOPPLER, '2019-05-24T00:07:00Z', '2019-05-24T00:08:00Z')
+  assert response.content == expected.content
+  lines = response.text.splitlines()
+  assert lines
+  assert all(line.startswith('2019-05-24T00:07:') for line in lines)
+
+
+def test_day_of_year_times(client):
+  response = data(client, DOPPLER, '2019-144T00:07Z', '2019-144T00:08:00.000Z')
+  assert response.status_code == 200
+  expected = data(client, DOPPLER, '2019-05-24T00:07:00Z', '2019-05-24T00:08:00Z')
+  assert response.content == expected.content
+
+
+def test_time_min_and_time_max(client):
+  response = client.get('/data', params={'id': DOPPLER, 'time.min': '2019-05-24T00:07Z',
+                                         'time.max': '2019-05-24T00:08Z'})
+  expected = data(client, DOPPLER, '2019-05-24T00:07:00Z', '2019-05-24T00:08:00Z')
+  assert response.content == expected.content
+
+
+@pytest.mark.parametrize('start, stop, code', [
+  ('2019-05-24T01Z', '2019-05-24T01Z', 1404),
+  ('2019-05-25', '2019-05-24', 1404),
+  ('2019-05-24T00:00Z', '2019-06-24T00:00:01Z', 1408),
+  ('2019-02-29', '2019-03-01', 1402),
+  ('2019-366', '2020-001', 1402),
+  ('2019-05-24', 'tomorrow', 1403),
+])
+def test_bad_time_ranges(client, start, stop, code):
+  response = data(client, DOPPLER, start, stop)
+  assert response.json()['status']['code'] == code
+
+
+def test_max_request_duration(client):
+  # P30D is allowed.
+  response = data(client, DOPPLER, '2019-05-24T00:00Z', '2019-06-23T00:00Z',
+                  parameters='Freq')
+  assert response.status_code == 200
+  response = data(client, DOPPLER, '2019-05-24T00:00Z', '2019-06-23T00:00:01Z')
+  assert response.status_code == 413
+
+
+MAG_DAY = ('S000028/mag', '2025-10-20T00:00:00Z', '2025-10-21T00:00:00Z')
+
+
+def test_past_range_has_validators_and_max_age(client):
+  response = data(client, *MAG_DAY, parameters='Field_Vector')
+  assert response.status_code == 200
+  assert response.headers['cache-control'].startswith('public, max-age=')
+  etag, last_modified = response.headers['etag'], response.headers['last-modified']
+  assert 'GMT' in last_modified and '1970' not in last_modified
+
+  for headers in [{'if-none-match': etag}, {'if-modified-since': last_modified}]:
+    revalidated = client.get('/data', params={'dataset': MAG_DAY[0], 'start': MAG_DAY[1],
+                                              'stop': MAG_DAY[2], 'parameters': 'Field_Vector'},
+                             headers={'accept-encoding': 'identity', **headers})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b''
+    assert revalidated.headers['etag'] == etag
+
+  other = data(client, *MAG_DAY, parameters='rxryrz')
+  assert other.headers['etag'] != etag
+
+
+def test_etag_depends_on_content_coding(client):
+  params = {'dataset': MAG_DAY[0], 'start': MAG_DAY[1], 'stop': MAG_DAY[2]}
+  plain = client.get('/data', params=params, headers={'accept-encoding': 'identity'})
+  gzipped = client.get('/data', params=params, headers={'accept-encoding': 'gzip'})
+  assert gzipped.headers['content-encoding'] == 'gzip'
+  assert gzipped.headers['vary'] == 'Accept-Encoding'
+  assert gzipped.content == plain.content
+  assert gzipped.headers['etag'] != plain.headers['etag']
+
+
+@pytest.mark.parametrize('start, stop', [
+  ('2023-01-01T00:00:00Z', '2023-01-05T00:00:00Z'),   # No files
+  ('2025-10-18T00:00:00Z', '2025-10-21T00:00:00Z'),   # No file for 2025-10-20
+])
+def test_range_with_missing_days_is_not_cached(client, start, stop):
+  response = data(client, 'S000082/mag', start, stop, parameters='Tm')
+  assert response.status_code == 200
+  assert response.headers['cache-control'] == 'no-cache'
+  assert 'etag' not in response.headers
+  assert 'last-modified' not in response.headers
+
+
+def test_corrupt_zip_file(client, tmp_path, monkeypatch):
+  mag_dir = tmp_path / 'data' / 'S000028' / 'magData'
+  mag_dir.mkdir(parents=True)
+  (mag_dir / 'OBS2025-10-20T00_00.zip').write_bytes(b'PK\x03\x04 not a zip file')
+  monkeypatch.setenv('PSWS_DATA_DIR', str(tmp_path / 'data'))
+  response = data(client, 'S000028/mag', '2025-10-20T00:00Z', '2025-10-20T01:00Z')
+  assert response.status_code == 500
+  assert response.json()['status']['code'] == 1500
+
+
+@pytest.mark.parametrize('error', [KeyError, IndexError])
+def test_decode_errors(client, monkeypatch, error):
+  from psws import data as psws_data
+
+  def iter_records(*args, **kwargs):
+    raise error('bad row')
+    yield b''
+
+  monkeypatch.setattr(psws_data, 'iter_records', iter_records)
+  response = data(client, DOPPLER, '2019-05-24T00:07Z', '2019-05-24T00:08Z')
+  assert response.status_code == 500
+  assert response.json()['status']['code'] == 1500
+
+
+def test_busy(client, monkeypatch):
+  from psws import scheduler
+
+  # All decode slots are taken and no request may wait.
+  monkeypatch.setenv('PSWS_MAX_DECODES', '1')
+  monkeypatch.setenv('PSWS_MAX_QUEUE', '0')
+  monkeypatch.setattr(scheduler, '_active', 1)
+  response = data(client, DOPPLER, '2019-05-24T00:07Z', '2019-05-24T00:08Z')
+  assert response.status_code == 503
+  assert response.headers['retry-after'] == '5'
+  assert response.json()['status']['code'] == 1500
+
+
+def test_metrics(client, monkeypatch):
+  from psws import metrics, timing
+  monkeypatch.setattr(timing, '_enabled', True)
+  monkeypatch.setattr(metrics, '_aggregate', {})
+  assert client.get('/metrics').json()['datasets'] == {}
+
+  bodies = [data(client, 'N000001/doppler', '2019-05-24T12:00:00Z', '2019-05-24T13:00:00Z'),
+            data(client, 'S000028/mag', '2025-10-20T12:00:00Z', '2025-10-20T12:30:00Z')]
+  response = client.get('/metrics')
+  assert response.status_code == 200
+  result = response.json()
+  assert result['enabled'] and result['buckets'] == metrics.BUCKETS
+  for type, body in zip(['doppler', 'mag'], bodies):
+    entry = result['datasets'][type]
+    assert entry['requests'] == 1 and entry['errors'] == 0
+    assert entry['bytes'] == len(body.content)
+    # Each request has only the rows of its own response.
+    assert entry['stages']['format']['rows'] == body.text.count('\n')
+    assert entry['stages']['discover']['calls'] >= 1
@@ -0,0 +1,96 @@
+import pytest
+
+from psws import data, spatial
+
+# id, lat, long of the stations of the test catalog.
+STATIONS = [
+  ('S000001/mag', 41.354, -75.625),
+  ('S000002/mag', 38.938, -92.125),
+  ('S000003/mag', -33.9, 151.2),
+  ('S000004/mag', 64.8, -147.7),
+  ('S000005/mag', 0.0, 179.9),
+  ('S000006/mag', 0.0, -179.9),
+  ('S000007/mag', 89.9, 0.0),
+  ('N000001/doppler', 41.3219273, -81.5047731),
+]
+
+
+@pytest.fixture
+def catalog_file(tmp_path):
+  catalog_file = tmp_path / 'catalog.csv'
+  lines = ['# id, nickname,startDateTime, stopDateTime, lat, long, elevation']
+  lines += [f'{id},X,2025-01-01T00:00:00Z,2025-01-02T00:00:00Z,{lat},{long},0.0'
+            for id, lat, long in STATIONS]
+  lines.append('S000008/mag,X,2025-01-01T00:00:00Z,2025-01-02T00:00:00Z,,,')
+  catalog_file.write_text('\n'.join(lines) + '\n')
+  return str(catalog_file)
+
+
+def ids(found):
+  return [entry['id'] for entry in found]
+
+
+def brute_force(region, data_type):
+  # Stations in region found by checking each of them.
+  found = []
+  for id, lat, long in STATIONS:
+    if not id.endswith('/' + data_type):
+      continue
+    if region.kind == 'box':
+      west, south, east, north = region.values
+      inside = west <= long <= east if west <= east else (long >= west or long <= east)
+      if south <= lat <= north and inside:
+        found.append((0, id))
+    else:
+      distance = spatial._distance(region.values[0], region.values[1], lat, long)
+      if distance <= region.values[2]:
+        found.append((distance, id))
+  return [id for _, id in sorted(found)]
+
+
+@pytest.mark.parametrize('text', [
+  '-100,30,-70,45',
+  '170,-10,-170,10',
+  '-180,-90,180,90',
+  '-75.625,41.354,-75.625,41.354',
+  '41.354,-75.625,1000',
+  '41.354,-75.625,2000',
+  '0,179.95,50',
+  '89,0,300',
+  '-30,150,20000',
+])
+def test_query_matches_brute_force(catalog_file, text):
+  region = spatial.region(text)
+  assert ids(spatial.query(region, 'mag', catalog_file)) == brute_force(region, 'mag')
+
+
+def test_circle_distances(catalog_file):
+  found = spatial.query(spatial.region('41.354,-75.625,2000'), 'mag', catalog_file)
+  assert found[0]['id'] == 'S000001/mag' and found[0]['distance'] == 0
+  assert [entry['distance'] for entry in found] == sorted(entry['distance'] for entry in found)
+
+
+def test_aggregate_type(catalog_file):
+  found = spatial.query(spatial.region('-100,30,-70,45'), 'mag/PT1M', catalog_file)
+  assert ids(found) == ['S000001/mag/PT1M', 'S000002/mag/PT1M']
+  assert 'distance' not in found[0]
+  with pytest.raises(ValueError):
+    spatial.query(spatial.region('-100,30,-70,45'), 'mag/PT5M', catalog_file)
+
+
+@pytest.mark.parametrize('text', ['1,2', '1,2,x', '10,0,20,-5', '0,0,-1', '0,200,10'])
+def test_bad_regions(text):
+  with pytest.raises(ValueError):
+    spatial.region(text)
+
+
+def test_bulk_matches_records(cache_dir):
+  ids = ['S000028/mag', 'S000999/mag', 'S000082/mag']
+  start, stop = '2025-10-18T23:59:50Z', '2025-10-20T00:00:10Z'
+  expected = []
+  for id in ['S000028/mag', 'S000082/mag']:
+    rows = b''.join(data.iter_records(id, start, stop, ['Field_Vector'])).decode().splitlines()
+    expected += [f'{id},{row}' for row in rows]
+  for workers in [1, 2]:
+    bulk = b''.join(data.iter_bulk(ids, start, stop, ['Field_Vector'], workers=workers))
+    assert bulk.decode().splitlines() == expected
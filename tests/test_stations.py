@@ -0,0 +1,63 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import BIN_DIR, DATA_DIR
+from psws import catalog, stations
+
+EXPECTED = {
+  'S000028/mag': ('2025-10-20T00:00:00Z', '2025-10-21T04:01:59Z'),
+  'S000082/mag': ('2025-10-18T00:00:00Z', '2025-10-19T23:59:59Z'),
+  'N000001/doppler': ('2019-05-24T00:07:46Z', '2019-05-25T23:59:59Z'),
+}
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+  """Copy of data/."""
+  return shutil.copytree(DATA_DIR, tmp_path / 'data')
+
+
+def test_scan(data_dir, cache_dir):
+  state, n_read = stations.scan(str(data_dir), cache_dir)
+  assert n_read == 3
+  assert {id: (e['startDateTime'], e['stopDateTime']) for id, e in state.items()} == EXPECTED
+  assert state['N000001/doppler']['header']['grid'] == 'EN91fh'
+
+  # Nothing changed, so no files are read.
+  assert stations.scan(str(data_dir), cache_dir, state)[1] == 0
+
+  # A day added to a dataset changes its stop date only.
+  csv_dir = data_dir / 'N000001' / 'csvData'
+  last = sorted(os.listdir(csv_dir))[-1]
+  text = (csv_dir / last).read_text().replace('2019-05-25T', '2019-05-26T')
+  (csv_dir / ('2019-05-26' + last[10:])).write_text(text)
+  state, n_read = stations.scan(str(data_dir), cache_dir, state)
+  assert n_read == 1
+  assert state['N000001/doppler']['stopDateTime'] == '2019-05-26T23:59:59Z'
+
+
+def test_rows_and_write(data_dir, cache_dir, tmp_path):
+  catalog_file = shutil.copy(os.path.join(BIN_DIR, 'catalog.csv'), tmp_path)
+  current = catalog.get_catalog(catalog_file)
+  state, _ = stations.scan(str(data_dir), cache_dir)
+  del state['S000082/mag']
+  state['S000100/mag'] = dict(state['S000028/mag'])
+
+  rows = stations.rows(state, catalog_file)
+  # Existing datasets in the same order with their nickname and location,
+  # then new ones.
+  assert [row[0] for row in rows] == [*current, 'S000100/mag']
+  assert rows[0] == ['S000028/mag', 'W2NAF', *EXPECTED['S000028/mag'], '41.354', '-75.625',
+                     '480.0']
+  assert rows[1][1:4] == ['AC0G1', current['S000082/mag']['startDateTime'],
+                          current['S000082/mag']['stopDateTime']]
+  assert rows[3] == ['S000100/mag', '', *EXPECTED['S000028/mag'], '', '', '']
+
+  assert stations.write(rows, catalog_file)
+  mtime_ns = os.stat(catalog_file).st_mtime_ns
+  assert not stations.write(rows, catalog_file)
+  assert os.stat(catalog_file).st_mtime_ns == mtime_ns
+  assert catalog.get_catalog(catalog_file)['S000028/mag']['stopDateTime'] == \
+    EXPECTED['S000028/mag'][1]
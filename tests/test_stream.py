@@ -0,0 +1,47 @@
+import io
+import gzip
+import importlib.util
+
+import pytest
+
+from psws import stream
+
+RECORDS = [b'a' * 3, b'b' * 10, b'', b'c', b'd' * 25]
+
+
+def test_chunks():
+  chunks = list(stream.chunks(RECORDS, 7))
+  assert b''.join(chunks) == b''.join(RECORDS)
+  assert all(len(chunk) == 7 for chunk in chunks[:-1])
+  assert 0 < len(chunks[-1]) <= 7
+
+
+def test_write():
+  file = io.BytesIO()
+  assert stream.write(RECORDS, file, 4) == 39
+  assert file.getvalue() == b''.join(RECORDS)
+
+
+def test_encodings():
+  expected = ['gzip'] if importlib.util.find_spec('zstandard') is None else ['zstd', 'gzip']
+  assert stream.encodings() == expected
+
+
+def test_gzip():
+  compressed = list(stream.compress(RECORDS, 'gzip'))
+  assert gzip.decompress(b''.join(compressed)) == b''.join(RECORDS)
+  # Each chunk is flushed, so the data sent so far can be decompressed.
+  decompressor = gzip.zlib.decompressobj(16 + gzip.zlib.MAX_WBITS)
+  assert decompressor.decompress(b''.join(compressed[0:2])) == b''.join(RECORDS[0:2])
+
+
+def test_zstd():
+  zstandard = pytest.importorskip('zstandard')
+  compressed = b''.join(stream.compress(RECORDS, 'zstd'))
+  reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(compressed))
+  assert reader.read() == b''.join(RECORDS)
+
+
+def test_unsupported_encoding():
+  with pytest.raises(ValueError):
+    list(stream.compress(RECORDS, 'br'))
@@ -0,0 +1,23 @@
+from psws import info, isotime, tiers
+
+
+def test_split_id():
+  assert tiers.split_id('S000028/mag/PT1M') == ('S000028/mag', 'PT1M')
+  assert tiers.split_id('S000028/mag') == ('S000028/mag', None)
+
+
+def test_max_request_duration():
+  # The rows of a P30D request at PT1S, at the cadence of the aggregate.
+  base = info.info('S000028/mag')
+  assert tiers.max_rows(base) == 30 * 86400
+  for cadence, seconds in tiers.CADENCES.items():
+    duration = info.info(f'S000028/mag/{cadence}')['maxRequestDuration']
+    assert isotime.duration(duration) // isotime.duration(cadence) == 30 * 86400
+  assert info.info('S000028/mag/PT1M')['maxRequestDuration'] == 'P1800D'
+
+
+def test_parameters():
+  parameters = info.info('N000001/doppler/PT1H')['parameters']
+  names = [p['name'] for p in parameters]
+  assert names == ['Time', 'Freq_mean', 'Freq_min', 'Freq_max', 'Vpk_mean', 'Vpk_min', 'Vpk_max']
+  assert parameters[1]['type'] == 'double'
@@ -0,0 +1,101 @@
+import io
+import json
+import asyncio
+import threading
+
+import pytest
+
+from psws import data, metrics, timing
+
+
+@pytest.fixture
+def timed(monkeypatch):
+  """Enable timing with empty sums and aggregate."""
+  monkeypatch.setattr(timing, '_enabled', True)
+  monkeypatch.setattr(metrics, '_aggregate', {})
+  timing.reset()
+  yield
+  timing.reset()
+
+
+def test_disabled(monkeypatch):
+  monkeypatch.setattr(timing, '_enabled', False)
+  timing.reset()
+  with timing.stage('read'):
+    timing.add('read', bytes=10)
+  items = [b'a']
+  assert timing.iterate('read', items) is items
+  assert timing.snapshot() == {}
+  assert timing.report({'id': 'S000028/mag'}, timing.clock()) is None
+
+
+def test_stages_of_a_request(timed, cache_dir):
+  started = timing.clock()
+  body = b''.join(data.iter_records('N000001/doppler', '2019-05-24T12:00:00Z',
+                                    '2019-05-24T13:00:00Z'))
+  file = io.StringIO()
+  summary = timing.report({'id': 'N000001/doppler', 'bytes': len(body)}, started, file)
+
+  assert file.getvalue().startswith('timing: ')
+  assert json.loads(file.getvalue()[len('timing: '):]) == summary
+  assert list(summary['stages'])[0:2] == ['discover', 'read']
+  assert summary['stages']['discover']['calls'] >= 1
+  assert summary['stages']['format']['rows'] == body.count(b'\n')
+  assert summary['wall'] >= summary['stages']['read']['wall']
+
+
+def test_concurrent_requests_have_their_own_sums(timed):
+  # As tasks of the server's event loop, with work in threads.
+
+  async def request(rows):
+    timing.reset()
+    await asyncio.sleep(0)
+    await asyncio.to_thread(timing.add, 'format', calls=1, rows=rows)
+    await asyncio.sleep(0)
+    timing.add('format', rows=rows)
+    return timing.snapshot()
+
+  async def run():
+    return await asyncio.gather(request(1), request(10))
+
+  first, second = asyncio.run(run())
+  assert first['format']['rows'] == 2 and first['format']['calls'] == 1
+  assert second['format']['rows'] == 20 and second['format']['calls'] == 1
+  assert timing.snapshot() == {}
+
+  # A thread that did not reset() has sums of its own.
+  thread = threading.Thread(target=timing.add, args=('read',), kwargs={'rows': 5})
+  thread.start()
+  thread.join()
+  assert timing.snapshot() == {}
+
+
+def test_merge(timed):
+  timing.add('decode', wall=1.0, calls=1, rows=5)
+  timing.merge({'decode': {'wall': 0.5, 'cpu': 0.25, 'calls': 2, 'bytes': 0, 'rows': 3}})
+  assert timing.snapshot()['decode'] == {'wall': 1.5, 'cpu': 0.25, 'calls': 3, 'bytes': 0,
+                                         'rows': 8}
+
+
+def summary(id, wall, error=None):
+  return {'id': id, 'wall': wall, 'cpu': wall / 2, 'bytes': 100, 'error': error,
+          'stages': {'read': {'wall': wall / 2, 'cpu': 0.0, 'calls': 1, 'bytes': 10, 'rows': 0}}}
+
+
+def test_metrics_file(tmp_path, monkeypatch):
+  monkeypatch.setattr(metrics, '_aggregate', {})
+  file = str(tmp_path / 'metrics.jsonl')
+  aggregate = {}
+  for s in [summary('S000028/mag', 0.02), summary('S000001/mag', 0.3, 'failed'),
+            summary('S000028/mag/PT1M', 100)]:
+    metrics.record(s, file)
+    metrics.add(aggregate, s)
+  with open(file, 'a') as f:
+    f.write('{"id": "S0000')  # Partially written line
+
+  assert metrics.read(file) == aggregate == metrics.metrics()
+  mag = aggregate['mag']
+  assert mag['requests'] == 2 and mag['errors'] == 1 and mag['bytes'] == 200
+  assert mag['histogram']['0.025'] == 1 and mag['histogram']['0.5'] == 1
+  assert mag['stages']['read']['calls'] == 2
+  assert aggregate['mag/PT1M']['histogram']['+Inf'] == 1
@@ -1,13 +1,21 @@
 # Start new code, part I
 def fastapi_app():
-  import fastapi
+  import os
+  import sys
   import a2wsgi
 
-  # FastAPI ASGI app, converted to WSGI
-  fastapi_asgi = fastapi.FastAPI()
-  @fastapi_asgi.get("/", response_class=fastapi.responses.PlainTextResponse)
-  async def hello():
-      return "hello world"
+  # The HAPI endpoints are in the psws package in the bin/ directory of
+  # server-python-general-psws; see bin/psws/server.py. Data files are read
+  # from PSWS_DATA_DIR and derived files kept in PSWS_CACHE_DIR.
+  bin_dir = os.getenv('PSWS_BIN_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bin'))
+  if bin_dir not in sys.path:
+    sys.path.insert(0, bin_dir)
+  from psws import server
+
+  # FastAPI ASGI app with /catalog, /info and /data, converted to WSGI.
+  # Data responses are computed in a bounded thread pool, not in the thread
+  # that mod_wsgi runs the request in.
+  fastapi_asgi = server.app()
 
   fastapi_wsgi = a2wsgi.ASGIMiddleware(fastapi_asgi)
 